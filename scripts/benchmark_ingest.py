@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+"""
+End-to-end ingestion throughput benchmark against the local Polygon stand-in.
+
+Each scenario runs the real ingest_polygon / backfill_polygon entry points
+(fetch, decode, dedup, fragment append, sidecar refresh) on a throwaway raw
+dataset, with the API served by scripts/polygon_stub_server.py. No network,
+API key or Supabase connection is used.
+
+Usage:
+    python scripts/benchmark_ingest.py
+    python scripts/benchmark_ingest.py --universe 1000 --days 40 --latency-ms 100 --error-every 20
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+from contextlib import ExitStack
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+from unittest import mock
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from scripts.polygon_stub_server import PolygonStub, synthetic_symbols
+from src.ingestion import backfill_polygon, fetch_polygon, ingest_polygon
+from src.utils.price_utils import raw_row_count
+from src.utils.raw_store import RAW_BASE_FILE_NAME
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark Polygon ingestion against a local stand-in server.")
+    parser.add_argument("--symbols", type=int, default=10_000, help="Symbols in each grouped-daily payload.")
+    parser.add_argument("--universe", type=int, default=500, help="Tickers in the ingested universe.")
+    parser.add_argument("--days", type=int, default=20, help="Business days covered by the backfill scenarios.")
+    parser.add_argument("--end", type=str, default="2026-04-10", help="Last backfilled date (YYYY-MM-DD).")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Server latency per request.")
+    parser.add_argument("--error-every", type=int, default=0, help="Inject a 429 every Nth request (0 = never).")
+    parser.add_argument("--workers", type=int, default=backfill_polygon.DEFAULT_WORKERS, help="Backfill workers.")
+    return parser.parse_args()
+
+
+def _seed_dataset(root: Path, universe: list[str], last_day: date) -> tuple[Path, Path]:
+    """One existing bar per ticker on last_day, plus the universe CSV."""
+    raw = root / "raw"
+    raw.mkdir()
+    n = len(universe)
+    table = pa.table(
+        {
+            "source_system": ["benchmark"] * n,
+            "ingestion_run_id": ["seed"] * n,
+            "ingested_at": pa.array([datetime.now(timezone.utc)] * n, pa.timestamp("us", tz="UTC")),
+            "symbol_raw": [f"{t}.US" for t in universe],
+            "payload_date": pa.array([last_day] * n, pa.date32()),
+            "open_raw": [1.0] * n,
+            "high_raw": [1.0] * n,
+            "low_raw": [1.0] * n,
+            "close_raw": [1.0] * n,
+            "volume_raw": [100.0] * n,
+        }
+    )
+    pq.write_table(table, raw / RAW_BASE_FILE_NAME)
+    universe_csv = root / "universe.csv"
+    universe_csv.write_text("symbol\n" + "\n".join(universe) + "\n", encoding="utf-8")
+    return raw, universe_csv
+
+
+def _run(module, argv: list[str], raw: Path, universe_csv: Path, base_url: str) -> None:
+    env = {k: v for k, v in os.environ.items() if k not in ("SUPABASE_DB_URL", fetch_polygon.API_CACHE_ENV)}
+    env.update({fetch_polygon.BASE_URL_ENV: base_url, "POLYGON_API_KEY": "stub"})
+    with ExitStack() as stack:
+        stack.enter_context(mock.patch.object(sys, "argv", [module.__name__, *argv]))
+        stack.enter_context(mock.patch.dict(os.environ, env, clear=True))
+        stack.enter_context(mock.patch.object(module, "RAW_PATH", raw))
+        stack.enter_context(mock.patch.object(module, "UNIVERSE_CSV", universe_csv))
+        stack.enter_context(contextlib.redirect_stdout(io.StringIO()))
+        module.main()
+
+
+def main() -> None:
+    args = parse_args()
+    end = date.fromisoformat(args.end)
+    since = end - timedelta(days=int(args.days * 7 / 5))
+    universe = synthetic_symbols(args.symbols)[: args.universe]
+    fetch_polygon.enable_response_cache(None)
+
+    scenarios = [
+        ("ingest_polygon (1 grouped day)", ingest_polygon, ["--date", end.isoformat()], end - timedelta(days=1)),
+        (
+            "backfill_polygon --strategy grouped",
+            backfill_polygon,
+            ["--strategy", "grouped", "--since", since.isoformat(), "--end", end.isoformat()],
+            since - timedelta(days=1),
+        ),
+        (
+            "backfill_polygon --strategy ticker",
+            backfill_polygon,
+            ["--strategy", "ticker", "--since", since.isoformat(), "--end", end.isoformat()],
+            since - timedelta(days=1),
+        ),
+    ]
+
+    print(f"Stand-in: {args.symbols:,} symbols per grouped payload, {args.latency_ms:g} ms latency, 429 every {args.error_every or '-'}")
+    print(f"Universe: {len(universe):,} tickers; backfill {since} to {end}\n")
+    print(f"{'scenario':<38} {'requests':>8} {'429s':>5} {'MB':>7} {'rows':>9} {'seconds':>8} {'rows/s':>9}")
+    for label, module, argv, seeded_day in scenarios:
+        if module is backfill_polygon:
+            argv = argv + ["--requests-per-minute", "0", "--workers", str(args.workers), "--fresh"]
+        with tempfile.TemporaryDirectory() as tmp:
+            raw, universe_csv = _seed_dataset(Path(tmp), universe, seeded_day)
+            if module is backfill_polygon:
+                argv = argv + ["--checkpoint", str(Path(tmp) / "checkpoint.json")]
+            before = raw_row_count(raw)
+            with PolygonStub(
+                symbols=synthetic_symbols(args.symbols),
+                latency_ms=args.latency_ms,
+                error_every=args.error_every,
+            ) as stub:
+                t0 = time.perf_counter()
+                _run(module, argv, raw, universe_csv, stub.base_url)
+                seconds = time.perf_counter() - t0
+            rows = raw_row_count(raw) - before
+        stats = stub.stats
+        print(
+            f"{label:<38} {stats['requests']:>8,} {stats['throttled']:>5,} {stats['bytes'] / 1e6:>7.1f}"
+            f" {rows:>9,} {seconds:>8.2f} {rows / seconds:>9,.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+"""
+Benchmark price normalization: pandas normalize_price_schema vs Arrow normalize_price_table.
+
+Runs both over the same raw row groups (from --raw-path, or a synthetic
+table shaped like the Stooq data when no raw dataset is available), checks
+they produce the same rows and prints rows/s for each.
+
+Usage:
+    python scripts/benchmark_normalize.py
+    python scripts/benchmark_normalize.py --raw-path data/raw/stock_price_stooq --max-row-groups 50
+"""
+
+import argparse
+import time
+from datetime import date
+from itertools import islice
+from pathlib import Path
+import sys
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.utils.price_utils import (
+    iter_raw_row_groups,
+    normalize_price_schema,
+    normalize_price_table,
+    normalized_table_to_pandas,
+)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark pandas vs Arrow price normalization.")
+    parser.add_argument("--raw-path", type=Path, default=None, help="Raw dataset to read (default: synthetic data).")
+    parser.add_argument("--max-row-groups", type=int, default=20, help="Row groups to read from --raw-path.")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="Synthetic rows per row group.")
+    parser.add_argument("--symbols", type=int, default=2_000, help="Distinct synthetic symbols.")
+    parser.add_argument("--row-groups", type=int, default=4, help="Synthetic row groups.")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed repetitions (best is reported).")
+    return parser.parse_args()
+
+
+def synthetic_row_groups(rows: int, symbols: int, row_groups: int) -> list[pa.Table]:
+    rng = np.random.default_rng(7)
+    names = np.array([f"SYM{i:05d}.US" for i in range(symbols)], dtype=object)
+    start = np.datetime64(date(2000, 1, 1), "D")
+    tables = []
+    for _ in range(row_groups):
+        close = rng.uniform(1, 500, rows)
+        tables.append(
+            pa.table(
+                {
+                    "symbol_raw": pa.array(names[np.sort(rng.integers(0, symbols, rows))], pa.string()),
+                    "payload_date": pa.array(start + rng.integers(0, 9000, rows).astype("timedelta64[D]")),
+                    "open_raw": close,
+                    "high_raw": close,
+                    "low_raw": close,
+                    "close_raw": close,
+                    "volume_raw": rng.uniform(0, 1e7, rows),
+                }
+            )
+        )
+    return tables
+
+
+def _best_of(repeat: int, fn) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main() -> None:
+    args = parse_args()
+    if args.raw_path is not None:
+        tables = list(islice(iter_raw_row_groups(args.raw_path), args.max_row_groups))
+        source = f"{args.raw_path} ({len(tables)} row groups)"
+    else:
+        tables = synthetic_row_groups(args.rows, args.symbols, args.row_groups)
+        source = f"synthetic ({args.row_groups} x {args.rows:,} rows, {args.symbols:,} symbols)"
+    total_rows = sum(t.num_rows for t in tables)
+    if total_rows == 0:
+        raise ValueError("No rows to benchmark.")
+
+    # Both paths start from the Arrow row group the reader yields.
+    def run_pandas() -> list[pd.DataFrame]:
+        return [normalize_price_schema(t.to_pandas()) for t in tables]
+
+    def run_arrow_table() -> list[pa.Table]:
+        return [normalize_price_table(t) for t in tables]
+
+    def run_arrow_pandas() -> list[pd.DataFrame]:
+        return [normalized_table_to_pandas(normalize_price_table(t)) for t in tables]
+
+    expected = pd.concat(run_pandas(), ignore_index=True)
+    actual = pd.concat(run_arrow_pandas(), ignore_index=True)
+    pd.testing.assert_frame_equal(
+        expected.astype({"open": "float64", "high": "float64", "low": "float64", "volume": "float64"}),
+        actual.astype({"open": "float64", "high": "float64", "low": "float64", "volume": "float64"}),
+        check_dtype=False,
+    )
+
+    print(f"Source: {source}")
+    print(f"Rows:   {total_rows:,}")
+    results = [
+        ("pandas normalize_price_schema", _best_of(args.repeat, run_pandas)),
+        ("arrow normalize_price_table", _best_of(args.repeat, run_arrow_table)),
+        ("arrow + to pandas", _best_of(args.repeat, run_arrow_pandas)),
+    ]
+    baseline = results[0][1]
+    for label, seconds in results:
+        print(
+            f"  {label:<30} {seconds:7.3f}s  {total_rows / seconds:>14,.0f} rows/s  "
+            f"{baseline / seconds:5.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
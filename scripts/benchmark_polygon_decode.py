@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+"""
+Micro-benchmark Polygon grouped-daily decoding on a synthetic 10k-symbol payload.
+
+Compares the legacy path (json.loads of the whole body, per-row dicts with
+normalize_ticker, pandas DataFrame) with the streaming decoder plus
+columnar Arrow builder in fetch_polygon, both unfiltered and filtered to a
+universe-sized ticker set.
+
+Usage:
+    python scripts/benchmark_polygon_decode.py
+    python scripts/benchmark_polygon_decode.py --symbols 12000 --universe 150
+"""
+
+import argparse
+import json
+import time
+from pathlib import Path
+import sys
+
+import numpy as np
+import pandas as pd
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.ingestion.fetch_polygon import STREAM_CHUNK_BYTES, _build_df, _build_table, _decode_results
+from src.utils.price_utils import normalize_ticker
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark Polygon grouped-daily decoding.")
+    parser.add_argument("--symbols", type=int, default=10_000, help="Results in the synthetic payload.")
+    parser.add_argument("--universe", type=int, default=100, help="Tickers kept by the filtered runs.")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed repetitions (best is reported).")
+    return parser.parse_args()
+
+
+def synthetic_grouped_payload(symbols: int) -> bytes:
+    rng = np.random.default_rng(11)
+    close = rng.uniform(1, 500, symbols).round(4)
+    results = [
+        {
+            "T": f"S{i:05d}",
+            "v": float(rng.integers(1_000, 10_000_000)),
+            "vw": float(close[i]),
+            "o": float(close[i]),
+            "c": float(close[i]),
+            "h": float(close[i]),
+            "l": float(close[i]),
+            "t": 1775001600000,
+            "n": int(rng.integers(1, 50_000)),
+        }
+        for i in range(symbols)
+    ]
+    body = {
+        "queryCount": symbols,
+        "resultsCount": symbols,
+        "adjusted": True,
+        "results": results,
+        "status": "OK",
+        "request_id": "benchmark",
+        "count": symbols,
+    }
+    return json.dumps(body).encode()
+
+
+def _legacy_build_df(results: list[dict]) -> pd.DataFrame:
+    rows = []
+    for r in results:
+        source = f"{r.get('T', '')}.US"
+        rows.append(
+            {
+                "source_ticker": source,
+                "ticker": normalize_ticker(source),
+                "date": r.get("t"),
+                "open": r.get("o"),
+                "high": r.get("h"),
+                "low": r.get("l"),
+                "close": r.get("c"),
+                "volume": r.get("v"),
+            }
+        )
+    df = pd.DataFrame(rows)
+    df["source_ticker"] = df["source_ticker"].astype("string")
+    df["ticker"] = df["ticker"].astype("string")
+    df["date"] = pd.to_datetime(df["date"], unit="ms", errors="coerce")
+    for col in ("open", "high", "low", "close", "volume"):
+        df[col] = pd.to_numeric(df[col], errors="coerce").astype("float64")
+    return df
+
+
+def _legacy_decode(body: bytes, tickers: set[str] | None) -> pd.DataFrame:
+    results = json.loads(body).get("results", [])
+    if tickers:
+        results = [r for r in results if r.get("T", "").upper() in tickers]
+    return _legacy_build_df(results)
+
+
+def _chunks(body: bytes) -> list[bytes]:
+    return [body[i : i + STREAM_CHUNK_BYTES] for i in range(0, len(body), STREAM_CHUNK_BYTES)]
+
+
+def _best_of(repeat: int, fn) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main() -> None:
+    args = parse_args()
+    body = synthetic_grouped_payload(args.symbols)
+    chunks = _chunks(body)
+    universe = {f"S{i:05d}" for i in range(0, args.symbols, max(1, args.symbols // args.universe))}
+
+    for label, tickers in (("unfiltered", None), (f"filtered to {len(universe)}", universe)):
+        legacy = _legacy_decode(body, tickers)
+        current = _build_df(_decode_results(chunks, tickers))
+        pd.testing.assert_frame_equal(legacy, current, check_dtype=False)
+
+        print(f"Grouped-daily payload: {args.symbols:,} results, {len(body) / 1e6:.1f} MB, {label}")
+        results = [
+            ("legacy json + dict rows", _best_of(args.repeat, lambda: _legacy_decode(body, tickers))),
+            ("stream decode + Arrow table", _best_of(args.repeat, lambda: _build_table(_decode_results(chunks, tickers)))),
+            ("stream decode + DataFrame", _best_of(args.repeat, lambda: _build_df(_decode_results(chunks, tickers)))),
+        ]
+        columns = _decode_results(chunks, tickers)
+        results.append(("columnar build only", _best_of(args.repeat, lambda: _build_table(columns))))
+        baseline = results[0][1]
+        for name, seconds in results:
+            print(f"  {name:<30} {seconds * 1000:8.1f} ms  {baseline / seconds:6.1f}x")
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,30 +1,113 @@
 """
 scripts/load_historical_to_supabase.py
 
-One-time historical load: migrates local parquet → Supabase stock_prices table.
+One-time historical load: migrates local raw parquet dataset → Supabase stock_prices table.
 Safe to re-run (uses ON CONFLICT DO NOTHING).
 
+The default copy method streams the filtered row groups as CSV into
+COPY ... FROM STDIN on a temporary staging table and merges each chunk of
+--merge-rows rows with one INSERT ... SELECT ... ON CONFLICT DO NOTHING.
+Only the universe/date filter is evaluated in Python (on Arrow, with row
+groups pruned by their statistics), so no separate counting pass is needed.
+--method values streams the same tables through the shared batched upsert
+(src/db/postgres.py). Both methods use a pooled connection.
+
+--parallel N splits the universe into contiguous ticker ranges of about
+equal filtered row counts and runs the copy load of each range on its own
+pooled connection, N at a time. Each partition scans the dataset on its own,
+so this only pays off when row-group statistics let every partition skip
+the others' rows: a symbol-sorted base (see src/ingestion/compact_raw.py)
+or the Stooq bucket layout. The row groups each partition would decode are
+checked from the parquet footers first, and the load refuses to start when
+the partitions together would decode more than MAX_DECODE_FACTOR times one
+scan. Finished partitions are recorded in a checkpoint file; after a
+failure, rerunning the same command loads only the partitions still
+missing. Progress and ETA are reported across all partitions.
+
 Usage:
     python scripts/load_historical_to_supabase.py                        # default: 2024-01-01 onwards
     python scripts/load_historical_to_supabase.py --since 2023-01-01     # custom start date
     python scripts/load_historical_to_supabase.py --dry-run              # show row count only
+    python scripts/load_historical_to_supabase.py --db-url postgresql://localhost/finlify   # local Postgres
+    python scripts/load_historical_to_supabase.py --parallel 4           # 4 connections, resumable
 """
 
-import os
+import sys
 import argparse
+import hashlib
+import json
+import math
+import threading
 import time
+from datetime import date
+from pathlib import Path
+from typing import Any, Iterable, Iterator
+
 import pandas as pd
-import pyarrow.parquet as pq
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
+import pyarrow.dataset as ds
 from dotenv import load_dotenv
-import psycopg2
-from psycopg2.extras import execute_values
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.db.postgres import connection, database_url, format_upsert_stats, get_pool, upsert_rows
+from src.db.stock_prices import STOCK_PRICES_COLUMNS, STOCK_PRICES_KEY, STOCK_PRICES_TABLE, to_stock_prices_table
+from src.utils.atomic_io import write_json_atomic
+from src.utils.parallel_scan import bounded_map
+from src.utils.price_utils import (
+    DEFAULT_RAW_DATASET,
+    iter_raw_row_groups,
+    open_price_dataset,
+    plan_symbol_passes,
+    pruned_row_counts,
+)
 
 load_dotenv()
 
-PARQUET_PATH = "data/raw/stock_price_stooq/stock_prices.parquet"
+PARQUET_PATH = DEFAULT_RAW_DATASET
 UNIVERSE_CSV = "input/finlify_core_universe.csv"
 BATCH_SIZE = 10_000
-DB_URL = os.environ["SUPABASE_DB_URL"]
+# Rows staged per merge transaction in copy mode.
+MERGE_ROWS = 1_000_000
+# --parallel: partitions per worker by default. Several small partitions per
+# worker keep every connection busy until the end and make a retry cheap.
+PARTITIONS_PER_WORKER = 4
+CHECKPOINT_PATH = Path("data/raw/_supabase_load_checkpoint.json")
+CHECKPOINT_VERSION = 1
+PROGRESS_INTERVAL_SECONDS = 10.0
+# --parallel: rows decoded by all partitions together / rows of one scan.
+MAX_DECODE_FACTOR = 1.5
+
+RAW_COLUMNS = [
+    "symbol_raw", "payload_date", "open_raw", "high_raw", "low_raw", "close_raw", "volume_raw",
+    "source_system", "ingested_at",
+]
+# ON COMMIT DROP keeps the staging table transaction-scoped, which also works
+# behind a transaction-mode connection pooler.
+STAGE_TABLE_SQL = """
+    CREATE TEMP TABLE stock_prices_stage (
+        source_ticker text,
+        ticker text,
+        date date,
+        open double precision,
+        high double precision,
+        low double precision,
+        close double precision,
+        volume double precision,
+        source_system text,
+        ingested_at timestamptz
+    ) ON COMMIT DROP
+"""
+COPY_SQL = f"COPY stock_prices_stage ({', '.join(STOCK_PRICES_COLUMNS)}) FROM STDIN WITH (FORMAT csv)"
+MERGE_SQL = f"""
+    INSERT INTO stock_prices ({', '.join(STOCK_PRICES_COLUMNS)})
+    SELECT {', '.join(STOCK_PRICES_COLUMNS)} FROM stock_prices_stage
+    ON CONFLICT (source_ticker, date) DO NOTHING
+"""
 
 
 def _load_universe() -> set[str]:
@@ -34,39 +117,77 @@ def _load_universe() -> set[str]:
     return {f"{t}.US" for t in tickers}
 
 
-def transform_chunk(df: pd.DataFrame) -> pd.DataFrame:
-    """Map raw parquet columns → stock_prices table columns."""
-    out = pd.DataFrame()
-    out["source_ticker"] = df["symbol_raw"]
-    out["ticker"] = df["symbol_raw"].str.replace(r"\.\w+$", "", regex=True)
-    out["date"] = pd.to_datetime(df["payload_date"]).dt.date
-    out["open"] = df["open_raw"]
-    out["high"] = df["high_raw"]
-    out["low"] = df["low_raw"]
-    out["close"] = df["close_raw"]
-    out["volume"] = df["volume_raw"]
-    out["source_system"] = df["source_system"]
-    out["ingested_at"] = df["ingested_at"]
-    return out.dropna(subset=["source_ticker", "date"])
-
-
-def load_to_supabase(conn, rows: list[tuple]) -> int:
-    sql = """
-        INSERT INTO stock_prices
-            (source_ticker, ticker, date, open, high, low, close, volume, source_system, ingested_at)
-        VALUES %s
-        ON CONFLICT (source_ticker, date) DO NOTHING
+def encode_copy_csv(table: pa.Table) -> pa.Buffer:
+    """CSV body for COPY ... WITH (FORMAT csv): no header, nulls as unquoted empty fields."""
+    sink = pa.BufferOutputStream()
+    pacsv.write_csv(table, sink, write_options=pacsv.WriteOptions(include_header=False))
+    return sink.getvalue()
+
+
+def iter_copy_tables(
+    raw_path: Path, since: date | str, universe: set[str], workers: int | None = None
+) -> Iterator[pa.Table]:
+    """Filtered row groups of the raw dataset, already mapped to stock_prices columns."""
+    for raw in iter_raw_row_groups(
+        raw_path, columns=RAW_COLUMNS, symbols=universe, since=since, workers=workers, ordered=False
+    ):
+        table = to_stock_prices_table(raw)
+        if table.num_rows:
+            yield table
+
+
+def copy_load(conn, tables: Iterable[pa.Table], merge_rows: int = MERGE_ROWS, log=print) -> dict[str, float]:
     """
-    with conn.cursor() as cur:
-        execute_values(cur, sql, rows, page_size=BATCH_SIZE)
+    COPY tables into a staging table and merge into stock_prices every
+    merge_rows rows, one transaction per merge. Returns staged/inserted
+    counts and timings.
+    """
+    stats = {"staged": 0, "inserted": 0, "merges": 0, "copy_seconds": 0.0, "merge_seconds": 0.0}
+    t0 = time.perf_counter()
+    pending = 0
+    cur = None
+
+    def merge() -> None:
+        nonlocal cur, pending
+        t = time.perf_counter()
+        cur.execute(MERGE_SQL)
         inserted = cur.rowcount
-    conn.commit()
-    return inserted
+        conn.commit()
+        cur.close()
+        cur, pending = None, 0
+        stats["merge_seconds"] += time.perf_counter() - t
+        stats["inserted"] += inserted
+        stats["merges"] += 1
+        elapsed = time.perf_counter() - t0
+        log(
+            f"  merged: {stats['staged']:>10,} staged  {stats['inserted']:,} inserted  "
+            f"{stats['staged'] / elapsed:,.0f} rows/s"
+        )
 
+    try:
+        for table in tables:
+            if cur is None:
+                cur = conn.cursor()
+                cur.execute(STAGE_TABLE_SQL)
+            t = time.perf_counter()
+            cur.copy_expert(COPY_SQL, pa.BufferReader(encode_copy_csv(table)))
+            stats["copy_seconds"] += time.perf_counter() - t
+            stats["staged"] += table.num_rows
+            pending += table.num_rows
+            if pending >= merge_rows:
+                merge()
+        if cur is not None:
+            merge()
+    except BaseException:
+        conn.rollback()
+        raise
+    stats["seconds"] = time.perf_counter() - t0
+    return stats
 
-def count_filtered_rows(pf: pq.ParquetFile, since: str, universe: set[str]) -> int:
+
+def count_filtered_rows(dataset: ds.Dataset, since: str, universe: set[str]) -> int:
     total = 0
-    for batch in pf.iter_batches(batch_size=50_000, columns=["payload_date", "symbol_raw"]):
+    for batch in dataset.to_batches(batch_size=50_000, columns=["payload_date", "symbol_raw"]):
         df = batch.to_pandas()
         dates = pd.to_datetime(df["payload_date"], errors="coerce")
         mask = (dates >= since) & (df["symbol_raw"].isin(universe))
@@ -74,66 +195,327 @@ def count_filtered_rows(pf: pq.ParquetFile, since: str, universe: set[str]) -> i
     return total
 
 
-def main(dry_run: bool = False, since: str = "2024-01-01"):
-    universe = _load_universe()
-    pf = pq.ParquetFile(PARQUET_PATH)
-    total_parquet_rows = pf.metadata.num_rows
-
-    print(f"Parquet total rows : {total_parquet_rows:,}")
-    print(f"Universe tickers   : {len(universe)}")
-    print(f"Loading since      : {since}")
-
+def _load_values(dataset: ds.Dataset, since: str, universe: set[str], db_url: str | None) -> None:
     print("Counting filtered rows...")
-    filtered_rows = count_filtered_rows(pf, since, universe)
+    filtered_rows = count_filtered_rows(dataset, since, universe)
     print(f"Rows to load       : {filtered_rows:,}")
 
-    if dry_run:
-        print("[dry-run] No data written.")
-        return
+    def progress(stats: dict) -> None:
+        processed, elapsed = stats["rows"], stats["seconds"]
+        pct = processed / filtered_rows * 100 if filtered_rows > 0 else 0
+        rps = processed / elapsed if elapsed > 0 else 0
+        eta = (filtered_rows - processed) / rps if rps > 0 else 0
+        print(
+            f"  {processed:>8,} / {filtered_rows:,} ({pct:.1f}%)  "
+            f"{stats['written']:,} inserted  {rps:,.0f} rows/s  ETA {eta/60:.1f}min"
+        )
 
-    conn = psycopg2.connect(DB_URL)
-    print("Connected to Supabase.\n")
+    with connection(db_url) as conn:
+        print("Connected to Supabase.\n")
+        stats = upsert_rows(
+            conn,
+            STOCK_PRICES_TABLE,
+            STOCK_PRICES_COLUMNS,
+            iter_copy_tables(PARQUET_PATH, since, universe),
+            conflict=STOCK_PRICES_KEY,
+            page_rows=BATCH_SIZE,
+            log=progress,
+        )
 
-    total_inserted = 0
-    total_skipped = 0
-    processed = 0
-    t0 = time.time()
+    print(f"\nDone. {stats['written']:,} inserted, {stats['rows'] - stats['written']:,} skipped.")
+    print(f"Total time: {stats['seconds']/60:.1f} min")
+    print(f"  {format_upsert_stats(stats)}")
 
-    for batch in pf.iter_batches(batch_size=BATCH_SIZE):
-        df = batch.to_pandas()
-        dates = pd.to_datetime(df["payload_date"], errors="coerce")
-        df = df[(dates >= since) & (df["symbol_raw"].isin(universe))].copy()
-        if df.empty:
-            continue
 
-        df = transform_chunk(df)
-        rows = list(df.itertuples(index=False, name=None))
-        inserted = load_to_supabase(conn, rows)
-        skipped = len(rows) - inserted
+def _load_copy(since: str, universe: set[str], db_url: str | None, merge_rows: int) -> None:
+    with connection(db_url) as conn:
+        print("Connected to Supabase.\n")
+        stats = copy_load(conn, iter_copy_tables(PARQUET_PATH, since, universe), merge_rows=merge_rows)
 
-        total_inserted += inserted
-        total_skipped += skipped
-        processed += len(rows)
+    staged, inserted = stats["staged"], stats["inserted"]
+    rps = staged / stats["seconds"] if stats["seconds"] > 0 else 0
+    print(f"\nDone. {inserted:,} inserted, {staged - inserted:,} skipped.")
+    print(f"Total time: {stats['seconds'] / 60:.1f} min ({rps:,.0f} rows/s)")
+    print(f"  COPY:  {stats['copy_seconds']:.1f}s")
+    print(f"  merge: {stats['merge_seconds']:.1f}s over {stats['merges']} transaction(s)")
 
-        elapsed = time.time() - t0
-        pct = processed / filtered_rows * 100 if filtered_rows > 0 else 0
-        rps = processed / elapsed if elapsed > 0 else 0
-        eta = (filtered_rows - processed) / rps if rps > 0 else 0
-        print(
-            f"  {processed:>8,} / {filtered_rows:,} ({pct:.1f}%)  "
-            f"+{inserted} inserted  {skipped} skipped  "
-            f"{rps:,.0f} rows/s  ETA {eta/60:.1f}min"
+
+def filtered_symbol_counts(raw_path: Path, since: date | str, universe: set[str]) -> dict[str, int]:
+    """Rows per universe symbol on or after since, from a symbol/date-only scan."""
+    counts: dict[str, int] = {}
+    for table in iter_raw_row_groups(
+        raw_path, columns=["symbol_raw", "payload_date"], symbols=universe, since=since, ordered=False
+    ):
+        vc = pc.value_counts(pc.cast(table["symbol_raw"], pa.string()))
+        for sym, n in zip(vc.field("values").to_pylist(), vc.field("counts").to_pylist()):
+            if sym is not None:
+                counts[sym] = counts.get(sym, 0) + n
+    return counts
+
+
+def plan_partitions(symbol_counts: dict[str, int], partitions: int) -> list[list[str]]:
+    """Contiguous, sorted symbol ranges of roughly equal row counts."""
+    total = sum(symbol_counts.values())
+    return plan_symbol_passes(symbol_counts, max(math.ceil(total / max(partitions, 1)), 1))
+
+
+def partition_decode_factor(raw_path: Path, plan: list[list[str]], since: date | str) -> float:
+    """
+    Rows the partitions' scans decode together, relative to a single scan of
+    all their symbols; 1.0 means row-group pruning keeps them disjoint.
+    """
+    *parts, whole = pruned_row_counts(raw_path, [*plan, [s for symbols in plan for s in symbols]], since)
+    return sum(parts) / whole if whole else 1.0
+
+
+def _checkpoint_key(since: str, universe: set[str], partitions: int) -> dict[str, Any]:
+    digest = hashlib.sha1("\n".join(sorted(universe)).encode("utf-8")).hexdigest()
+    return {"since": since, "universe_sha1": digest, "partitions": partitions}
+
+
+def load_checkpoint(path: Path, key: dict[str, Any]) -> dict[str, Any] | None:
+    """Return the checkpoint of a load with the same since/universe/partitions, if one exists."""
+    if not path.exists():
+        return None
+    try:
+        state = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, json.JSONDecodeError):
+        return None
+    if state.get("version") != CHECKPOINT_VERSION or state.get("key") != key:
+        return None
+    return state
+
+
+def new_checkpoint(key: dict[str, Any], symbol_counts: dict[str, int]) -> dict[str, Any]:
+    plan = plan_partitions(symbol_counts, key["partitions"])
+    return {
+        "version": CHECKPOINT_VERSION,
+        "key": key,
+        "plan": plan,
+        "rows": [sum(symbol_counts[s] for s in symbols) for symbols in plan],
+        "done": {},
+    }
+
+
+class LoadProgress:
+    """
+    Aggregate progress of concurrent partition loads, printed at most every
+    interval seconds and whenever a partition finishes.
+    """
+
+    def __init__(self, total_rows: int, partitions: int, interval: float = PROGRESS_INTERVAL_SECONDS, log=print):
+        self.total_rows = total_rows
+        self.partitions = partitions
+        self.interval = interval
+        self.log = log
+        self.rows = 0
+        self.finished = 0
+        self._t0 = time.perf_counter()
+        self._last = self._t0
+        self._lock = threading.Lock()
+
+    def add(self, rows: int) -> None:
+        with self._lock:
+            self.rows += rows
+            now = time.perf_counter()
+            if now - self._last >= self.interval:
+                self._report(now)
+
+    def partition_finished(self) -> None:
+        with self._lock:
+            self.finished += 1
+            self._report(time.perf_counter())
+
+    def _report(self, now: float) -> None:
+        self._last = now
+        elapsed = now - self._t0
+        rps = self.rows / elapsed if elapsed > 0 else 0.0
+        pct = self.rows / self.total_rows * 100 if self.total_rows > 0 else 100.0
+        eta = max(self.total_rows - self.rows, 0) / rps if rps > 0 else 0.0
+        self.log(
+            f"  [{self.finished}/{self.partitions} partitions]  {self.rows:>10,} / {self.total_rows:,} "
+            f"({pct:.1f}%)  {rps:,.0f} rows/s  ETA {eta / 60:.1f}min"
         )
 
-    conn.close()
-    elapsed = time.time() - t0
-    print(f"\nDone. {total_inserted:,} inserted, {total_skipped:,} skipped.")
-    print(f"Total time: {elapsed/60:.1f} min")
 
+def parallel_load(
+    db_url: str | None,
+    raw_path: Path,
+    since: str,
+    state: dict[str, Any],
+    parallel: int,
+    merge_rows: int = MERGE_ROWS,
+    checkpoint_path: Path | None = None,
+    log=print,
+) -> dict[str, Any]:
+    """
+    Copy-load every partition of state["plan"] not yet in state["done"],
+    parallel partitions at a time, each on its own pooled connection.
 
-if __name__ == "__main__":
+    A failed partition is reported and left out of state["done"]; the others
+    keep going. state is saved to checkpoint_path after each partition.
+    """
+    url = database_url(db_url)
+    if url is None:
+        raise KeyError("SUPABASE_DB_URL is not set")
+    # Size the pool before the first connection() call so every worker gets its own.
+    get_pool(url, max_connections=parallel)
+
+    pending = [i for i in range(len(state["plan"])) if str(i) not in state["done"]]
+    progress = LoadProgress(sum(state["rows"][i] for i in pending), len(pending), log=log)
+
+    def counted(tables: Iterable[pa.Table]) -> Iterator[pa.Table]:
+        for table in tables:
+            yield table
+            progress.add(table.num_rows)
+
+    def load_partition(i: int) -> tuple[int, dict[str, float] | None, str | None]:
+        # The partitions already run concurrently; scan each one on its own thread.
+        tables = iter_copy_tables(raw_path, since, set(state["plan"][i]), workers=1)
+        try:
+            with connection(url) as conn:
+                stats = copy_load(conn, counted(tables), merge_rows=merge_rows, log=lambda _: None)
+        except Exception as exc:
+            return i, None, f"{type(exc).__name__}: {exc}"
+        return i, stats, None
+
+    totals: dict[str, Any] = {"partitions": len(pending), "loaded": 0, "staged": 0, "inserted": 0, "failed": []}
+    t0 = time.perf_counter()
+    for i, stats, error in bounded_map(load_partition, pending, workers=parallel, ordered=False):
+        if error is not None:
+            totals["failed"].append((i, error))
+            log(f"  partition {i} failed: {error}")
+        else:
+            state["done"][str(i)] = {"staged": stats["staged"], "inserted": stats["inserted"]}
+            totals["loaded"] += 1
+            totals["staged"] += stats["staged"]
+            totals["inserted"] += stats["inserted"]
+            if checkpoint_path is not None:
+                write_json_atomic(checkpoint_path, state, indent=2)
+        progress.partition_finished()
+    totals["seconds"] = time.perf_counter() - t0
+    return totals
+
+
+def _load_parallel(
+    since: str,
+    universe: set[str],
+    db_url: str | None,
+    merge_rows: int,
+    parallel: int,
+    partitions: int | None,
+    checkpoint_path: Path,
+    fresh: bool,
+) -> None:
+    key = _checkpoint_key(since, universe, partitions or parallel * PARTITIONS_PER_WORKER)
+    state = None if fresh else load_checkpoint(checkpoint_path, key)
+    if state is None:
+        print("Counting filtered rows per ticker...")
+        state = new_checkpoint(key, filtered_symbol_counts(PARQUET_PATH, since, universe))
+        write_json_atomic(checkpoint_path, state, indent=2)
+    else:
+        print(f"Checkpoint: {len(state['done'])} of {len(state['plan'])} partition(s) already loaded")
+    print(f"Rows to load       : {sum(state['rows']):,} in {len(state['plan'])} partition(s), {parallel} connection(s)")
+    factor = partition_decode_factor(PARQUET_PATH, state["plan"], since)
+    print(f"Decode factor      : {factor:.2f}x one scan\n")
+    if factor > MAX_DECODE_FACTOR:
+        raise SystemExit(
+            f"--parallel would decode the raw dataset {factor:.1f}x: its row groups are not sorted by symbol. "
+            "Run python -m src.ingestion.compact_raw first, or load without --parallel."
+        )
+
+    stats = parallel_load(db_url, PARQUET_PATH, since, state, parallel, merge_rows, checkpoint_path)
+
+    staged, inserted = stats["staged"], stats["inserted"]
+    rps = staged / stats["seconds"] if stats["seconds"] > 0 else 0
+    print(f"\nDone. {inserted:,} inserted, {staged - inserted:,} skipped.")
+    print(f"Total time: {stats['seconds'] / 60:.1f} min ({rps:,.0f} rows/s)")
+    print(f"  Partitions: {stats['loaded']} loaded this run, {len(state['done'])} of {len(state['plan'])} done")
+    if stats["failed"]:
+        print(f"  Failed partitions ({len(stats['failed'])}):")
+        for i, error in stats["failed"]:
+            print(f"    {i}: {error}")
+        print(f"  Rerun the same command to retry them (checkpoint: {checkpoint_path})")
+    elif checkpoint_path.exists():
+        # Nothing left to resume.
+        checkpoint_path.unlink()
+
+
+def main(
+    dry_run: bool = False,
+    since: str = "2024-01-01",
+    method: str = "copy",
+    db_url: str | None = None,
+    merge_rows: int = MERGE_ROWS,
+    parallel: int = 1,
+    partitions: int | None = None,
+    checkpoint: Path = CHECKPOINT_PATH,
+    fresh: bool = False,
+):
+    universe = _load_universe()
+    dataset = open_price_dataset(PARQUET_PATH)
+    total_parquet_rows = dataset.count_rows()
+
+    print(f"Parquet total rows : {total_parquet_rows:,}")
+    print(f"Universe tickers   : {len(universe)}")
+    print(f"Loading since      : {since}")
+
+    if dry_run:
+        print("Counting filtered rows...")
+        print(f"Rows to load       : {count_filtered_rows(dataset, since, universe):,}")
+        print("[dry-run] No data written.")
+        return
+
+    if parallel > 1:
+        _load_parallel(since, universe, db_url, merge_rows, parallel, partitions, checkpoint, fresh)
+    elif method == "values":
+        _load_values(dataset, since, universe, db_url)
+    else:
+        _load_copy(since, universe, db_url, merge_rows)
+
+
+def parse_args() -> argparse.Namespace:
     parser = argparse.ArgumentParser()
     parser.add_argument("--dry-run", action="store_true")
     parser.add_argument("--since", default="2024-01-01", help="Load data from this date (YYYY-MM-DD)")
+    parser.add_argument(
+        "--method",
+        choices=["copy", "values"],
+        default="copy",
+        help="copy: COPY into a staging table + one merge per chunk; values: batched INSERT ... VALUES",
+    )
+    parser.add_argument("--merge-rows", type=int, default=MERGE_ROWS, help="Rows staged per merge transaction (copy)")
+    parser.add_argument("--db-url", default=None, help="Postgres URL (default: SUPABASE_DB_URL)")
+    parser.add_argument(
+        "--parallel",
+        type=int,
+        default=1,
+        help="Load ticker-range partitions on N connections at once (copy method, resumable)",
+    )
+    parser.add_argument(
+        "--partitions",
+        type=int,
+        default=None,
+        help=f"Partition count for --parallel (default: {PARTITIONS_PER_WORKER} per connection)",
+    )
+    parser.add_argument("--checkpoint", type=Path, default=CHECKPOINT_PATH, help="Checkpoint file for --parallel")
+    parser.add_argument("--fresh", action="store_true", help="Ignore an existing --parallel checkpoint and start over")
     args = parser.parse_args()
-    main(dry_run=args.dry_run, since=args.since)
+    if args.parallel > 1 and args.method != "copy":
+        parser.error("--parallel requires --method copy")
+    return args
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    main(
+        dry_run=args.dry_run,
+        since=args.since,
+        method=args.method,
+        db_url=args.db_url,
+        merge_rows=args.merge_rows,
+        parallel=args.parallel,
+        partitions=args.partitions,
+        checkpoint=args.checkpoint,
+        fresh=args.fresh,
+    )
@@ -0,0 +1,258 @@
+from __future__ import annotations
+
+"""
+Local stand-in for the Polygon.io endpoints used by fetch_polygon.
+
+Serves Grouped Daily and per-ticker Aggregates responses from synthetic,
+deterministic bars (or from recorded responses in an API cache directory),
+with configurable latency, injected 429s and payload size. Point the
+ingestion jobs at it with POLYGON_BASE_URL.
+
+Usage:
+    python scripts/polygon_stub_server.py --symbols 10000 --latency-ms 50 --error-every 10
+    POLYGON_BASE_URL=http://127.0.0.1:8765 POLYGON_API_KEY=stub \\
+        python -m src.ingestion.backfill_polygon --requests-per-minute 0
+
+    # Replay responses recorded with --api-cache against the live API
+    python scripts/polygon_stub_server.py --replay data/raw/_api_cache
+"""
+
+import argparse
+import json
+import re
+import threading
+import time
+import zlib
+from datetime import date, datetime, time as dt_time, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qsl, urlsplit
+import sys
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.utils.api_cache import ResponseCache
+
+LIVE_BASE_URL = "https://api.polygon.io"
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+DEFAULT_SYMBOLS = 10_000
+
+_GROUPED_PATH = re.compile(r"^/v2/aggs/grouped/locale/us/market/stocks/(\d{4}-\d{2}-\d{2})$")
+_RANGE_PATH = re.compile(r"^/v2/aggs/ticker/([^/]+)/range/1/day/(\d{4}-\d{2}-\d{2})/(\d{4}-\d{2}-\d{2})$")
+
+
+def synthetic_symbols(count: int) -> list[str]:
+    return [f"S{i:05d}" for i in range(count)]
+
+
+def synthetic_bar(symbol: str, day: date) -> dict:
+    """Deterministic OHLCV bar for (symbol, day) in Polygon's result format."""
+    seed = zlib.crc32(f"{symbol}|{day.isoformat()}".encode())
+    close = 5.0 + (seed % 100_000) / 100.0
+    midnight = datetime.combine(day, dt_time(), tzinfo=timezone.utc)
+    return {
+        "T": symbol,
+        "v": float(1_000 + seed % 5_000_000),
+        "vw": round(close * 1.001, 4),
+        "o": round(close * 0.995, 4),
+        "c": close,
+        "h": round(close * 1.01, 4),
+        "l": round(close * 0.99, 4),
+        "t": int(midnight.timestamp() * 1000),
+        "n": 1 + seed % 20_000,
+    }
+
+
+def _envelope(results: list[dict], **extra) -> dict:
+    body = {"queryCount": len(results), "resultsCount": len(results), "adjusted": True}
+    body.update(extra)
+    if results:
+        # Like Polygon, the "results" key is omitted when nothing matched.
+        body["results"] = results
+    body.update({"status": "OK", "request_id": "stub", "count": len(results)})
+    return body
+
+
+class PolygonStub:
+    """
+    Threaded HTTP stand-in. start() returns the base URL to use as
+    POLYGON_BASE_URL; stats counts requests, injected 429s and bytes sent.
+
+    error_every=N answers every Nth request with 429 (Retry-After:
+    retry_after seconds). With replay_dir, recorded live responses are served
+    and requests without a recording get 404.
+    """
+
+    def __init__(
+        self,
+        symbols: list[str] | None = None,
+        latency_ms: float = 0.0,
+        error_every: int = 0,
+        retry_after: float = 0.0,
+        replay_dir: Path | None = None,
+        host: str = DEFAULT_HOST,
+        port: int = 0,
+    ) -> None:
+        self.symbols = list(symbols) if symbols is not None else synthetic_symbols(DEFAULT_SYMBOLS)
+        self._symbol_set = set(self.symbols)
+        self.latency_seconds = latency_ms / 1000.0
+        self.error_every = error_every
+        self.retry_after = retry_after
+        self.replay = ResponseCache(replay_dir) if replay_dir is not None else None
+        self.stats = {"requests": 0, "throttled": 0, "not_found": 0, "bytes": 0}
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread: threading.Thread | None = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> str:
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self.base_url
+
+    def serve_forever(self) -> None:
+        """Serve on the calling thread until interrupted."""
+        try:
+            self._server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self._server.server_close()
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self) -> PolygonStub:
+        self.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def respond(self, path: str, params: dict[str, str]) -> tuple[int, dict[str, str], bytes]:
+        """Status, headers and body for one GET request."""
+        with self._lock:
+            self.stats["requests"] += 1
+            throttle = self.error_every > 0 and self.stats["requests"] % self.error_every == 0
+            if throttle:
+                self.stats["throttled"] += 1
+        if self.latency_seconds:
+            time.sleep(self.latency_seconds)
+        if throttle:
+            body = {"status": "ERROR", "error": "You've exceeded the maximum requests per minute."}
+            return 429, {"Retry-After": f"{self.retry_after:g}"}, json.dumps(body).encode()
+
+        payload = self._replayed(path, params) if self.replay is not None else self._synthetic(path, params)
+        if payload is None:
+            with self._lock:
+                self.stats["not_found"] += 1
+            return 404, {}, json.dumps({"status": "NOT_FOUND", "request_id": "stub"}).encode()
+        with self._lock:
+            self.stats["bytes"] += len(payload)
+        return 200, {}, payload
+
+    def _replayed(self, path: str, params: dict[str, str]) -> bytes | None:
+        return self.replay.get(f"{LIVE_BASE_URL}{path}", params, as_of=date.min)
+
+    def _synthetic(self, path: str, params: dict[str, str]) -> bytes | None:
+        grouped = _GROUPED_PATH.match(path)
+        if grouped:
+            day = date.fromisoformat(grouped.group(1))
+            results = [synthetic_bar(s, day) for s in self.symbols] if day.weekday() < 5 else []
+            return json.dumps(_envelope(results)).encode()
+
+        ranged = _RANGE_PATH.match(path)
+        if ranged:
+            ticker = ranged.group(1)
+            start, end = date.fromisoformat(ranged.group(2)), date.fromisoformat(ranged.group(3))
+            limit = int(params.get("limit", 5000))
+            results = []
+            if ticker in self._symbol_set:
+                day = start
+                while day <= end and len(results) < limit:
+                    if day.weekday() < 5:
+                        bar = synthetic_bar(ticker, day)
+                        del bar["T"]  # Aggregates results carry the ticker in the envelope only.
+                        results.append(bar)
+                    day += timedelta(days=1)
+            return json.dumps(_envelope(results, ticker=ticker)).encode()
+        return None
+
+    def _handler_class(self) -> type[BaseHTTPRequestHandler]:
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self) -> None:
+                url = urlsplit(self.path)
+                status, headers, body = stub.respond(url.path, dict(parse_qsl(url.query)))
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format: str, *args) -> None:
+                pass
+
+        return Handler
+
+
+def _read_symbols(path: Path) -> list[str]:
+    lines = [line.strip() for line in path.read_text(encoding="utf-8").splitlines()]
+    # Accept a universe CSV (first column, header "symbol") or one ticker per line.
+    symbols = [line.split(",")[0].strip().upper() for line in lines if line]
+    if symbols and symbols[0] == "SYMBOL":
+        symbols = symbols[1:]
+    # Polygon spells share classes with a dot (BRK.B).
+    return [s.replace("-", ".") for s in symbols]
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Serve a local stand-in for the Polygon.io aggregates API.")
+    parser.add_argument("--host", type=str, default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--symbols", type=int, default=DEFAULT_SYMBOLS, help="Synthetic symbols per grouped-daily payload.")
+    parser.add_argument("--symbols-file", type=Path, default=None, help="Universe CSV or ticker list to serve instead.")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Delay added to every response.")
+    parser.add_argument("--error-every", type=int, default=0, help="Answer every Nth request with 429 (0 = never).")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Retry-After seconds sent with injected 429s.")
+    parser.add_argument("--replay", type=Path, default=None, help="Serve recorded responses from an API cache directory.")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    symbols = _read_symbols(args.symbols_file) if args.symbols_file else synthetic_symbols(args.symbols)
+    stub = PolygonStub(
+        symbols=symbols,
+        latency_ms=args.latency_ms,
+        error_every=args.error_every,
+        retry_after=args.retry_after,
+        replay_dir=args.replay,
+        host=args.host,
+        port=args.port,
+    )
+    source = f"recorded responses in {args.replay}" if args.replay else f"{len(symbols):,} synthetic symbols"
+    print(f"Polygon stand-in serving {source} at {stub.base_url}")
+    print(f"  export POLYGON_BASE_URL={stub.base_url} POLYGON_API_KEY=stub")
+    stub.serve_forever()
+    print(f"Stats: {stub.stats}")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,27 +4,66 @@ scripts/pull_from_supabase.py
 Pull all rows from Supabase stock_prices table and rebuild the local
 raw parquet file in the exact schema used by the pipeline.
 
+Rows are streamed through a named (server-side) cursor in --batch-rows
+batches; each batch is converted to Arrow and written as its own row group,
+so memory stays bounded by one batch regardless of table size. The file is
+written to a temp sibling and renamed into place when complete.
+
+Every pull records a watermark (max ingested_at and date) in
+_supabase_pull.json. --incremental fetches only rows newer than it, minus
+--lookback-days on both bounds, which also catches rows that writers stamped
+with an earlier ingested_at but committed later (backfill runs stamp their
+start time). The delta is deduplicated against the key index and appended as
+regular raw fragments. Rows backfilled for dates older than the lookback
+window need a full pull. The daily workflow restores the raw directory
+(watermark included) from the Actions cache and runs --incremental; without
+a cached copy it falls back to a full pull.
+
 Usage:
-    python scripts/pull_from_supabase.py             # full rebuild
-    python scripts/pull_from_supabase.py --dry-run   # show row count only
+    python scripts/pull_from_supabase.py                       # full rebuild
+    python scripts/pull_from_supabase.py --incremental         # sync only new rows
+    python scripts/pull_from_supabase.py --dry-run             # show row count only
+    python scripts/pull_from_supabase.py --batch-rows 50000    # smaller batches / row groups
 """
 
 import argparse
-import os
+import json
+import sys
 import time
-from datetime import datetime, timezone
+from datetime import date, datetime, timedelta, timezone
 from pathlib import Path
+from typing import Any, Callable, Iterator
 
-import pandas as pd
 import pyarrow as pa
-import pyarrow.parquet as pq
+import pyarrow.compute as pc
 from dotenv import load_dotenv
-import psycopg2
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.db.postgres import connection
+from src.utils.atomic_io import atomic_path, write_json_atomic
+from src.utils.raw_key_index import new_key_mask, refresh_key_index
+from src.utils.raw_store import (
+    DEFAULT_ROW_GROUP_ROWS,
+    RAW_BASE_FILE_NAME,
+    RAW_DATASET_DIR,
+    SUPABASE_PULL_STATE_NAME,
+    RowGroupBufferedWriter,
+    append_raw_fragment,
+    clear_raw_fragments,
+    refresh_raw_sidecars,
+)
 
 load_dotenv()
 
-PARQUET_PATH = Path("data/raw/stock_price_stooq/stock_prices.parquet")
-DB_URL = os.environ["SUPABASE_DB_URL"]
+PARQUET_PATH = RAW_DATASET_DIR / RAW_BASE_FILE_NAME
+# One fetchmany batch per parquet row group.
+DEFAULT_BATCH_ROWS = DEFAULT_ROW_GROUP_ROWS
+CURSOR_NAME = "stock_prices_pull"
+PULL_STATE_VERSION = 1
+DEFAULT_LOOKBACK_DAYS = 7
 
 RAW_SCHEMA = pa.schema(
     [
@@ -42,63 +81,290 @@ RAW_SCHEMA = pa.schema(
 )
 
 
-def main(dry_run: bool = False):
-    conn = psycopg2.connect(DB_URL)
-    print("Connected to Supabase.")
+# Columns arrive in RAW_SCHEMA order; numerics are cast server-side so
+# psycopg2 returns floats rather than Decimals.
+PULL_SQL = """
+    SELECT source_system, ingested_at, source_ticker, to_char(date, 'YYYY-MM-DD'),
+           open::float8, high::float8, low::float8, close::float8, volume::float8
+    FROM stock_prices
+    ORDER BY source_ticker, date
+"""
+# Delta query: a loose index scan walks the distinct tickers of the
+# (source_ticker, date) primary key, then each ticker's recent dates are read
+# with one index range probe. No index on ingested_at is needed.
+INCREMENTAL_SQL = """
+    WITH RECURSIVE tickers AS (
+        (SELECT source_ticker FROM stock_prices ORDER BY source_ticker LIMIT 1)
+        UNION ALL
+        SELECT (
+            SELECT p.source_ticker FROM stock_prices p
+            WHERE p.source_ticker > t.source_ticker
+            ORDER BY p.source_ticker LIMIT 1
+        )
+        FROM tickers t
+        WHERE t.source_ticker IS NOT NULL
+    )
+    SELECT r.source_system, r.ingested_at, r.source_ticker, to_char(r.date, 'YYYY-MM-DD'),
+           r.open::float8, r.high::float8, r.low::float8, r.close::float8, r.volume::float8
+    FROM tickers t
+    CROSS JOIN LATERAL (
+        SELECT * FROM stock_prices p
+        WHERE p.source_ticker = t.source_ticker AND p.date >= %(since_date)s
+    ) r
+    WHERE t.source_ticker IS NOT NULL AND r.ingested_at >= %(since_ingested_at)s
+    ORDER BY r.source_ticker, r.date
+"""
+PULL_RUN_ID = "supabase_pull"
+
+
+def rows_to_table(rows: list[tuple]) -> pa.Table:
+    """Convert one fetchmany batch (PULL_SQL column order) to a RAW_SCHEMA table."""
+    source_system, ingested_at, symbol, payload_date, *prices = zip(*rows)
+    arrays = [
+        pa.array(source_system, pa.string()),
+        pa.repeat(pa.scalar(PULL_RUN_ID), len(rows)),
+        pa.array(ingested_at, pa.timestamp("us", tz="UTC")),
+        pa.array(symbol, pa.string()),
+        pa.array(payload_date, pa.string()),
+        *(pa.array(col, pa.float64()) for col in prices),
+    ]
+    return pa.Table.from_arrays(arrays, schema=RAW_SCHEMA)
+
+
+def iter_row_batches(
+    conn,
+    batch_rows: int,
+    sql: str = PULL_SQL,
+    params: dict[str, Any] | None = None,
+) -> Iterator[list[tuple]]:
+    """Stream a query through a named cursor, batch_rows rows at a time."""
+    with conn.cursor(name=CURSOR_NAME) as cur:
+        cur.itersize = batch_rows
+        cur.execute(sql, params)
+        while True:
+            rows = cur.fetchmany(batch_rows)
+            if not rows:
+                break
+            yield rows
+
 
+def _advance_watermark(stats: dict[str, Any], table: pa.Table) -> None:
+    """Raise stats' max_ingested_at / max_date to cover table."""
+    for key, column in (("max_ingested_at", "ingested_at"), ("max_date", "payload_date")):
+        value = pc.max(table[column]).as_py()
+        if value is not None and (stats.get(key) is None or value > stats[key]):
+            stats[key] = value
+
+
+def load_pull_state(dataset_dir: Path) -> dict[str, Any] | None:
+    """Watermark of the last pull, or None when missing or unusable."""
+    path = dataset_dir / SUPABASE_PULL_STATE_NAME
+    try:
+        state = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, json.JSONDecodeError):
+        return None
+    if state.get("version") != PULL_STATE_VERSION or not (dataset_dir / RAW_BASE_FILE_NAME).exists():
+        return None
+    try:
+        return {
+            "max_ingested_at": datetime.fromisoformat(state["max_ingested_at"]),
+            "max_date": date.fromisoformat(state["max_date"]),
+        }
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def save_pull_state(dataset_dir: Path, max_ingested_at: datetime, max_date: str | date) -> None:
+    state = {
+        "version": PULL_STATE_VERSION,
+        "max_ingested_at": max_ingested_at.isoformat(),
+        "max_date": str(max_date),
+        "pulled_at": datetime.now(timezone.utc).isoformat(),
+    }
+    write_json_atomic(dataset_dir / SUPABASE_PULL_STATE_NAME, state, indent=2)
+
+
+def pull_to_parquet(
+    conn,
+    out_path: Path,
+    batch_rows: int = DEFAULT_BATCH_ROWS,
+    total: int | None = None,
+    compact: bool = False,
+    log: Callable[[str], None] = print,
+) -> dict[str, Any]:
+    """
+    Write every stock_prices row to out_path, one row group per batch.
+    Returns rows, row groups, fetch/write timings and the watermark.
+    """
+    stats = {"rows": 0, "row_groups": 0, "fetch_seconds": 0.0, "write_seconds": 0.0}
+    stats.update(max_ingested_at=None, max_date=None)
+    t0 = time.perf_counter()
+    with atomic_path(out_path) as tmp_path:
+        with RowGroupBufferedWriter(tmp_path, RAW_SCHEMA, row_group_rows=batch_rows, compact=compact) as writer:
+            batches = iter_row_batches(conn, batch_rows)
+            while True:
+                t = time.perf_counter()
+                rows = next(batches, None)
+                stats["fetch_seconds"] += time.perf_counter() - t
+                if rows is None:
+                    break
+                t = time.perf_counter()
+                table = rows_to_table(rows)
+                _advance_watermark(stats, table)
+                writer.write_table(table)
+                writer.flush()
+                stats["write_seconds"] += time.perf_counter() - t
+                stats["rows"] += len(rows)
+
+                elapsed = time.perf_counter() - t0
+                rps = stats["rows"] / elapsed if elapsed > 0 else 0.0
+                progress = f"{stats['rows']:>12,}"
+                if total:
+                    eta = (total - stats["rows"]) / rps if rps > 0 else 0.0
+                    progress += f" / {total:,} ({stats['rows'] / total * 100:.1f}%)  ETA {eta / 60:.1f}min"
+                log(f"  {progress}  {rps:,.0f} rows/s")
+        stats["row_groups"] = writer.row_groups_written
+    stats["seconds"] = time.perf_counter() - t0
+    return stats
+
+
+def pull_incremental(
+    conn,
+    dataset_dir: Path,
+    state: dict[str, Any],
+    lookback_days: int = DEFAULT_LOOKBACK_DAYS,
+    batch_rows: int = DEFAULT_BATCH_ROWS,
+) -> dict[str, Any]:
+    """
+    Append stock_prices rows newer than the watermark in state (minus
+    lookback_days) to dataset_dir and advance the watermark.
+    Returns fetched/appended/duplicate counts, the fragments and timings.
+    """
+    params = {
+        "since_date": state["max_date"] - timedelta(days=lookback_days),
+        "since_ingested_at": state["max_ingested_at"] - timedelta(days=lookback_days),
+    }
+    t0 = time.perf_counter()
+    tables = [rows_to_table(rows) for rows in iter_row_batches(conn, batch_rows, INCREMENTAL_SQL, params)]
+    fetch_seconds = time.perf_counter() - t0
+    stats: dict[str, Any] = {"fetched": 0, "appended": 0, "duplicates": 0, "fragments": []}
+    stats.update(max_ingested_at=state["max_ingested_at"], max_date=state["max_date"].isoformat())
+
+    if tables:
+        delta = pa.concat_tables(tables)
+        _advance_watermark(stats, delta)
+        # The lookback re-reads rows already stored locally; keep only new keys.
+        refresh_key_index(dataset_dir)
+        is_new = new_key_mask(dataset_dir, delta["symbol_raw"].to_numpy(zero_copy_only=False), delta["payload_date"])
+        new = delta.filter(pa.array(is_new))
+        run_id = f"supabase_{datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')}"
+        stats["fragments"] = append_raw_fragment(dataset_dir, new, run_id)
+        stats.update(fetched=delta.num_rows, appended=new.num_rows, duplicates=delta.num_rows - new.num_rows)
+
+    # Saved after the append: a crash in between only re-fetches the delta.
+    save_pull_state(dataset_dir, stats["max_ingested_at"], stats["max_date"])
+    stats.update(fetch_seconds=fetch_seconds, seconds=time.perf_counter() - t0)
+    return stats
+
+
+def _full_pull(conn, batch_rows: int, compact: bool) -> None:
     with conn.cursor() as cur:
         cur.execute("SELECT COUNT(*) FROM stock_prices")
         total = cur.fetchone()[0]
     print(f"Rows in stock_prices: {total:,}")
 
-    if dry_run:
-        conn.close()
-        print("[dry-run] No parquet written.")
-        return
+    print(f"Streaming rows in batches of {batch_rows:,}...")
+    stats = pull_to_parquet(conn, PARQUET_PATH, batch_rows=batch_rows, total=total, compact=compact)
 
-    t0 = time.time()
-    print("Fetching all rows...")
+    # Supabase already holds every appended row, so local fragments are stale.
+    cleared = clear_raw_fragments(PARQUET_PATH.parent)
+    if cleared:
+        print(f"Removed {cleared} stale partition folder(s)")
+    refresh_raw_sidecars(PARQUET_PATH.parent)
+    if stats["max_ingested_at"] is not None:
+        save_pull_state(PARQUET_PATH.parent, stats["max_ingested_at"], stats["max_date"])
 
-    sql = """
-        SELECT source_ticker, ticker, date, open, high, low, close,
-               volume, source_system, ingested_at
-        FROM stock_prices
-        ORDER BY source_ticker, date
-    """
-    df = pd.read_sql(sql, conn)
-    conn.close()
-    print(f"  Fetched {len(df):,} rows in {time.time() - t0:.1f}s")
-
-    # Map to raw parquet schema
-    raw = pd.DataFrame(
-        {
-            "source_system": df["source_system"].astype("str"),
-            "ingestion_run_id": "supabase_pull",
-            "ingested_at": pd.to_datetime(df["ingested_at"], utc=True),
-            "symbol_raw": df["source_ticker"].astype("str"),
-            "payload_date": pd.to_datetime(df["date"]).dt.strftime("%Y-%m-%d"),
-            "open_raw": df["open"].astype("float64"),
-            "high_raw": df["high"].astype("float64"),
-            "low_raw": df["low"].astype("float64"),
-            "close_raw": df["close"].astype("float64"),
-            "volume_raw": df["volume"].astype("float64"),
-        }
+    rps = stats["rows"] / stats["seconds"] if stats["seconds"] > 0 else 0.0
+    print(f"\nParquet written: {PARQUET_PATH}")
+    print(f"  Rows:       {stats['rows']:,}")
+    print(f"  Row groups: {stats['row_groups']:,}")
+    print(f"  Time:       {stats['seconds']:.1f}s ({rps:,.0f} rows/s)")
+    print(f"    fetch:    {stats['fetch_seconds']:.1f}s")
+    print(f"    write:    {stats['write_seconds']:.1f}s")
+    print(f"  Watermark:  ingested_at {stats['max_ingested_at']}, date {stats['max_date']}")
+
+
+def _incremental_pull(conn, state: dict[str, Any], lookback_days: int, batch_rows: int) -> None:
+    print(
+        f"Watermark: ingested_at {state['max_ingested_at'].isoformat()}, date {state['max_date']} "
+        f"(lookback {lookback_days} day(s))"
     )
+    stats = pull_incremental(conn, PARQUET_PATH.parent, state, lookback_days=lookback_days, batch_rows=batch_rows)
+    for frag in stats["fragments"]:
+        print(f"  Wrote fragment: {frag}")
+    rps = stats["fetched"] / stats["fetch_seconds"] if stats["fetch_seconds"] > 0 else 0.0
+    print("\nIncremental pull completed")
+    print(f"  Fetched:    {stats['fetched']:,} rows in {stats['fetch_seconds']:.1f}s ({rps:,.0f} rows/s)")
+    print(f"  Appended:   {stats['appended']:,}")
+    print(f"  Duplicates: {stats['duplicates']:,} (already stored locally)")
+    print(f"  Time:       {stats['seconds']:.1f}s")
+    print(f"  Watermark:  ingested_at {stats['max_ingested_at']}, date {stats['max_date']}")
 
-    PARQUET_PATH.parent.mkdir(parents=True, exist_ok=True)
 
-    table = pa.Table.from_pandas(raw, schema=RAW_SCHEMA, preserve_index=False)
-    pq.write_table(table, PARQUET_PATH, compression="snappy")
+def main(
+    dry_run: bool = False,
+    batch_rows: int = DEFAULT_BATCH_ROWS,
+    compact: bool = False,
+    incremental: bool = False,
+    lookback_days: int = DEFAULT_LOOKBACK_DAYS,
+):
+    state = load_pull_state(PARQUET_PATH.parent) if incremental else None
+    if incremental and state is None:
+        print(f"No usable pull watermark in {PARQUET_PATH.parent} — running a full pull.")
 
-    elapsed = time.time() - t0
-    final_pf = pq.ParquetFile(PARQUET_PATH)
-    print(f"\nParquet written: {PARQUET_PATH}")
-    print(f"  Rows: {final_pf.metadata.num_rows:,}")
-    print(f"  Time: {elapsed:.1f}s")
+    with connection() as conn:
+        print("Connected to Supabase.")
+        if dry_run:
+            with conn.cursor() as cur:
+                cur.execute("SELECT COUNT(*) FROM stock_prices")
+                print(f"Rows in stock_prices: {cur.fetchone()[0]:,}")
+            print("[dry-run] No parquet written.")
+        elif state is not None:
+            _incremental_pull(conn, state, lookback_days, batch_rows)
+        else:
+            _full_pull(conn, batch_rows, compact)
 
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("--dry-run", action="store_true", help="Show row count only")
+    parser.add_argument(
+        "--batch-rows",
+        type=int,
+        default=DEFAULT_BATCH_ROWS,
+        help="Rows per server-side cursor fetch; each batch becomes one row group",
+    )
+    parser.add_argument(
+        "--compact",
+        action="store_true",
+        help="Write the compact storage schema (see src/ingestion/migrate_raw_schema.py)",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Append only rows newer than the last pull's watermark (full pull if there is none)",
+    )
+    parser.add_argument(
+        "--lookback-days",
+        type=int,
+        default=DEFAULT_LOOKBACK_DAYS,
+        help="Days re-read below the watermark on both ingested_at and date (incremental)",
+    )
     args = parser.parse_args()
-    main(dry_run=args.dry_run)
+    main(
+        dry_run=args.dry_run,
+        batch_rows=args.batch_rows,
+        compact=args.compact,
+        incremental=args.incremental,
+        lookback_days=args.lookback_days,
+    )
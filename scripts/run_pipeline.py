@@ -13,6 +13,8 @@ import pyarrow.parquet as pq
 
 REPO_ROOT = Path(__file__).resolve().parent.parent
 RUNS_ROOT = REPO_ROOT / "output" / "pipeline_runs"
+# Universe-only typed price store (step 2); price readers use it instead of the full raw dump.
+UNIVERSE_STORE_PATH = "data/staging/stock_price_stooq/universe_prices.parquet"
 
 
 def utc_now_iso() -> str:
@@ -36,36 +38,49 @@ PIPELINE_STEPS: list[dict[str, Any]] = [
     },
     {
         "step_no": 2,
+        "step_name": "build_universe_price_store",
+        "script": "src/transform/build_universe_price_store.py",
+        "module": "src.transform.build_universe_price_store",
+        "stop_on_failure": True,
+        "outputs": [
+            {"path": "data/staging/stock_price_stooq/universe_prices.parquet", "type": "parquet", "check_rows": True},
+        ],
+    },
+    {
+        "step_no": 3,
         "step_name": "build_ticker_master",
         "script": "src/transform/build_ticker_master.py",
         "module": "src.transform.build_ticker_master",
+        "args": ["--input-parquet", UNIVERSE_STORE_PATH],
         "stop_on_failure": True,
         "outputs": [
             {"path": "data/staging/stock_price_stooq/ticker_master.parquet", "type": "parquet", "check_rows": True},
         ],
     },
     {
-        "step_no": 3,
+        "step_no": 4,
         "step_name": "build_latest_snapshot",
         "script": "src/transform/build_latest_snapshot.py",
         "module": "src.transform.build_latest_snapshot",
+        "args": ["--input-parquet", UNIVERSE_STORE_PATH],
         "stop_on_failure": False,
         "outputs": [
             {"path": "data/staging/stock_price_stooq/latest_snapshot.parquet", "type": "parquet", "check_rows": True},
         ],
     },
     {
-        "step_no": 4,
+        "step_no": 5,
         "step_name": "build_price_features",
         "script": "src/features/build_price_features.py",
         "module": "src.features.build_price_features",
+        "args": ["--input-parquet", UNIVERSE_STORE_PATH],
         "stop_on_failure": True,
         "outputs": [
             {"path": "data/mart/investment/factor_features.parquet", "type": "parquet", "check_rows": True},
         ],
     },
     {
-        "step_no": 5,
+        "step_no": 6,
         "step_name": "build_factor_snapshot_latest",
         "script": "src/ranking/build_factor_snapshot_latest.py",
         "module": "src.ranking.build_factor_snapshot_latest",
@@ -79,7 +94,7 @@ PIPELINE_STEPS: list[dict[str, Any]] = [
         ],
     },
     {
-        "step_no": 6,
+        "step_no": 7,
         "step_name": "build_rankings",
         "script": "src/ranking/build_rankings.py",
         "module": "src.ranking.build_rankings",
@@ -90,7 +105,7 @@ PIPELINE_STEPS: list[dict[str, Any]] = [
         ],
     },
     {
-        "step_no": 7,
+        "step_no": 8,
         "step_name": "build_signal_heatmap_snapshot",
         "script": "src/visualization/build_signal_heatmap_snapshot.py",
         "module": "src.visualization.build_signal_heatmap_snapshot",
@@ -104,7 +119,7 @@ PIPELINE_STEPS: list[dict[str, Any]] = [
         ],
     },
     {
-        "step_no": 8,
+        "step_no": 9,
         "step_name": "build_visualization_exports",
         "script": "src/visualization/build_visualization_exports.py",
         "module": "src.visualization.build_visualization_exports",
@@ -123,7 +138,7 @@ PIPELINE_STEPS: list[dict[str, Any]] = [
         ],
     },
     {
-        "step_no": 9,
+        "step_no": 10,
         "step_name": "build_sarimax_forecast",
         "script": "src/features/build_sarimax_forecast.py",
         "module": "src.features.build_sarimax_forecast",
@@ -246,7 +261,7 @@ def write_step_log(
 def execute_step(step: dict[str, Any], run_dir: Path, dry_run: bool) -> dict[str, Any]:
     started_at = utc_now_iso()
     log_path = run_dir / f"step_{step['step_no']}_{step['step_name']}.log"
-    command = [sys.executable, "-m", step["module"]]
+    command = [sys.executable, "-m", step["module"], *step.get("args", [])]
 
     if dry_run:
         ended_at = utc_now_iso()
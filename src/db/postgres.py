@@ -0,0 +1,177 @@
+from __future__ import annotations
+
+"""
+Pooled Postgres access shared by every Supabase reader and writer.
+
+Connections come from one ThreadedConnectionPool per database URL, so the
+daily jobs, the backfill flushes and the bulk scripts reuse sockets (and
+TLS sessions) instead of calling psycopg2.connect per write. upsert_rows
+streams pandas or Arrow chunks page by page, so no caller materializes the
+whole frame as a Python row list, and reports exact row counts and timings.
+
+Usage:
+    with connection() as conn:              # SUPABASE_DB_URL, commit on success
+        stats = upsert_rows(conn, "stock_prices", columns, chunks, conflict=["source_ticker", "date"])
+"""
+
+import atexit
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Iterable, Iterator, Sequence
+
+import pandas as pd
+import pyarrow as pa
+from psycopg2.extensions import connection as PgConnection
+from psycopg2.extras import execute_values
+from psycopg2.pool import ThreadedConnectionPool
+
+
+DB_URL_ENV = "SUPABASE_DB_URL"
+# psycopg2 keeps up to min_connections idle connections open between uses and
+# closes any extra ones when they are returned.
+DEFAULT_POOL_MIN_CONNECTIONS = 1
+DEFAULT_POOL_MAX_CONNECTIONS = 4
+# Rows per INSERT ... VALUES statement.
+DEFAULT_PAGE_ROWS = 1000
+
+_pools: dict[str, ThreadedConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+Chunk = pd.DataFrame | pa.Table
+
+
+def database_url(db_url: str | None = None) -> str | None:
+    """db_url when given, else SUPABASE_DB_URL; None when neither is set."""
+    return db_url or os.environ.get(DB_URL_ENV) or None
+
+
+def get_pool(
+    db_url: str,
+    min_connections: int = DEFAULT_POOL_MIN_CONNECTIONS,
+    max_connections: int = DEFAULT_POOL_MAX_CONNECTIONS,
+) -> ThreadedConnectionPool:
+    """The process-wide pool for db_url, created on first use."""
+    with _pools_lock:
+        pool = _pools.get(db_url)
+        if pool is None or pool.closed:
+            pool = ThreadedConnectionPool(min_connections, max_connections, db_url)
+            _pools[db_url] = pool
+        return pool
+
+
+@atexit.register
+def close_pools() -> None:
+    with _pools_lock:
+        for pool in _pools.values():
+            if not pool.closed:
+                pool.closeall()
+        _pools.clear()
+
+
+@contextmanager
+def connection(db_url: str | None = None) -> Iterator[PgConnection]:
+    """
+    Borrow a pooled connection. The transaction commits when the block exits
+    cleanly and rolls back otherwise; broken connections are discarded.
+    """
+    url = database_url(db_url)
+    if url is None:
+        raise KeyError(f"{DB_URL_ENV} is not set")
+    pool = get_pool(url)
+    conn = pool.getconn()
+    try:
+        yield conn
+        conn.commit()
+    except BaseException:
+        if not conn.closed:
+            conn.rollback()
+        raise
+    finally:
+        pool.putconn(conn, close=bool(conn.closed))
+
+
+def upsert_sql(
+    table_name: str,
+    columns: Sequence[str],
+    conflict: Sequence[str],
+    update: Sequence[str] | None = None,
+) -> str:
+    """
+    INSERT ... VALUES %s for execute_values. ON CONFLICT DO NOTHING unless
+    update lists the columns to overwrite from EXCLUDED.
+    """
+    action = "DO NOTHING"
+    if update:
+        action = "DO UPDATE SET " + ", ".join(f"{c} = EXCLUDED.{c}" for c in update)
+    return (
+        f"INSERT INTO {table_name} ({', '.join(columns)}) VALUES %s "
+        f"ON CONFLICT ({', '.join(conflict)}) {action}"
+    )
+
+
+def _to_table(chunk: Chunk, columns: Sequence[str]) -> pa.Table:
+    if isinstance(chunk, pd.DataFrame):
+        # NaN/NaT become NULL rather than 'NaN'::numeric.
+        chunk = pa.Table.from_pandas(chunk[list(columns)], preserve_index=False)
+    return chunk.select(list(columns))
+
+
+def iter_row_pages(chunk: Chunk, columns: Sequence[str], page_rows: int = DEFAULT_PAGE_ROWS) -> Iterator[list[tuple]]:
+    """Row tuples of chunk, page_rows at a time; only one page lives as Python objects."""
+    table = _to_table(chunk, columns)
+    for offset in range(0, table.num_rows, page_rows):
+        page = table.slice(offset, page_rows)
+        yield list(zip(*(col.to_pylist() for col in page.columns)))
+
+
+def upsert_rows(
+    conn: PgConnection,
+    table_name: str,
+    columns: Sequence[str],
+    chunks: Chunk | Iterable[Chunk],
+    conflict: Sequence[str],
+    update: Sequence[str] | None = None,
+    page_rows: int = DEFAULT_PAGE_ROWS,
+    log: Callable[[dict[str, Any]], None] | None = None,
+) -> dict[str, Any]:
+    """
+    Upsert chunks (DataFrames or Arrow tables carrying columns) into
+    table_name, committing after each chunk.
+
+    Each page is its own statement, so "written" sums the exact per-page
+    rowcounts: inserted rows for DO NOTHING, inserted plus updated rows for
+    DO UPDATE. log, when given, receives the running stats after each chunk.
+    """
+    if isinstance(chunks, (pd.DataFrame, pa.Table)):
+        chunks = [chunks]
+    sql = upsert_sql(table_name, columns, conflict, update)
+    stats: dict[str, Any] = {"table": table_name, "rows": 0, "written": 0, "pages": 0, "chunks": 0, "db_seconds": 0.0}
+    t0 = time.perf_counter()
+    with conn.cursor() as cur:
+        for chunk in chunks:
+            for rows in iter_row_pages(chunk, columns, page_rows):
+                t = time.perf_counter()
+                execute_values(cur, sql, rows, page_size=len(rows))
+                stats["db_seconds"] += time.perf_counter() - t
+                stats["written"] += max(cur.rowcount, 0)
+                stats["rows"] += len(rows)
+                stats["pages"] += 1
+            t = time.perf_counter()
+            conn.commit()
+            stats["db_seconds"] += time.perf_counter() - t
+            stats["chunks"] += 1
+            stats["seconds"] = time.perf_counter() - t0
+            if log is not None:
+                log(stats)
+    stats["seconds"] = time.perf_counter() - t0
+    return stats
+
+
+def format_upsert_stats(stats: dict[str, Any]) -> str:
+    rps = stats["rows"] / stats["seconds"] if stats["seconds"] > 0 else 0.0
+    return (
+        f"{stats['table']}: {stats['written']:,} of {stats['rows']:,} rows written "
+        f"in {stats['seconds']:.2f}s ({stats['db_seconds']:.2f}s in Postgres, {rps:,.0f} rows/s)"
+    )
@@ -0,0 +1,59 @@
+from __future__ import annotations
+
+"""
+Supabase stock_prices mapping shared by the ingest, backfill and bulk-load writers.
+"""
+
+from typing import Any
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from src.db.postgres import connection, database_url, upsert_rows
+
+
+STOCK_PRICES_TABLE = "stock_prices"
+STOCK_PRICES_COLUMNS = (
+    "source_ticker", "ticker", "date", "open", "high", "low", "close", "volume", "source_system", "ingested_at",
+)
+STOCK_PRICES_KEY = ("source_ticker", "date")
+
+
+def to_stock_prices_table(raw: pa.Table) -> pa.Table:
+    """Raw dataset columns → stock_prices columns; rows without a symbol or date are dropped."""
+    symbols = pc.cast(raw["symbol_raw"], pa.string())
+    dates = raw["payload_date"]
+    if not pa.types.is_date32(dates.type):
+        dates = pc.cast(dates, pa.date32())
+    table = pa.table(
+        {
+            "source_ticker": symbols,
+            "ticker": pc.replace_substring_regex(symbols, pattern=r"\.\w+$", replacement=""),
+            "date": dates,
+            "open": pc.cast(raw["open_raw"], pa.float64()),
+            "high": pc.cast(raw["high_raw"], pa.float64()),
+            "low": pc.cast(raw["low_raw"], pa.float64()),
+            "close": pc.cast(raw["close_raw"], pa.float64()),
+            "volume": pc.cast(raw["volume_raw"], pa.float64()),
+            "source_system": pc.cast(raw["source_system"], pa.string()),
+            "ingested_at": raw["ingested_at"],
+        }
+    )
+    return table.filter(pc.and_(pc.is_valid(table["source_ticker"]), pc.is_valid(table["date"])))
+
+
+def upsert_raw_prices(raw: pd.DataFrame | pa.Table, db_url: str | None = None) -> dict[str, Any] | None:
+    """
+    Insert raw-schema rows into stock_prices, leaving existing keys untouched.
+    Returns the upsert stats ("written" = rows inserted), or None when no
+    database URL is configured.
+    """
+    if database_url(db_url) is None:
+        return None
+    if isinstance(raw, pd.DataFrame):
+        raw = pa.Table.from_pandas(raw, preserve_index=False)
+    with connection(db_url) as conn:
+        return upsert_rows(
+            conn, STOCK_PRICES_TABLE, STOCK_PRICES_COLUMNS, to_stock_prices_table(raw), conflict=STOCK_PRICES_KEY
+        )
@@ -13,7 +13,7 @@ from pathlib import Path
 import numpy as np
 import pandas as pd
 
-from src.utils.price_utils import DEFAULT_RAW_PARQUET, iter_normalized_price_chunks, normalize_ticker
+from src.utils.price_utils import DEFAULT_RAW_DATASET, iter_normalized_price_chunks, normalize_ticker
 
 
 DEFAULT_UNIVERSE_CSV = Path("input/finlify_core_universe.csv")
@@ -27,8 +27,8 @@ def parse_args() -> argparse.Namespace:
     parser.add_argument(
         "--input-parquet",
         type=Path,
-        default=DEFAULT_RAW_PARQUET,
-        help="Raw stock prices parquet path.",
+        default=DEFAULT_RAW_DATASET,
+        help="Raw stock prices parquet file or dataset directory.",
     )
     parser.add_argument(
         "--ticker-master",
@@ -176,10 +176,15 @@ def build_factor_features(
         raise ValueError("Universe is empty.")
 
     per_ticker_chunks: dict[str, list[pd.DataFrame]] = {}
-    for chunk in iter_normalized_price_chunks(input_parquet):
-        filtered = chunk[chunk["source_ticker"].isin(universe_tickers)][
-            ["source_ticker", "ticker", "date", "close", "volume"]
-        ]
+    # Push the universe filter into the parquet reader so only the universe's
+    # row groups and columns are decoded, not the whole market.
+    chunks = iter_normalized_price_chunks(
+        input_parquet,
+        symbols=universe_tickers,
+        columns=["source_ticker", "ticker", "date", "close", "volume"],
+    )
+    for chunk in chunks:
+        filtered = chunk[chunk["source_ticker"].isin(universe_tickers)]
         if filtered.empty:
             continue
 
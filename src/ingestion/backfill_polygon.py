@@ -14,33 +14,72 @@ Usage examples:
 
   # Backfill full universe up to yesterday
   python -m src.ingestion.backfill_polygon
+
+  # Paid plan: no rate limit, 8 concurrent requests
+  python -m src.ingestion.backfill_polygon --requests-per-minute 0 --workers 8
+
+  # Show the request plan and estimated wall time without fetching
+  python -m src.ingestion.backfill_polygon --dry-run
+
+A planner picks the cheapest mix of requests: one Grouped Daily call per
+trading day covers every ticker for that day, one Aggregates call covers
+one ticker's whole range. Tickers a few days behind are served by grouped
+calls for the most recent days, long gaps by per-ticker calls.
+
+Tickers are fetched concurrently under a token-bucket rate limit and new
+rows are flushed to the raw store every --flush-rows rows. Progress is kept
+in a checkpoint file; rerunning the same command after an interruption
+skips the tickers that were already written. With --api-cache, responses
+for past dates are kept on disk and replayed without touching the API or
+the rate limit.
 """
 
 from __future__ import annotations
 
 import argparse
-import os
-import shutil
-import tempfile
-import time
+import json
+import math
 import uuid
+from bisect import bisect_left
 from datetime import date, datetime, timedelta, timezone
 from pathlib import Path
+from typing import Any
 
+import numpy as np
 import pandas as pd
-import psycopg2
 import pyarrow as pa
-import pyarrow.parquet as pq
-from psycopg2.extras import execute_values
 
-from src.ingestion.fetch_polygon import fetch_ticker_range
+from src.db.postgres import format_upsert_stats
+from src.db.stock_prices import upsert_raw_prices
+from src.ingestion.fetch_polygon import (
+    API_CACHE_DIR,
+    enable_response_cache,
+    fetch_grouped_daily,
+    fetch_ticker_range,
+)
+from src.utils.atomic_io import write_json_atomic
+from src.utils.parallel_scan import bounded_map
+from src.utils.price_utils import open_price_dataset, raw_row_count
+from src.utils.rate_limit import TokenBucket
+from src.utils.raw_key_index import new_key_mask, refresh_key_index
+from src.utils.raw_manifest import load_manifest, max_dates_from_manifest
+from src.utils.raw_store import RAW_DATASET_DIR, append_raw_fragment
 
 # ---------------------------------------------------------------------------
 # Config
 # ---------------------------------------------------------------------------
 UNIVERSE_CSV = Path("input/finlify_core_universe.csv")
-PARQUET_PATH = Path("data/raw/stock_price_stooq/stock_prices.parquet")
-RATE_LIMIT_SECONDS = 12
+RAW_PATH = RAW_DATASET_DIR
+CHECKPOINT_PATH = Path("data/raw/_backfill_checkpoint.json")
+CHECKPOINT_VERSION = 2
+# Polygon free tier: 5 requests/minute (the old fixed 12s sleep).
+DEFAULT_REQUESTS_PER_MINUTE = 5
+DEFAULT_BURST = 1
+DEFAULT_WORKERS = 4
+DEFAULT_FLUSH_ROWS = 50_000
+# Rough per-request latency, used only for --dry-run wall-time estimates.
+EST_REQUEST_SECONDS = 1.0
+STRATEGIES = ("auto", "grouped", "ticker")
 SOURCE_SYSTEM = "polygon_backfill"
 
 
@@ -55,10 +94,16 @@ def _load_universe() -> list[str]:
     return sorted(set(tickers))
 
 
-def _max_dates_per_ticker(parquet_path: Path) -> dict[str, date]:
-    """Read only the columns we need and compute max payload_date per symbol."""
-    pf = pq.ParquetFile(parquet_path)
-    table = pf.read(columns=["symbol_raw", "payload_date"])
+def _max_dates_per_ticker(raw_path: Path) -> dict[str, date]:
+    """Max payload_date per symbol, from the raw manifest when it is current.
+
+    Falls back to reading only the two key columns of the whole dataset.
+    """
+    manifest = load_manifest(raw_path)
+    if manifest is not None:
+        return max_dates_from_manifest(manifest)
+
+    table = open_price_dataset(raw_path).to_table(columns=["symbol_raw", "payload_date"])
     df = table.to_pandas()
     df["payload_date"] = pd.to_datetime(df["payload_date"], errors="coerce")
     max_dates = df.groupby("symbol_raw")["payload_date"].max()
@@ -88,208 +133,368 @@ def _polygon_to_raw_schema(
     return raw
 
 
-def _upsert_to_supabase(raw_df: pd.DataFrame) -> int | None:
-    """Upsert raw_df rows into Supabase stock_prices. Returns inserted count or None if skipped."""
-    db_url = os.environ.get("SUPABASE_DB_URL")
-    if not db_url:
-        print("  WARNING: SUPABASE_DB_URL not set — skipping Supabase upsert")
+def _checkpoint_key(tickers: list[str], since_date: date | None, end_date: date) -> dict[str, Any]:
+    return {
+        "tickers": tickers,
+        "since": since_date.isoformat() if since_date else None,
+        "end": end_date.isoformat(),
+    }
+
+
+def _load_checkpoint(path: Path, key: dict[str, Any]) -> dict[str, Any] | None:
+    """Return the checkpoint for the same tickers/date range, if one exists."""
+    if not path.exists():
         return None
+    try:
+        state = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, json.JSONDecodeError):
+        return None
+    if state.get("version") != CHECKPOINT_VERSION or state.get("key") != key:
+        return None
+    return state
 
-    out = pd.DataFrame(
-        {
-            "source_ticker": raw_df["symbol_raw"],
-            "ticker": raw_df["symbol_raw"].str.replace(r"\.\w+$", "", regex=True),
-            "date": raw_df["payload_date"],
-            "open": raw_df["open_raw"],
-            "high": raw_df["high_raw"],
-            "low": raw_df["low_raw"],
-            "close": raw_df["close_raw"],
-            "volume": raw_df["volume_raw"],
-            "source_system": raw_df["source_system"],
-            "ingested_at": raw_df["ingested_at"],
-        }
-    )
 
-    sql = """
-        INSERT INTO stock_prices
-            (source_ticker, ticker, date, open, high, low, close, volume, source_system, ingested_at)
-        VALUES %s
-        ON CONFLICT (source_ticker, date) DO NOTHING
+def _save_checkpoint(path: Path, state: dict[str, Any]) -> None:
+    write_json_atomic(path, state, indent=2)
+
+
+def _business_days(start: date, end: date) -> list[date]:
+    if start > end:
+        return []
+    return [d.date() for d in pd.bdate_range(start, end)]
+
+
+def plan_backfill(gaps: dict[str, date], end_date: date, strategy: str = "auto") -> dict[str, Any]:
     """
-    conn = psycopg2.connect(db_url)
-    try:
-        rows = list(out.itertuples(index=False, name=None))
-        with conn.cursor() as cur:
-            execute_values(cur, sql, rows, page_size=1000)
-            inserted = cur.rowcount
-        conn.commit()
-    finally:
-        conn.close()
+    Choose grouped-daily vs per-ticker requests for the given gaps.
 
-    return inserted
+    gaps maps ticker -> first missing date; every gap ends at end_date, so
+    fetching grouped-daily for all weekdays from a cutoff date onward covers
+    exactly the tickers whose gap starts on or after it. The cutoff that
+    minimizes (weekdays from cutoff) + (tickers starting before cutoff) is
+    the cheapest plan. "grouped" forces the earliest cutoff, "ticker" none.
+    """
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Unknown strategy: {strategy}. Expected one of {STRATEGIES}")
+
+    starts = sorted(gaps.values())
+    cutoff: date | None = None
+    best = len(gaps)
+    if strategy == "grouped" and starts:
+        cutoff = starts[0]
+    elif strategy == "auto":
+        for candidate in sorted(set(starts)):
+            cost = int(np.busday_count(candidate, end_date + timedelta(days=1))) + bisect_left(starts, candidate)
+            # Ties go to per-ticker requests: fewer, smaller responses.
+            if cost < best:
+                cutoff, best = candidate, cost
+
+    grouped_tickers = {t: s for t, s in gaps.items() if cutoff is not None and s >= cutoff}
+    ticker_jobs = {t: s for t, s in gaps.items() if t not in grouped_tickers}
+    grouped_dates = _business_days(cutoff, end_date) if cutoff is not None else []
+    return {
+        "strategy": strategy,
+        "cutoff": cutoff,
+        "grouped_dates": grouped_dates,
+        "grouped_tickers": grouped_tickers,
+        "ticker_jobs": ticker_jobs,
+        "requests": len(grouped_dates) + len(ticker_jobs),
+        "per_ticker_requests": len(gaps),
+    }
+
+
+def _plan_to_json(plan: dict[str, Any]) -> dict[str, Any]:
+    return {
+        **plan,
+        "cutoff": plan["cutoff"].isoformat() if plan["cutoff"] else None,
+        "grouped_dates": [d.isoformat() for d in plan["grouped_dates"]],
+        "grouped_tickers": {t: s.isoformat() for t, s in plan["grouped_tickers"].items()},
+        "ticker_jobs": {t: s.isoformat() for t, s in plan["ticker_jobs"].items()},
+    }
+
+
+def _plan_from_json(saved: dict[str, Any]) -> dict[str, Any]:
+    return {
+        **saved,
+        "cutoff": date.fromisoformat(saved["cutoff"]) if saved["cutoff"] else None,
+        "grouped_dates": [date.fromisoformat(d) for d in saved["grouped_dates"]],
+        "grouped_tickers": {t: date.fromisoformat(s) for t, s in saved["grouped_tickers"].items()},
+        "ticker_jobs": {t: date.fromisoformat(s) for t, s in saved["ticker_jobs"].items()},
+    }
+
+
+def estimate_wall_seconds(requests: int, requests_per_minute: float, burst: int, workers: int) -> float:
+    """Wall time for requests under the token bucket and worker count."""
+    if requests <= 0:
+        return 0.0
+    latency_bound = math.ceil(requests / max(workers, 1)) * EST_REQUEST_SECONDS
+    if not requests_per_minute:
+        return latency_bound
+    rate_bound = max(0, requests - burst) * 60.0 / requests_per_minute + EST_REQUEST_SECONDS
+    return max(rate_bound, latency_bound)
+
+
+def _print_plan(plan: dict[str, Any], args: argparse.Namespace) -> None:
+    n_grouped = len(plan["grouped_dates"])
+    seconds = estimate_wall_seconds(plan["requests"], args.requests_per_minute, args.burst, args.workers)
+    baseline = estimate_wall_seconds(plan["per_ticker_requests"], args.requests_per_minute, args.burst, args.workers)
+    rate = f"{args.requests_per_minute:g}/min" if args.requests_per_minute else "unlimited"
+    print(f"Backfill plan ({plan['strategy']}):")
+    print(f"  Tickers behind:          {len(plan['grouped_tickers']) + len(plan['ticker_jobs'])}")
+    if n_grouped:
+        print(
+            f"  Grouped-daily requests:  {n_grouped} ({plan['grouped_dates'][0]} to {plan['grouped_dates'][-1]}, "
+            f"covers {len(plan['grouped_tickers'])} tickers)"
+        )
+    else:
+        print("  Grouped-daily requests:  0")
+    print(f"  Aggregate requests:      {len(plan['ticker_jobs'])}")
+    print(f"  Total requests:          {plan['requests']} (per-ticker only: {plan['per_ticker_requests']})")
+    print(f"  Estimated wall time:     {seconds:,.0f}s (per-ticker only: {baseline:,.0f}s) at {rate}, {args.workers} worker(s)")
+
+
+def _fetch_ticker(ticker: str, start: date, end_date: date, limiter: TokenBucket) -> pd.DataFrame:
+    """Fetch one ticker's bars; API calls (not cache hits) wait for a rate-limit token."""
+    # Polygon uses dots not hyphens for share classes (BRK.B not BRK-B)
+    poly_ticker = ticker.replace("-", ".")
+    df = fetch_ticker_range(poly_ticker, start, end_date, limiter=limiter)
+
+    # Normalize date: strip time component, cast to datetime64[ns]
+    if not df.empty:
+        df["date"] = pd.to_datetime(df["date"].dt.date)
+        # Restore original ticker convention for source_ticker
+        df["source_ticker"] = ticker.upper() + ".US"
+        df["ticker"] = ticker.upper()
+    return df
+
+
+def _fetch_grouped(day: date, covered: dict[str, date], limiter: TokenBucket) -> pd.DataFrame:
+    """Fetch one trading day for the covered tickers, keeping only rows inside each gap."""
+    poly_to_ticker = {t.replace("-", "."): t for t in covered}
+    df = fetch_grouped_daily(day, tickers=list(poly_to_ticker), limiter=limiter)
+    if df.empty:
+        return df
+    tickers = df["ticker"].astype(str).map(poly_to_ticker)
+    df["ticker"] = tickers
+    df["source_ticker"] = tickers + ".US"
+    in_gap = df["date"] >= pd.to_datetime(tickers.map(covered))
+    return df[in_gap].reset_index(drop=True)
+
+
+def _flush_batch(
+    frames: list[pd.DataFrame],
+    run_id: str,
+    batch_no: int,
+) -> tuple[int, int]:
+    """
+    Dedup one batch of fetched rows and write it to the raw store and
+    Supabase. Returns (rows appended, duplicates dropped).
+    """
+    new_df = pd.concat(frames, ignore_index=True)
 
+    # Vectorized anti-join against the persisted key index, so the cost
+    # follows the new rows, not the 27M-row history.
+    refresh_key_index(RAW_PATH)
+    is_new = new_key_mask(RAW_PATH, new_df["symbol_raw"].to_numpy(), new_df["payload_date"])
+    n_dupes = int((~is_new).sum())
+    if n_dupes:
+        print(f"  WARNING: {n_dupes} duplicate (symbol, date) pairs found — removing them")
+        new_df = new_df[is_new]
+    if new_df.empty:
+        return 0, n_dupes
 
-def main() -> None:
+    # Append as new year/month fragments (existing files are never rewritten)
+    new_table = pa.Table.from_pandas(new_df, preserve_index=False)
+    fragments = append_raw_fragment(RAW_PATH, new_table, f"{run_id}_{batch_no:04d}")
+    print(f"  Batch {batch_no}: appended {len(new_df):,} rows in {len(fragments)} fragment(s)")
+
+    sb_stats = upsert_raw_prices(new_df)
+    if sb_stats is None:
+        print("  WARNING: SUPABASE_DB_URL not set — skipping Supabase upsert")
+    else:
+        print(f"  Supabase {format_upsert_stats(sb_stats)}")
+    return len(new_df), n_dupes
+
+
+def parse_args() -> argparse.Namespace:
     parser = argparse.ArgumentParser(description="Backfill Polygon.io price data into raw parquet + Supabase")
     parser.add_argument("--tickers", type=str, default=None, help="Comma-separated tickers to backfill (default: full universe)")
     parser.add_argument("--since", type=str, default=None, help="Start date YYYY-MM-DD (default: parquet max_date + 1 per ticker)")
     parser.add_argument("--end", type=str, default=None, help="End date YYYY-MM-DD (default: yesterday)")
-    args = parser.parse_args()
+    parser.add_argument(
+        "--requests-per-minute",
+        type=float,
+        default=DEFAULT_REQUESTS_PER_MINUTE,
+        help="API plan rate limit (0 = unlimited).",
+    )
+    parser.add_argument("--burst", type=int, default=DEFAULT_BURST, help="Requests allowed back-to-back before limiting.")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Concurrent API requests.")
+    parser.add_argument("--flush-rows", type=int, default=DEFAULT_FLUSH_ROWS, help="Rows buffered before each write.")
+    parser.add_argument("--checkpoint", type=Path, default=CHECKPOINT_PATH, help="Checkpoint file for resuming.")
+    parser.add_argument("--fresh", action="store_true", help="Ignore an existing checkpoint and start over.")
+    parser.add_argument(
+        "--strategy",
+        choices=STRATEGIES,
+        default="auto",
+        help="auto: cheapest mix; grouped: grouped-daily only; ticker: per-ticker aggregates only.",
+    )
+    parser.add_argument("--dry-run", action="store_true", help="Print the request plan and estimated wall time only.")
+    parser.add_argument(
+        "--api-cache",
+        type=Path,
+        nargs="?",
+        const=API_CACHE_DIR,
+        default=None,
+        help=f"Cache Polygon responses on disk so reruns replay past dates (default dir: {API_CACHE_DIR}).",
+    )
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    if args.api_cache:
+        enable_response_cache(args.api_cache)
 
     end_date = date.fromisoformat(args.end) if args.end else date.today() - timedelta(days=1)
     since_date = date.fromisoformat(args.since) if args.since else None
 
-    run_id = _build_run_id()
+    # 1. Load universe / ticker list
+    if args.tickers:
+        tickers = sorted(set(t.strip().upper() for t in args.tickers.split(",")))
+    else:
+        tickers = _load_universe()
+
+    key = _checkpoint_key(tickers, since_date, end_date)
+    checkpoint = None if args.fresh else _load_checkpoint(args.checkpoint, key)
+    if checkpoint is None:
+        checkpoint = {
+            "version": CHECKPOINT_VERSION,
+            "key": key,
+            "run_id": _build_run_id(),
+            "batches": 0,
+            "done": {},
+        }
+        resumed = False
+    else:
+        resumed = True
+    run_id = checkpoint["run_id"]
     ingested_at = datetime.now(timezone.utc)
 
-    print(f"Backfill run: {run_id}")
+    print(f"Backfill run: {run_id}{' (resumed)' if resumed else ''}")
     print(f"Target end date: {end_date}")
     print()
-
-    # 1. Load universe / ticker list
     if args.tickers:
-        tickers = sorted(set(t.strip().upper() for t in args.tickers.split(",")))
         print(f"Tickers (from --tickers): {', '.join(tickers)}")
     else:
-        tickers = _load_universe()
         print(f"Universe: {len(tickers)} tickers from {UNIVERSE_CSV}")
+    if resumed:
+        print(f"Checkpoint: {len(checkpoint['done'])} ticker(s) already done, {checkpoint['batches']} batch(es) written")
 
     # 2. Read existing max dates (symbol_raw has .US suffix)
     print("Reading existing parquet max dates...")
-    old_pf = pq.ParquetFile(PARQUET_PATH)
-    old_row_count = old_pf.metadata.num_rows
-    max_dates = _max_dates_per_ticker(PARQUET_PATH)
+    old_row_count = raw_row_count(RAW_PATH)
+    max_dates = _max_dates_per_ticker(RAW_PATH)
     print(f"Existing parquet: {old_row_count:,} rows\n")
 
-    # 3. Fetch per ticker
-    all_new: list[pd.DataFrame] = []
-    zero_rows: list[str] = []
-    failed: list[tuple[str, str]] = []
-    total = len(tickers)
-
-    for i, ticker in enumerate(tickers, 1):
-        symbol_raw = f"{ticker}.US"
-        existing_max = max_dates.get(symbol_raw)
+    # 3. Plan: per-ticker gaps -> cheapest mix of grouped-daily / aggregate requests.
+    # A resumed run replays the saved plan: the manifest max dates have moved
+    # past any day that failed before a later day was flushed.
+    if "plan" in checkpoint:
+        plan = _plan_from_json(checkpoint["plan"])
+        print("Replaying the checkpointed plan")
+    else:
+        gaps: dict[str, date] = {}
+        for ticker in tickers:
+            existing_max = max_dates.get(f"{ticker}.US")
+            if existing_max and existing_max >= end_date:
+                print(f"  {ticker} — already up to date ({existing_max}), skipping")
+                continue
+            if since_date:
+                start = since_date
+            else:
+                start = (existing_max + timedelta(days=1)) if existing_max else date(2020, 1, 1)
+            gaps[ticker] = start
+        plan = plan_backfill(gaps, end_date, strategy=args.strategy)
+    _print_plan(plan, args)
+    if args.dry_run:
+        return
+    checkpoint["plan"] = _plan_to_json(plan)
 
-        if existing_max and existing_max >= end_date:
-            print(f"[{i:>3}/{total}] {ticker} — already up to date ({existing_max}), skipping")
-            continue
+    jobs: list[tuple[str, date]] = [
+        (f"grouped:{d.isoformat()}", d)
+        for d in plan["grouped_dates"]
+        if f"grouped:{d.isoformat()}" not in checkpoint["done"]
+    ]
+    jobs += sorted((t, s) for t, s in plan["ticker_jobs"].items() if t not in checkpoint["done"])
+    if resumed:
+        print(f"  Remaining requests:      {len(jobs)}")
 
-        if since_date:
-            start = since_date
-        else:
-            start = (existing_max + timedelta(days=1)) if existing_max else date(2020, 1, 1)
-        print(f"[{i:>3}/{total}] {ticker} — fetching {start} to {end_date}...")
+    limiter = TokenBucket(args.requests_per_minute, burst=args.burst)
 
+    def fetch(job: tuple[str, date]) -> tuple[str, date, pd.DataFrame | None, str | None]:
+        key, start = job
         try:
-            # Polygon uses dots not hyphens for share classes (BRK.B not BRK-B)
-            poly_ticker = ticker.replace("-", ".")
-            df = fetch_ticker_range(poly_ticker, start, end_date)
-
-            # Normalize date: strip time component, cast to datetime64[ns]
-            if not df.empty:
-                df["date"] = pd.to_datetime(df["date"].dt.date)
-                # Restore original ticker convention for source_ticker
-                df["source_ticker"] = ticker.upper() + ".US"
-                df["ticker"] = ticker.upper()
-
-            if df.empty:
-                zero_rows.append(ticker)
-                print(f"[{i:>3}/{total}] {ticker} — 0 rows fetched")
+            if key.startswith("grouped:"):
+                df = _fetch_grouped(start, plan["grouped_tickers"], limiter)
             else:
-                raw = _polygon_to_raw_schema(df, run_id, ingested_at)
-                all_new.append(raw)
-                print(f"[{i:>3}/{total}] {ticker} — {len(raw)} rows fetched")
+                df = _fetch_ticker(key, start, end_date, limiter)
+            return key, start, df, None
         except Exception as e:
-            failed.append((ticker, str(e)))
-            print(f"[{i:>3}/{total}] {ticker} — ERROR: {e}")
-
-        # Rate limit (skip sleep after the last ticker)
-        if i < total:
-            time.sleep(RATE_LIMIT_SECONDS)
-
-    # 4. Combine and validate
-    if not all_new:
-        print("\nNo new rows to append. Done.")
-        return
-
-    new_df = pd.concat(all_new, ignore_index=True)
-    print(f"\nTotal new rows collected: {len(new_df):,}")
-
-    # Dedup check: only load the two key columns, use vectorized set ops
-    print("Checking for duplicates against existing parquet...")
-    pf = pq.ParquetFile(PARQUET_PATH)
-    existing_schema = pf.schema_arrow
-
-    # Only check the ~90 symbols we're inserting — skip the vast majority of
-    # the 27M rows.  Stream row-groups so memory stays low.
-    new_symbols = set(new_df["symbol_raw"].unique())
-    new_dates_min = str(new_df["payload_date"].min())
-    existing_keys: set[tuple[str, str]] = set()
-    for rg in range(pf.metadata.num_row_groups):
-        chunk = pf.read_row_group(rg, columns=["symbol_raw", "payload_date"]).to_pandas()
-        chunk = chunk[chunk["symbol_raw"].isin(new_symbols)]
-        chunk["payload_date"] = chunk["payload_date"].astype(str)
-        chunk = chunk[chunk["payload_date"] >= new_dates_min]
-        if not chunk.empty:
-            existing_keys.update(zip(chunk["symbol_raw"], chunk["payload_date"]))
-        del chunk
-
-    new_df["_date_str"] = new_df["payload_date"].astype(str)
-    dupe_mask = [
-        (sym, d) in existing_keys
-        for sym, d in zip(new_df["symbol_raw"], new_df["_date_str"])
-    ]
-    n_dupes = sum(dupe_mask)
-    if n_dupes:
-        print(f"WARNING: {n_dupes} duplicate (symbol, date) pairs found — removing them")
-        new_df = new_df[~pd.Series(dupe_mask, index=new_df.index)]
-    new_df = new_df.drop(columns=["_date_str"])
-    del existing_keys  # free memory
+            return key, start, None, str(e)
 
-    if new_df.empty:
-        print("All rows were duplicates. Nothing to append.")
-        return
+    # 4. Fetch concurrently; flush to the raw store in batches
+    buffer: list[pd.DataFrame] = []
+    buffered_rows = 0
+    buffered_jobs: dict[str, int] = {}
+    zero_rows: list[str] = []
+    failed: list[tuple[str, str]] = []
+    appended = 0
+    duplicates = 0
+
+    def flush() -> None:
+        nonlocal buffer, buffered_rows, buffered_jobs, appended, duplicates
+        if not buffer:
+            return
+        checkpoint["batches"] += 1
+        rows, dupes = _flush_batch(buffer, run_id, checkpoint["batches"])
+        appended += rows
+        duplicates += dupes
+        # Requests count as done only once their rows are on disk.
+        checkpoint["done"].update(buffered_jobs)
+        _save_checkpoint(args.checkpoint, checkpoint)
+        buffer, buffered_rows, buffered_jobs = [], 0, {}
+
+    total = len(jobs)
+    for i, (key, start, df, error) in enumerate(bounded_map(fetch, jobs, workers=args.workers, ordered=False), 1):
+        grouped = key.startswith("grouped:")
+        span = str(start) if grouped else f"{start} to {end_date}"
+        if error is not None:
+            failed.append((key, error))
+            print(f"[{i:>3}/{total}] {key} — ERROR: {error}")
+            continue
+        if df.empty:
+            if not grouped:
+                zero_rows.append(key)
+            checkpoint["done"][key] = 0
+            _save_checkpoint(args.checkpoint, checkpoint)
+            print(f"[{i:>3}/{total}] {key} — 0 rows fetched ({span})")
+            continue
 
-    # 5. Append to parquet — streaming, row-group-at-a-time via temp file
-    print(f"Appending {len(new_df):,} rows to {PARQUET_PATH}...")
-    new_table = pa.Table.from_pandas(new_df, preserve_index=False)
-    new_table = new_table.cast(existing_schema)
+        raw = _polygon_to_raw_schema(df, run_id, ingested_at)
+        buffer.append(raw)
+        buffered_rows += len(raw)
+        buffered_jobs[key] = len(raw)
+        print(f"[{i:>3}/{total}] {key} — {len(raw)} rows fetched ({span})")
+        if buffered_rows >= args.flush_rows:
+            flush()
+    flush()
 
-    # Copy original to a temp file so we read from it while writing to a new file
-    tmp_dir = PARQUET_PATH.parent
-    tmp_fd, tmp_path = tempfile.mkstemp(dir=tmp_dir, suffix=".parquet.tmp")
-    try:
-        os.close(tmp_fd)
-        shutil.copy2(PARQUET_PATH, tmp_path)
+    # Nothing left to resume once every ticker succeeded.
+    if not failed and args.checkpoint.exists():
+        args.checkpoint.unlink()
 
-        src_pf = pq.ParquetFile(tmp_path)
-        writer = pq.ParquetWriter(str(PARQUET_PATH), existing_schema, compression="snappy")
-        try:
-            # Stream existing row groups one at a time (never all in memory)
-            for rg in range(src_pf.metadata.num_row_groups):
-                writer.write_table(src_pf.read_row_group(rg))
-            # Append new data
-            writer.write_table(new_table)
-        except Exception:
-            writer.close()
-            # Restore original on failure
-            shutil.copy2(tmp_path, PARQUET_PATH)
-            raise
-        else:
-            writer.close()
-    finally:
-        Path(tmp_path).unlink(missing_ok=True)
-
-    # 6. Upsert to Supabase
-    print("Upserting to Supabase...")
-    sb_inserted = _upsert_to_supabase(new_df)
-    if sb_inserted is not None:
-        print(f"  Supabase: {sb_inserted} inserted, {len(new_df) - sb_inserted} skipped (already existed)")
-
-    # 7. Verify
-    final_pf = pq.ParquetFile(PARQUET_PATH)
-    final_row_count = final_pf.metadata.num_rows
+    # 5. Verify
+    final_row_count = raw_row_count(RAW_PATH)
 
     # ------ Summary ------
     print("\n" + "=" * 60)
@@ -297,16 +502,19 @@ def main() -> None:
     print("=" * 60)
     print(f"  Run ID:              {run_id}")
     print(f"  End date:            {end_date}")
-    print(f"  Tickers processed:   {total}")
-    print(f"  Rows appended:       {len(new_df):,}")
+    print(f"  Requests:            {total} ({len(plan['grouped_dates'])} grouped-daily, {len(plan['ticker_jobs'])} aggregate)")
+    print(f"  Rows appended:       {appended:,}")
+    print(f"  Duplicates dropped:  {duplicates:,}")
+    print(f"  Batches written:     {checkpoint['batches']}")
     print(f"  Old parquet rows:    {old_row_count:,}")
     print(f"  New parquet rows:    {final_row_count:,}")
     if zero_rows:
         print(f"  Zero-row tickers:    {', '.join(zero_rows)}")
     if failed:
-        print(f"  Failed tickers ({len(failed)}):")
+        print(f"  Failed requests ({len(failed)}):")
         for t, err in failed:
             print(f"    {t}: {err}")
+        print(f"  Rerun the same command to retry them (checkpoint: {args.checkpoint})")
     print("=" * 60)
 
 
@@ -0,0 +1,228 @@
+from __future__ import annotations
+
+"""
+Compact the raw price dataset into one symbol/date-sorted file with large row groups.
+
+Initial ingest historically wrote one row group per Stooq TXT file, and the
+daily jobs add one small fragment per run. Every downstream scan pays for
+each of those row groups. This tool rewrites the whole dataset (base file +
+fragments) into a fresh base stock_prices.parquet:
+
+- rows sorted by symbol_raw, payload_date
+- duplicate (symbol_raw, payload_date) keys dropped, keeping the latest ingested_at
+- row groups of --row-group-rows rows
+
+Memory stays bounded: symbols are split into passes of at most
+--max-rows-in-memory rows, each pass is filtered, sorted and streamed to the
+buffered writer.
+
+Usage:
+    python -m src.ingestion.compact_raw
+    python -m src.ingestion.compact_raw --benchmark      # report scan time before/after
+    python -m src.ingestion.compact_raw --dry-run        # print the plan only
+"""
+
+import argparse
+import time
+from pathlib import Path
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from src.utils.atomic_io import atomic_path
+from src.utils.price_utils import iter_raw_row_groups, list_raw_files, open_price_dataset, plan_symbol_passes
+from src.utils.raw_store import (
+    DEFAULT_ROW_GROUP_ROWS,
+    RAW_BASE_FILE_NAME,
+    RAW_DATASET_DIR,
+    RowGroupBufferedWriter,
+    clear_raw_fragments,
+    is_compact_schema,
+    raw_dataset_schema,
+    refresh_raw_sidecars,
+)
+
+
+DEFAULT_MAX_ROWS_IN_MEMORY = 5_000_000
+
+
+def time_full_scan(raw_path: Path) -> dict[str, float]:
+    """
+    Time a full row-group-at-a-time scan, the access pattern used by the
+    downstream transform steps.
+    """
+    files = list_raw_files(raw_path)
+    row_groups = sum(pq.ParquetFile(p).metadata.num_row_groups for p in files)
+    rows = 0
+    t0 = time.perf_counter()
+    for table in iter_raw_row_groups(raw_path):
+        rows += table.num_rows
+    elapsed = time.perf_counter() - t0
+    return {"files": len(files), "row_groups": row_groups, "rows": rows, "seconds": elapsed}
+
+
+def _symbol_counts(dataset: ds.Dataset) -> dict[str, int]:
+    counts: dict[str, int] = {}
+    for batch in dataset.to_batches(columns=["symbol_raw"]):
+        vc = pc.value_counts(batch.column(0))
+        for sym, n in zip(vc.field("values").to_pylist(), vc.field("counts").to_pylist()):
+            if sym is None:
+                continue
+            counts[sym] = counts.get(sym, 0) + n
+    return counts
+
+
+def sort_and_dedup(table: pa.Table) -> tuple[pa.Table, int]:
+    """
+    Sort by symbol_raw, payload_date and keep the last-ingested row per key.
+    """
+    # Arrow cannot sort dictionary columns; a compact writer re-encodes them.
+    for i, field in enumerate(table.schema):
+        if pa.types.is_dictionary(field.type):
+            table = table.set_column(i, field.name, pc.cast(table.column(i), field.type.value_type))
+    table = table.sort_by(
+        [("symbol_raw", "ascending"), ("payload_date", "ascending"), ("ingested_at", "ascending")]
+    )
+    if table.num_rows < 2:
+        return table, 0
+
+    symbols = table["symbol_raw"].to_numpy(zero_copy_only=False)
+    dates = table["payload_date"].to_numpy(zero_copy_only=False)
+    # A row survives when the next row carries a different key.
+    keep = np.ones(table.num_rows, dtype=bool)
+    keep[:-1] = (symbols[:-1] != symbols[1:]) | (dates[:-1] != dates[1:])
+    dropped = int((~keep).sum())
+    if dropped:
+        table = table.filter(pa.array(keep))
+    return table, dropped
+
+
+def compact_raw_dataset(
+    dataset_dir: Path,
+    row_group_rows: int = DEFAULT_ROW_GROUP_ROWS,
+    max_rows_in_memory: int = DEFAULT_MAX_ROWS_IN_MEMORY,
+) -> dict[str, int]:
+    """
+    Rewrite dataset_dir into a single sorted base file and remove merged fragments.
+
+    Rows without a symbol_raw belong to no symbol pass; they are carried over
+    as-is (neither sorted nor deduplicated) after the sorted rows and counted
+    in null_symbol_rows.
+    """
+    schema = raw_dataset_schema(dataset_dir)
+    if schema is None:
+        raise FileNotFoundError(f"No raw parquet files found under: {dataset_dir}")
+
+    dataset = open_price_dataset(dataset_dir)
+    passes = plan_symbol_passes(_symbol_counts(dataset), max_rows_in_memory)
+
+    duplicates = 0
+    with atomic_path(dataset_dir / RAW_BASE_FILE_NAME) as tmp_path:
+        with RowGroupBufferedWriter(
+            tmp_path, schema, row_group_rows=row_group_rows, compact=is_compact_schema(schema)
+        ) as writer:
+            for i, symbols in enumerate(passes, start=1):
+                part = dataset.to_table(filter=pc.field("symbol_raw").isin(symbols))
+                part, dropped = sort_and_dedup(part)
+                duplicates += dropped
+                writer.write_table(part)
+                print(f"  pass {i}/{len(passes)}: {len(symbols):,} symbols, {part.num_rows:,} rows")
+            unnamed = dataset.to_table(filter=pc.field("symbol_raw").is_null())
+            writer.write_table(unnamed)
+            if unnamed.num_rows:
+                print(f"  kept {unnamed.num_rows:,} rows without a symbol")
+        stats = {
+            "rows_written": writer.rows_written,
+            "row_groups_written": writer.row_groups_written,
+            "duplicates_dropped": duplicates,
+            "null_symbol_rows": unnamed.num_rows,
+            "passes": len(passes),
+        }
+
+    # Fragment rows now live in the base file. Rerunning compaction after a
+    # crash here is safe: the dedup above removes any double-counted rows.
+    stats["fragment_folders_removed"] = clear_raw_fragments(dataset_dir)
+    refresh_raw_sidecars(dataset_dir)
+    return stats
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Compact the raw price dataset into large sorted row groups.")
+    parser.add_argument(
+        "--raw-path",
+        type=Path,
+        default=RAW_DATASET_DIR,
+        help="Raw dataset directory (base stock_prices.parquet + fragments).",
+    )
+    parser.add_argument(
+        "--row-group-rows",
+        type=int,
+        default=DEFAULT_ROW_GROUP_ROWS,
+        help="Target rows per output row group.",
+    )
+    parser.add_argument(
+        "--max-rows-in-memory",
+        type=int,
+        default=DEFAULT_MAX_ROWS_IN_MEMORY,
+        help="Upper bound on rows sorted in memory per pass.",
+    )
+    parser.add_argument("--benchmark", action="store_true", help="Time a full scan before and after compaction.")
+    parser.add_argument("--dry-run", action="store_true", help="Print the compaction plan only.")
+    return parser.parse_args()
+
+
+def _print_scan(label: str, scan: dict[str, float]) -> None:
+    rows_per_sec = scan["rows"] / scan["seconds"] if scan["seconds"] > 0 else 0.0
+    print(
+        f"  {label:<7} files={scan['files']:,} row_groups={scan['row_groups']:,} "
+        f"rows={scan['rows']:,} scan={scan['seconds']:.2f}s ({rows_per_sec:,.0f} rows/s)"
+    )
+
+
+def main() -> None:
+    args = parse_args()
+    if not args.raw_path.is_dir():
+        raise NotADirectoryError(f"--raw-path must be the raw dataset directory: {args.raw_path}")
+
+    files = list_raw_files(args.raw_path)
+    row_groups = sum(pq.ParquetFile(p).metadata.num_row_groups for p in files)
+    print(f"Raw dataset: {args.raw_path}")
+    print(f"  Files: {len(files):,}  Row groups: {row_groups:,}")
+
+    if args.dry_run:
+        passes = plan_symbol_passes(_symbol_counts(open_price_dataset(args.raw_path)), args.max_rows_in_memory)
+        print(f"[dry-run] Would rewrite in {len(passes)} pass(es) with {args.row_group_rows:,} rows per row group.")
+        return
+
+    before = time_full_scan(args.raw_path) if args.benchmark else None
+
+    t0 = time.perf_counter()
+    stats = compact_raw_dataset(
+        args.raw_path,
+        row_group_rows=args.row_group_rows,
+        max_rows_in_memory=args.max_rows_in_memory,
+    )
+    elapsed = time.perf_counter() - t0
+
+    print("\nCompaction completed")
+    print(f"  Rows written:        {stats['rows_written']:,}")
+    print(f"  Row groups written:  {stats['row_groups_written']:,}")
+    print(f"  Duplicates dropped:  {stats['duplicates_dropped']:,}")
+    print(f"  Rows without symbol: {stats['null_symbol_rows']:,} (kept)")
+    print(f"  Fragment folders:    {stats['fragment_folders_removed']:,} removed")
+    print(f"  Time:                {elapsed:.1f}s")
+
+    if before is not None:
+        after = time_full_scan(args.raw_path)
+        print("\nFull-scan benchmark")
+        _print_scan("before", before)
+        _print_scan("after", after)
+        if after["seconds"] > 0:
+            print(f"  speedup: {before['seconds'] / after['seconds']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,22 +1,69 @@
 """
 Fetch EOD OHLCV data from Polygon.io and return DataFrames matching
 the project's stock_prices.parquet schema.
+
+All requests go through one pooled, gzip-enabled requests.Session with
+jittered exponential backoff on 429/5xx. Responses are streamed and decoded
+result-by-result: rows for tickers outside the requested set are skipped
+before they are parsed, and kept rows go straight into column lists.
+
+Set POLYGON_API_CACHE=1 (or a directory path), or call
+enable_response_cache(), to keep successful, non-empty response bodies in
+an on-disk cache under data/raw/_api_cache; reruns for past dates then skip
+the API.
 """
 
 from __future__ import annotations
 
+import json
 import os
+import random
+import re
+import threading
+import time
 from datetime import date, timedelta
+from pathlib import Path
+from typing import Iterable
 
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
 import requests
 from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
 
-from src.utils.price_utils import normalize_ticker
+from src.utils.api_cache import ResponseCache
+from src.utils.rate_limit import TokenBucket
 
 load_dotenv()
 
 _BASE = "https://api.polygon.io"
+# Point at a stand-in server (scripts/polygon_stub_server.py) for offline runs.
+BASE_URL_ENV = "POLYGON_BASE_URL"
+
+REQUEST_TIMEOUT_SECONDS = 30
+MAX_RETRIES = 5
+BACKOFF_BASE_SECONDS = 1.0
+BACKOFF_MAX_SECONDS = 60.0
+RETRY_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+POOL_SIZE = 16
+STREAM_CHUNK_BYTES = 1 << 16
+
+RESULT_FIELDS = ("T", "t", "o", "h", "l", "c", "v")
+# Polygon result objects are flat and the envelope fields after "results"
+# are scalars, so every {...} after the "results" key is exactly one result.
+_RESULTS_KEY = re.compile(rb'"results"\s*:\s*\[')
+_RESULT_OBJECT = re.compile(rb"\{[^{}]*\}")
+_TICKER_FIELD = re.compile(rb'"T"\s*:\s*"([^"]*)"')
+
+API_CACHE_DIR = Path("data/raw/_api_cache")
+API_CACHE_ENV = "POLYGON_API_CACHE"
+
+_session_lock = threading.Lock()
+_session: requests.Session | None = None
+_cache: ResponseCache | None = None
+_cache_configured = False
 
 
 def _api_key() -> str:
@@ -26,64 +73,245 @@ def _api_key() -> str:
     return key
 
 
-def _build_df(results: list[dict], date_col: str = "t") -> pd.DataFrame:
-    """Convert raw Polygon results into the canonical schema."""
-    if not results:
-        return pd.DataFrame(
-            columns=["source_ticker", "ticker", "date", "open", "high", "low", "close", "volume"]
-        )
-
-    rows = []
-    for r in results:
-        ticker_raw = r.get("T", "")
-        source = f"{ticker_raw}.US"
-        rows.append(
-            {
-                "source_ticker": source,
-                "ticker": normalize_ticker(source),
-                "date": r.get(date_col),
-                "open": r.get("o"),
-                "high": r.get("h"),
-                "low": r.get("l"),
-                "close": r.get("c"),
-                "volume": r.get("v"),
-            }
-        )
-
-    df = pd.DataFrame(rows)
+def _base_url() -> str:
+    return (os.getenv(BASE_URL_ENV) or _BASE).rstrip("/")
+
+
+def _http() -> requests.Session:
+    """Shared keep-alive session, sized for the backfill worker pool."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            session.headers.update({"Accept-Encoding": "gzip"})
+            _session = session
+        return _session
+
+
+def enable_response_cache(root: Path | str | None = API_CACHE_DIR) -> ResponseCache | None:
+    """Route fetches through an on-disk response cache at *root* (None disables it)."""
+    global _cache, _cache_configured
+    _cache = ResponseCache(Path(root)) if root is not None else None
+    _cache_configured = True
+    return _cache
+
+
+def _response_cache() -> ResponseCache | None:
+    if not _cache_configured:
+        setting = os.getenv(API_CACHE_ENV, "").strip()
+        if setting.lower() in ("", "0", "false", "no"):
+            enable_response_cache(None)
+        elif setting.lower() in ("1", "true", "yes"):
+            enable_response_cache()
+        else:
+            enable_response_cache(setting)
+    return _cache
+
+
+def _backoff_seconds(attempt: int, retry_after: str | None = None) -> float:
+    """Full-jitter exponential backoff, honouring a numeric Retry-After header."""
+    if retry_after:
+        try:
+            return min(float(retry_after), BACKOFF_MAX_SECONDS)
+        except ValueError:
+            pass
+    return random.uniform(0, min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2**attempt))
+
+
+def _get(url: str, params: dict, limiter: TokenBucket | None = None) -> requests.Response:
+    """
+    GET with retries on connection errors, 429 and 5xx.
+
+    Every attempt, retries included, takes a limiter token, so backoff
+    retries from concurrent workers stay within the configured rate. The
+    returned response is streaming; after MAX_RETRIES the last response (or
+    error) is handed back to the caller.
+    """
+    for attempt in range(MAX_RETRIES + 1):
+        if limiter is not None:
+            limiter.acquire()
+        try:
+            resp = _http().get(url, params=params, timeout=REQUEST_TIMEOUT_SECONDS, stream=True)
+        except (requests.ConnectionError, requests.Timeout):
+            if attempt == MAX_RETRIES:
+                raise
+            time.sleep(_backoff_seconds(attempt))
+            continue
+        if resp.status_code in RETRY_STATUS_CODES and attempt < MAX_RETRIES:
+            retry_after = resp.headers.get("Retry-After")
+            resp.close()
+            time.sleep(_backoff_seconds(attempt, retry_after))
+            continue
+        return resp
+    raise AssertionError("unreachable")
+
+
+def _decode_results(chunks: Iterable[bytes], tickers: set[str] | None = None) -> dict[str, list]:
+    """
+    Stream-decode the "results" array into column lists (see RESULT_FIELDS).
+
+    Objects are cut out of the byte stream as they complete. When tickers is
+    given, an object's "T" is checked with a byte-level match first and
+    non-matching rows are dropped without being parsed.
+    """
+    columns: dict[str, list] = {f: [] for f in RESULT_FIELDS}
+    wanted = {t.upper().encode() for t in tickers} if tickers else None
+    buffer = b""
+    in_results = False
+    for chunk in chunks:
+        if not chunk:
+            continue
+        buffer += chunk
+        if not in_results:
+            key = _RESULTS_KEY.search(buffer)
+            if key is None:
+                continue
+            in_results = True
+            buffer = buffer[key.end():]
+        consumed = 0
+        objects = []
+        for match in _RESULT_OBJECT.finditer(buffer):
+            consumed = match.end()
+            obj = match.group()
+            if wanted is not None:
+                symbol = _TICKER_FIELD.search(obj)
+                if symbol is None or symbol.group(1).upper() not in wanted:
+                    continue
+            objects.append(obj)
+        if objects:
+            # One json.loads per chunk instead of one per row.
+            rows = json.loads(b"[" + b",".join(objects) + b"]")
+            for f in RESULT_FIELDS:
+                columns[f].extend([row.get(f) for row in rows])
+        # Keep only the unfinished tail (at most one partial object).
+        buffer = buffer[consumed:]
+    return columns
+
+
+def _has_results(body: bytes) -> bool:
+    """True when the body's "results" array holds at least one object."""
+    key = _RESULTS_KEY.search(body)
+    return key is not None and _RESULT_OBJECT.search(body, key.end()) is not None
+
+
+def _fetch_results(
+    url: str,
+    params: dict,
+    label: str,
+    as_of: date,
+    tickers: set[str] | None = None,
+    limiter: TokenBucket | None = None,
+) -> dict[str, list]:
+    """
+    Fetch and decode one endpoint. With a response cache, the full body is
+    served from or written to disk; *as_of* is the last date the response
+    covers and decides whether a cached copy is still fresh. Empty result
+    sets are not cached: Polygon returns them for days it has not published
+    yet, and a past date's entry would never expire. *limiter* is only
+    consulted for requests that actually go to the API, once per attempt.
+    """
+    cache = _response_cache()
+    if cache is not None:
+        body = cache.get(url, params, as_of)
+        if body is not None:
+            return _decode_results([body], tickers)
+
+    resp = _get(url, params, limiter)
+    try:
+        if resp.status_code != 200:
+            raise RuntimeError(f"Polygon {label} returned {resp.status_code}: {resp.text}")
+        chunks = resp.iter_content(chunk_size=STREAM_CHUNK_BYTES)
+        if cache is None:
+            return _decode_results(chunks, tickers)
+        received: list[bytes] = []
+        columns = _decode_results(_tee(chunks, received), tickers)
+        body = b"".join(received)
+        if _has_results(body):
+            cache.put(url, params, body)
+        return columns
+    finally:
+        resp.close()
+
+
+def _tee(chunks: Iterable[bytes], sink: list[bytes]) -> Iterable[bytes]:
+    for chunk in chunks:
+        sink.append(chunk)
+        yield chunk
+
+
+POLYGON_SCHEMA = pa.schema(
+    [
+        pa.field("source_ticker", pa.string()),
+        pa.field("ticker", pa.string()),
+        pa.field("date", pa.timestamp("ms")),
+        pa.field("open", pa.float64()),
+        pa.field("high", pa.float64()),
+        pa.field("low", pa.float64()),
+        pa.field("close", pa.float64()),
+        pa.field("volume", pa.float64()),
+    ]
+)
+_PRICE_FIELDS = (("open", "o"), ("high", "h"), ("low", "l"), ("close", "c"), ("volume", "v"))
+
+
+def _float_column(values: list) -> np.ndarray:
+    try:
+        # None -> NaN in the same pass.
+        return np.asarray(values, dtype="float64")
+    except (TypeError, ValueError):
+        return pd.to_numeric(pd.Series(values, dtype="object"), errors="coerce").to_numpy(dtype="float64")
+
+
+def _build_table(columns: dict[str, list]) -> pa.Table:
+    """
+    Build the canonical Arrow table from decoded result columns, one typed
+    buffer per field; tickers are normalized with Arrow string kernels.
+    """
+    symbols = pa.array(columns["T"], pa.string()).fill_null("")
+    source = pc.binary_join_element_wise(symbols, pa.scalar(".US"), "")
+    ticker = pc.replace_substring_regex(
+        pc.utf8_upper(pc.utf8_trim_whitespace(source)), pattern=r"\.US$", replacement=""
+    )
+
+    millis = _float_column(columns["t"])
+    missing = np.isnan(millis)
+    dates = pa.array(np.where(missing, 0, millis).astype("int64"), pa.timestamp("ms"), mask=missing)
+
+    arrays = [source, ticker, dates]
+    arrays += [pa.array(_float_column(columns[field]), pa.float64()) for _, field in _PRICE_FIELDS]
+    return pa.Table.from_arrays(arrays, schema=POLYGON_SCHEMA)
+
+
+def _build_df(columns: dict[str, list]) -> pd.DataFrame:
+    """Convert decoded Polygon result columns into the canonical schema."""
+    df = _build_table(columns).to_pandas()
     df["source_ticker"] = df["source_ticker"].astype("string")
     df["ticker"] = df["ticker"].astype("string")
-    df["date"] = pd.to_datetime(df["date"], unit="ms", errors="coerce")
-    for col in ("open", "high", "low", "close", "volume"):
-        df[col] = pd.to_numeric(df[col], errors="coerce").astype("float64")
-
-    return df[["source_ticker", "ticker", "date", "open", "high", "low", "close", "volume"]]
+    return df
 
 
 def fetch_grouped_daily(
     trade_date: date | str,
     tickers: list[str] | None = None,
+    limiter: TokenBucket | None = None,
 ) -> pd.DataFrame:
     """
     Fetch all US stock EOD bars for *trade_date* via the Grouped Daily endpoint.
-    Optionally filter to a list of tickers.
+    Optionally filter to a list of tickers (applied while decoding); a
+    limiter, if given, is acquired before every API attempt (not on cache hits).
     """
     if isinstance(trade_date, str):
         trade_date = date.fromisoformat(trade_date)
 
-    url = f"{_BASE}/v2/aggs/grouped/locale/us/market/stocks/{trade_date.isoformat()}"
-    resp = requests.get(url, params={"apiKey": _api_key()}, timeout=30)
-    if resp.status_code != 200:
-        raise RuntimeError(f"Polygon grouped-daily returned {resp.status_code}: {resp.text}")
-
-    data = resp.json()
-    results = data.get("results", [])
-
-    if tickers:
-        upper = {t.upper() for t in tickers}
-        results = [r for r in results if r.get("T", "").upper() in upper]
+    url = f"{_base_url()}/v2/aggs/grouped/locale/us/market/stocks/{trade_date.isoformat()}"
+    columns = _fetch_results(
+        url, {"apiKey": _api_key()}, "grouped-daily", trade_date, set(tickers) if tickers else None, limiter
+    )
 
-    df = _build_df(results)
+    df = _build_df(columns)
     # Override date from the endpoint parameter (Grouped Daily returns timestamp
     # at midnight which may drift; canonical date is the one we requested).
     if not df.empty:
@@ -96,6 +324,7 @@ def fetch_ticker_range(
     ticker: str,
     start: date | str,
     end: date | str,
+    limiter: TokenBucket | None = None,
 ) -> pd.DataFrame:
     """
     Backfill a date range for a single ticker via the Aggregates endpoint.
@@ -106,21 +335,15 @@ def fetch_ticker_range(
         end = date.fromisoformat(end)
 
     url = (
-        f"{_BASE}/v2/aggs/ticker/{ticker.upper()}/range/1/day"
+        f"{_base_url()}/v2/aggs/ticker/{ticker.upper()}/range/1/day"
         f"/{start.isoformat()}/{end.isoformat()}"
     )
-    resp = requests.get(url, params={"apiKey": _api_key(), "limit": 5000}, timeout=30)
-    if resp.status_code != 200:
-        raise RuntimeError(f"Polygon aggregates returned {resp.status_code}: {resp.text}")
-
-    data = resp.json()
-    results = data.get("results", [])
+    columns = _fetch_results(url, {"apiKey": _api_key(), "limit": 5000}, "aggregates", end, limiter=limiter)
 
     # Aggregates endpoint doesn't include "T" in each result — inject it.
-    for r in results:
-        r["T"] = ticker.upper()
+    columns["T"] = [ticker.upper()] * len(columns["t"])
 
-    df = _build_df(results)
+    df = _build_df(columns)
     df = df.sort_values("date").reset_index(drop=True)
     return df
 
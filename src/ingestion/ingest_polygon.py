@@ -1,38 +1,49 @@
 """
 Daily incremental ingest: fetch EOD prices for the full universe via
-Polygon.io Grouped Daily endpoint (single API call) and append to the
-raw parquet layer.
+Polygon.io Grouped Daily endpoint (one API call per trading day) and append
+to the raw parquet layer as a new year/month fragment.
+
+Every trading day missing since the latest stored date is caught up in one
+run: the days are fetched concurrently under the rate limit, deduped once,
+and written with a single append and a single Supabase upsert.
 
 Usage:
-    python -m src.ingestion.ingest_polygon            # auto-detect latest missing date
+    python -m src.ingestion.ingest_polygon            # catch up all missing dates
     python -m src.ingestion.ingest_polygon --date 2026-04-03  # force a specific date
+    python -m src.ingestion.ingest_polygon --api-cache        # reuse cached API responses
 """
 
 from __future__ import annotations
 
 import argparse
-import os
-import shutil
-import tempfile
 import uuid
 from datetime import date, datetime, timedelta, timezone
 from pathlib import Path
 
 import pandas as pd
 import pyarrow as pa
-import pyarrow.parquet as pq
-
-import psycopg2
-from psycopg2.extras import execute_values
 
-from src.ingestion.fetch_polygon import fetch_grouped_daily
+from src.db.postgres import format_upsert_stats
+from src.db.stock_prices import upsert_raw_prices
+from src.ingestion.fetch_polygon import API_CACHE_DIR, enable_response_cache, fetch_grouped_daily
+from src.utils.parallel_scan import bounded_map
+from src.utils.price_utils import iter_raw_row_groups, raw_row_count
+from src.utils.rate_limit import TokenBucket
+from src.utils.raw_key_index import new_key_mask, refresh_key_index
+from src.utils.raw_manifest import load_manifest, max_dates_from_manifest
+from src.utils.raw_store import RAW_DATASET_DIR, append_raw_fragment
 
 # ---------------------------------------------------------------------------
 # Config
 # ---------------------------------------------------------------------------
 UNIVERSE_CSV = Path("input/finlify_core_universe.csv")
-PARQUET_PATH = Path("data/raw/stock_price_stooq/stock_prices.parquet")
+RAW_PATH = RAW_DATASET_DIR
 SOURCE_SYSTEM = "polygon_daily"
+DEFAULT_REQUESTS_PER_MINUTE = 5
+DEFAULT_WORKERS = 4
+MAX_CATCHUP_DAYS = 10
+# With no stored data, ingest the trading days within this many calendar days.
+WALK_BACK_DAYS = 5
 
 
 def _build_run_id() -> str:
@@ -45,13 +56,23 @@ def _load_universe() -> list[str]:
     return sorted(set(df["symbol"].str.strip().str.upper()))
 
 
-def _global_max_date(parquet_path: Path, universe_symbols: set[str]) -> date | None:
-    """Max payload_date across universe tickers only, streaming row groups."""
-    pf = pq.ParquetFile(parquet_path)
+def _global_max_date(raw_path: Path, universe_symbols: set[str]) -> date | None:
+    """Max payload_date across universe tickers only.
+
+    Answered from the raw manifest when it is current; otherwise streams
+    row groups.
+    """
+    manifest = load_manifest(raw_path)
+    if manifest is not None:
+        max_dates = max_dates_from_manifest(manifest, universe_symbols)
+        return max(max_dates.values()) if max_dates else None
+
     global_max: date | None = None
-    for rg in range(pf.metadata.num_row_groups):
-        chunk = pf.read_row_group(rg, columns=["symbol_raw", "payload_date"]).to_pandas()
-        chunk = chunk[chunk["symbol_raw"].isin(universe_symbols)]
+    scan = iter_raw_row_groups(
+        raw_path, columns=["symbol_raw", "payload_date"], symbols=universe_symbols, ordered=False
+    )
+    for table in scan:
+        chunk = table.to_pandas()
         if chunk.empty:
             continue
         chunk["payload_date"] = pd.to_datetime(chunk["payload_date"], errors="coerce")
@@ -85,80 +106,79 @@ def _polygon_to_raw_schema(
     )
 
 
-def _streaming_append(parquet_path: Path, new_table: pa.Table) -> None:
-    """Append new_table to an existing parquet file via temp-file streaming."""
-    pf = pq.ParquetFile(parquet_path)
-    existing_schema = pf.schema_arrow
-    new_table = new_table.cast(existing_schema)
+def _missing_trading_days(max_existing: date | None, today: date, max_days: int | None = None) -> list[date]:
+    """
+    Weekdays after max_existing up to today (holidays come back empty),
+    oldest first and capped at max_days. The next run continues after the
+    last day stored, so a cap never skips days.
+    """
+    start = max_existing + timedelta(days=1) if max_existing else today - timedelta(days=WALK_BACK_DAYS)
+    days = [d.date() for d in pd.bdate_range(start, today)] if start <= today else []
+    return days[:max_days]
 
-    tmp_fd, tmp_path = tempfile.mkstemp(
-        dir=parquet_path.parent, suffix=".parquet.tmp"
-    )
+
+def _fetch_day(day: date, tickers: list[str], limiter: TokenBucket) -> pd.DataFrame | None:
+    """Grouped daily rows for day; None when the API rejects the date."""
     try:
-        os.close(tmp_fd)
-        shutil.copy2(parquet_path, tmp_path)
-
-        src_pf = pq.ParquetFile(tmp_path)
-        writer = pq.ParquetWriter(str(parquet_path), existing_schema, compression="snappy")
-        try:
-            for rg in range(src_pf.metadata.num_row_groups):
-                writer.write_table(src_pf.read_row_group(rg))
-            writer.write_table(new_table)
-        except Exception:
-            writer.close()
-            shutil.copy2(tmp_path, parquet_path)
-            raise
-        else:
-            writer.close()
-    finally:
-        Path(tmp_path).unlink(missing_ok=True)
-
-
-def _upsert_to_supabase(raw_df: pd.DataFrame) -> int | None:
-    """Upsert raw_df rows into Supabase stock_prices. Returns inserted count or None if skipped."""
-    db_url = os.environ.get("SUPABASE_DB_URL")
-    if not db_url:
-        print("  WARNING: SUPABASE_DB_URL not set — skipping Supabase upsert")
-        return None
+        return fetch_grouped_daily(day, tickers=tickers, limiter=limiter)
+    except RuntimeError as e:
+        if "403" in str(e) or "NOT_AUTHORIZED" in str(e):
+            # Free tier has no data for the current day before EOD.
+            print(f"  API rejected {day} (free-tier may not have data for this date yet).")
+            return None
+        raise
 
-    out = pd.DataFrame(
-        {
-            "source_ticker": raw_df["symbol_raw"],
-            "ticker": raw_df["symbol_raw"].str.replace(r"\.\w+$", "", regex=True),
-            "date": raw_df["payload_date"],
-            "open": raw_df["open_raw"],
-            "high": raw_df["high_raw"],
-            "low": raw_df["low_raw"],
-            "close": raw_df["close_raw"],
-            "volume": raw_df["volume_raw"],
-            "source_system": raw_df["source_system"],
-            "ingested_at": raw_df["ingested_at"],
-        }
-    )
 
-    sql = """
-        INSERT INTO stock_prices
-            (source_ticker, ticker, date, open, high, low, close, volume, source_system, ingested_at)
-        VALUES %s
-        ON CONFLICT (source_ticker, date) DO NOTHING
+def _contiguous_days(results: list[tuple[date, pd.DataFrame | None]]) -> list[tuple[date, pd.DataFrame]]:
     """
-    conn = psycopg2.connect(db_url)
-    try:
-        rows = list(out.itertuples(index=False, name=None))
-        with conn.cursor() as cur:
-            execute_values(cur, sql, rows, page_size=1000)
-            inserted = cur.rowcount
-        conn.commit()
-    finally:
-        conn.close()
+    The fetched days that can be stored without leaving a hole behind the
+    new max date.
 
-    return inserted
+    Stops at the first rejected day, and drops empty days after the last day
+    with data (not published yet). An empty day followed by a day with data
+    is a market holiday. Days that are not kept become the next run's gap.
+    """
+    kept: list[tuple[date, pd.DataFrame]] = []
+    for day, df in results:
+        if df is None:
+            break
+        kept.append((day, df))
+    while kept and kept[-1][1].empty:
+        kept.pop()
+    return kept
 
 
-def main() -> None:
+def parse_args() -> argparse.Namespace:
     parser = argparse.ArgumentParser(description="Daily Polygon.io ingest")
     parser.add_argument("--date", type=str, default=None, help="Override target date (YYYY-MM-DD)")
-    args = parser.parse_args()
+    parser.add_argument(
+        "--max-days",
+        type=int,
+        default=MAX_CATCHUP_DAYS,
+        help="Oldest missing trading days to catch up in one run (use backfill_polygon for long gaps).",
+    )
+    parser.add_argument(
+        "--requests-per-minute",
+        type=float,
+        default=DEFAULT_REQUESTS_PER_MINUTE,
+        help="API plan rate limit (0 = unlimited).",
+    )
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Concurrent API requests.")
+    parser.add_argument(
+        "--api-cache",
+        type=Path,
+        nargs="?",
+        const=API_CACHE_DIR,
+        default=None,
+        help=f"Cache Polygon responses on disk (default dir: {API_CACHE_DIR}).",
+    )
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    if args.api_cache:
+        enable_response_cache(args.api_cache)
 
     run_id = _build_run_id()
     ingested_at = datetime.now(timezone.utc)
@@ -170,107 +190,100 @@ def main() -> None:
 
     # 2. Find global max date in parquet (universe only)
     print("Reading existing parquet max date...")
-    old_pf = pq.ParquetFile(PARQUET_PATH)
-    old_row_count = old_pf.metadata.num_rows
-    max_existing = _global_max_date(PARQUET_PATH, universe_symbols)
+    old_row_count = raw_row_count(RAW_PATH)
+    max_existing = _global_max_date(RAW_PATH, universe_symbols)
     print(f"  Existing rows:  {old_row_count:,}")
     print(f"  Max date:       {max_existing}")
 
-    # 3. Determine target date
+    # 3. Determine target dates: every missing trading day, or the forced --date
     if args.date:
         target_date = date.fromisoformat(args.date)
+        if max_existing and target_date <= max_existing:
+            print(f"\nAlready up to date (max date {max_existing} >= target {target_date}).")
+            return
+        target_dates = [target_date]
     else:
         today = date.today()
         if max_existing and max_existing >= today:
             print(f"\nAlready up to date (max date {max_existing} >= today {today}).")
             return
-        # Walk backwards from today to find the next date to ingest
-        target_date = today
-
-    if max_existing and target_date <= max_existing:
-        print(f"\nAlready up to date (max date {max_existing} >= target {target_date}).")
-        return
-
-    print(f"\nTarget date: {target_date}")
-    print(f"Run ID:      {run_id}")
-
-    # 4. Fetch — single API call for all tickers
-    print("Fetching grouped daily data...")
-    try:
-        df = fetch_grouped_daily(target_date, tickers=tickers)
-    except RuntimeError as e:
-        if "403" in str(e) or "NOT_AUTHORIZED" in str(e):
-            print(f"  API rejected {target_date} (free-tier may not have data for this date yet).")
-            df = pd.DataFrame()
-        else:
-            raise
-
-    if df.empty:
-        # Market may have been closed — walk back up to 5 days
-        if not args.date:
-            for offset in range(1, 6):
-                try_date = date.today() - timedelta(days=offset)
-                if max_existing and try_date <= max_existing:
-                    break
-                print(f"  No data for {target_date}, trying {try_date}...")
-                df = fetch_grouped_daily(try_date, tickers=tickers)
-                if not df.empty:
-                    target_date = try_date
-                    break
-        if df.empty:
-            print("No data returned. Market may be closed.")
+        missing = _missing_trading_days(max_existing, today)
+        if not missing:
+            print(f"\nNo trading days after {max_existing}. Nothing to ingest.")
             return
-
-    # 5. Normalize date
-    df["date"] = pd.to_datetime(df["date"].dt.date)
-
-    print(f"  Received {len(df)} rows for {df['ticker'].nunique()} tickers")
+        target_dates = missing[: args.max_days]
+        remaining = len(missing) - len(target_dates)
+        if remaining:
+            print(
+                f"\nWARNING: {remaining} more missing trading day(s) after {target_dates[-1]} exceed --max-days; "
+                "rerun to continue, or use backfill_polygon for long gaps."
+            )
+
+    print(f"\nTarget dates: {', '.join(str(d) for d in target_dates)}")
+    print(f"Run ID:       {run_id}")
+
+    # 4. Fetch — one grouped-daily call per date, concurrently under the rate limit
+    print(f"Fetching grouped daily data for {len(target_dates)} date(s)...")
+    limiter = TokenBucket(args.requests_per_minute)
+    frames: list[pd.DataFrame] = []
+    fetched_dates: list[date] = []
+    fetched = bounded_map(lambda d: _fetch_day(d, tickers, limiter), target_dates, workers=args.workers)
+    results = list(zip(target_dates, fetched))
+    kept = _contiguous_days(results)
+    if len(kept) < len(results):
+        print(f"  Stopping before {results[len(kept)][0]}: it and later dates are retried next run")
+    for day, df in kept:
+        if df.empty:
+            print(f"  {day}: no data (market closed)")
+            continue
+        # Normalize date
+        df["date"] = pd.to_datetime(df["date"].dt.date)
+        print(f"  {day}: {len(df)} rows for {df['ticker'].nunique()} tickers")
+        frames.append(df)
+        fetched_dates.append(day)
+
+    if not frames:
+        print("No data returned. Market may be closed.")
+        return
 
     # Convert to raw schema
-    raw_df = _polygon_to_raw_schema(df, run_id, ingested_at)
-
-    # 6. Dedup check (lightweight — single date)
-    target_str = str(target_date)
-    existing_keys: set[str] = set()
-    pf = pq.ParquetFile(PARQUET_PATH)
-    for rg in range(pf.metadata.num_row_groups):
-        chunk = pf.read_row_group(rg, columns=["symbol_raw", "payload_date"]).to_pandas()
-        chunk = chunk[chunk["symbol_raw"].isin(universe_symbols)]
-        chunk["payload_date"] = chunk["payload_date"].astype(str)
-        chunk = chunk[chunk["payload_date"] == target_str]
-        if not chunk.empty:
-            existing_keys.update(chunk["symbol_raw"])
-        del chunk
+    raw_df = _polygon_to_raw_schema(pd.concat(frames, ignore_index=True), run_id, ingested_at)
 
-    if existing_keys:
-        before = len(raw_df)
-        raw_df = raw_df[~raw_df["symbol_raw"].isin(existing_keys)]
-        print(f"  Removed {before - len(raw_df)} duplicates")
+    # 5. Dedup the whole batch once against the persisted (symbol, date) key index
+    refresh_key_index(RAW_PATH)
+    is_new = new_key_mask(RAW_PATH, raw_df["symbol_raw"].to_numpy(), raw_df["payload_date"])
+    n_dupes = int((~is_new).sum())
+    if n_dupes:
+        raw_df = raw_df[is_new]
+        print(f"  Removed {n_dupes} duplicates")
 
     if raw_df.empty:
         print("All rows already exist. Nothing to append.")
         return
 
-    # 7. Append
+    # 6. One append for the batch (existing files are never rewritten)
     print(f"Appending {len(raw_df):,} rows...")
     new_table = pa.Table.from_pandas(raw_df, preserve_index=False)
-    _streaming_append(PARQUET_PATH, new_table)
+    fragments = append_raw_fragment(RAW_PATH, new_table, run_id)
+    for frag in fragments:
+        print(f"  Wrote fragment: {frag}")
 
-    # 7b. Upsert to Supabase
+    # 6b. One Supabase upsert for the batch
     print("Upserting to Supabase...")
-    sb_inserted = _upsert_to_supabase(raw_df)
-    if sb_inserted is not None:
-        print(f"  Supabase: {sb_inserted} inserted, {len(raw_df) - sb_inserted} skipped (already existed)")
+    sb_stats = upsert_raw_prices(raw_df)
+    if sb_stats is None:
+        print("  WARNING: SUPABASE_DB_URL not set — skipping Supabase upsert")
+    else:
+        print(f"  Supabase {format_upsert_stats(sb_stats)}")
 
-    # 8. Summary
-    final_pf = pq.ParquetFile(PARQUET_PATH)
-    final_row_count = final_pf.metadata.num_rows
+    # 7. Summary
+    final_row_count = raw_row_count(RAW_PATH)
 
     print("\n" + "=" * 60)
     print("DAILY INGEST SUMMARY")
     print("=" * 60)
     print(f"  Run ID:            {run_id}")
-    print(f"  Target date:       {target_date}")
+    print(f"  Dates ingested:    {', '.join(str(d) for d in fetched_dates)}")
     print(f"  Tickers updated:   {raw_df['symbol_raw'].nunique()}")
     print(f"  Rows appended:     {len(raw_df):,}")
     print(f"  Old parquet rows:  {old_row_count:,}")
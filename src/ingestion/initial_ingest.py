@@ -9,12 +9,23 @@ Purpose:
 
 What this script does:
 - Auto-detects an input folder under input/*/daily/us (or uses --input-root).
-- Reads all TXT files recursively and validates required OHLCV fields.
+- Reads all TXT files recursively and validates required OHLCV fields
+  (optionally on a process pool with --workers; results are written in file order).
+  Files are parsed with pyarrow.csv against a fixed schema; files the strict
+  reader rejects fall back to the lenient pandas parser.
 - Converts rows into the project raw schema:
   source_system, ingestion_run_id, ingested_at, symbol_raw, payload_date,
   open_raw, high_raw, low_raw, close_raw, volume_raw.
-- Writes one consolidated parquet file to data/raw/stock_price_stooq/stock_prices.parquet.
+- Writes one consolidated parquet file to data/raw/stock_price_stooq/stock_prices.parquet
+  (the base snapshot of the raw dataset) and drops any year=/month= fragments
+  appended by earlier daily runs, since the rebuild supersedes them.
 - Emits a failed-file log under data/raw/_failed_logs for auditability and retry.
+- With --incremental, keeps Stooq rows in source=stooq/bucket=NN fragments and a
+  fingerprint manifest (_stooq_files.json: size, mtime, SHA-256, symbols per file);
+  reruns parse only new or changed files and rewrite only the buckets they touch.
+  Without a usable manifest (first run, or after compact_raw / a full Supabase
+  pull merged the buckets into the base file) the buckets are rebuilt; Stooq
+  rows are dropped from the base file first, other sources' rows are kept.
 
 Why this exists:
 - API ingestion can fail due to rate limits or network issues.
@@ -22,20 +33,63 @@ Why this exists:
 """
 
 import argparse
+import hashlib
+import json
+import shutil
 from datetime import datetime, timezone
+from functools import partial
 from pathlib import Path
+from typing import Any, Callable
 import uuid
 
 import pandas as pd
 import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
 import pyarrow.parquet as pq
 
+from src.utils.atomic_io import atomic_path, commit_temp, write_json_atomic
+from src.utils.parallel_scan import bounded_map
+from src.utils.raw_store import (
+    DEFAULT_ROW_GROUP_ROWS,
+    DEFAULT_STOOQ_BUCKETS,
+    RAW_BASE_FILE_NAME,
+    STOOQ_BUCKET_DIR_NAME,
+    STOOQ_FILE_MANIFEST_NAME,
+    SUPABASE_PULL_STATE_NAME,
+    RowGroupBufferedWriter,
+    clear_raw_fragments,
+    is_compact_schema,
+    raw_dataset_schema,
+    refresh_raw_sidecars,
+    stooq_bucket,
+    stooq_bucket_dir,
+)
+
 
 INPUT_ROOT = Path("input/stock price/daily/us")
 OUTPUT_DIR = Path("data/raw/stock_price_stooq")
 FAILED_DIR = Path("data/raw/_failed_logs")
 OUTPUT_FILE = OUTPUT_DIR / "stock_prices.parquet"
 SOURCE_SYSTEM = "stooq_manual_dump"
+STOOQ_FILE_MANIFEST_VERSION = 1
+
+STOOQ_REQUIRED_COLUMNS = ("ticker", "date", "open", "high", "low", "close", "vol")
+STOOQ_NUMERIC_COLUMNS = ("open", "high", "low", "close", "vol")
+RAW_TABLE_SCHEMA = pa.schema(
+    [
+        pa.field("source_system", pa.string()),
+        pa.field("ingestion_run_id", pa.string()),
+        pa.field("ingested_at", pa.timestamp("us", tz="UTC")),
+        pa.field("symbol_raw", pa.string()),
+        pa.field("payload_date", pa.date32()),
+        pa.field("open_raw", pa.float64()),
+        pa.field("high_raw", pa.float64()),
+        pa.field("low_raw", pa.float64()),
+        pa.field("close_raw", pa.float64()),
+        pa.field("volume_raw", pa.float64()),
+    ]
+)
 
 
 def build_ingestion_run_id() -> str:
@@ -121,7 +175,8 @@ def parse_txt_file(path: Path) -> pd.DataFrame:
     if df.empty:
         raise ValueError("no daily rows in file")
 
-    df["ticker"] = df["ticker"].astype(str).str.strip().str.upper()
+    # Missing and blank tickers become NA and are dropped with the other invalid rows.
+    df["ticker"] = df["ticker"].astype("string").str.strip().str.upper().replace("", pd.NA)
     df["date"] = pd.to_datetime(df["date"].astype(str), format="%Y%m%d", errors="coerce")
     df["open"] = pd.to_numeric(df["open"], errors="coerce")
     df["high"] = pd.to_numeric(df["high"], errors="coerce")
@@ -133,9 +188,69 @@ def parse_txt_file(path: Path) -> pd.DataFrame:
     if df.empty:
         raise ValueError("no valid rows after type conversion")
 
+    df["ticker"] = df["ticker"].astype(str)
     return df
 
 
+def read_txt_file_arrow(
+    path: Path,
+    ingestion_run_id: str,
+    ingested_at: datetime,
+) -> pa.Table:
+    """
+    Fast path: parse a Stooq TXT file straight into a RAW_TABLE_SCHEMA table.
+
+    Columns are read with fixed types (float64 prices/volume, %Y%m%d dates),
+    so any malformed value raises instead of being coerced; ingest_file then
+    retries the file with the pandas parser. Validation errors use the same
+    messages as parse_txt_file, and rows with a missing or blank ticker are
+    dropped as they are there.
+    """
+    with path.open("r", encoding="utf-8-sig", newline="") as f:
+        header = f.readline()
+    names = [str(c).strip().strip("<>").lower() for c in header.rstrip("\r\n").split(",")]
+    missing = set(STOOQ_REQUIRED_COLUMNS) - set(names)
+    if missing:
+        raise ValueError(f"missing columns: {sorted(missing)}")
+
+    include = list(STOOQ_REQUIRED_COLUMNS) + (["per"] if "per" in names else [])
+    types = {name: pa.float64() for name in STOOQ_NUMERIC_COLUMNS}
+    types.update({"ticker": pa.string(), "date": pa.timestamp("s"), "per": pa.string()})
+    table = pacsv.read_csv(
+        path,
+        read_options=pacsv.ReadOptions(column_names=names, skip_rows=1),
+        convert_options=pacsv.ConvertOptions(
+            column_types={name: types[name] for name in include},
+            include_columns=include,
+            timestamp_parsers=["%Y%m%d"],
+        ),
+    )
+
+    if "per" in names:
+        table = table.filter(pc.equal(pc.utf8_upper(table["per"]), "D")).drop_columns(["per"])
+    if table.num_rows == 0:
+        raise ValueError("no daily rows in file")
+
+    ticker = pc.utf8_upper(pc.utf8_trim_whitespace(table["ticker"]))
+    ticker = pc.if_else(pc.equal(ticker, ""), pa.scalar(None, pa.string()), ticker)
+    table = table.set_column(table.schema.get_field_index("ticker"), "ticker", ticker)
+    table = table.drop_null()
+    if table.num_rows == 0:
+        raise ValueError("no valid rows after type conversion")
+
+    n = table.num_rows
+    columns = {
+        "source_system": pa.repeat(pa.scalar(SOURCE_SYSTEM), n),
+        "ingestion_run_id": pa.repeat(pa.scalar(ingestion_run_id), n),
+        "ingested_at": pa.repeat(pa.scalar(ingested_at, RAW_TABLE_SCHEMA.field("ingested_at").type), n),
+        "symbol_raw": table["ticker"],
+        "payload_date": pc.cast(table["date"], pa.date32()),
+    }
+    for name in STOOQ_NUMERIC_COLUMNS:
+        columns["volume_raw" if name == "vol" else f"{name}_raw"] = table[name]
+    return pa.table(columns, schema=RAW_TABLE_SCHEMA)
+
+
 def to_raw_schema(
     parsed_df: pd.DataFrame,
     ingestion_run_id: str,
@@ -158,6 +273,31 @@ def to_raw_schema(
     return raw_df
 
 
+def ingest_file(
+    path: Path,
+    ingestion_run_id: str,
+    ingested_at: datetime,
+) -> tuple[pa.Table | None, str | None]:
+    """
+    Parse one TXT file into a raw-schema Arrow table, or return its error message.
+
+    Tries the pyarrow.csv reader first; anything it rejects is re-parsed by
+    the pandas parser, which coerces bad values and words the error that
+    ends up in the failed-file log. Module-level so it can run in worker
+    processes.
+    """
+    try:
+        return read_txt_file_arrow(path, ingestion_run_id, ingested_at), None
+    except Exception:
+        pass
+    try:
+        parsed = parse_txt_file(path)
+        raw_df = to_raw_schema(parsed, ingestion_run_id=ingestion_run_id, ingested_at=ingested_at)
+        return pa.Table.from_pandas(raw_df, preserve_index=False).cast(RAW_TABLE_SCHEMA), None
+    except Exception as e:
+        return None, str(e)
+
+
 def save_failed_log(failed_rows: list[dict], ingestion_run_id: str) -> Path:
     FAILED_DIR.mkdir(parents=True, exist_ok=True)
     out = FAILED_DIR / f"{ingestion_run_id}_initial_ingest_failed_files.csv"
@@ -165,11 +305,66 @@ def save_failed_log(failed_rows: list[dict], ingestion_run_id: str) -> Path:
     return out
 
 
+def _ingest_files(
+    files: list[Path],
+    ingestion_run_id: str,
+    ingested_at: datetime,
+    write: Callable[[Path, pa.Table], None],
+    failed_rows: list[dict],
+    workers: int = 1,
+    log_every: int = 200,
+) -> tuple[int, int]:
+    """
+    Parse files and hand each table to write(path, table), in file order.
+
+    Files are parsed in worker processes (or inline for workers=1); the
+    calling process is the single writer. Failures, including errors raised
+    by write, are appended to failed_rows. Returns (success_files, rows).
+    """
+    success_files = 0
+    total_rows = 0
+    parse = partial(ingest_file, ingestion_run_id=ingestion_run_id, ingested_at=ingested_at)
+    results = bounded_map(parse, files, workers=workers, processes=workers > 1)
+    try:
+        for idx, (path, (table, error)) in enumerate(zip(files, results), start=1):
+            if error is None:
+                try:
+                    write(path, table)
+                    success_files += 1
+                    total_rows += table.num_rows
+                except Exception as e:
+                    error = str(e)
+            if error is not None:
+                failed_rows.append(
+                    {
+                        "ingestion_run_id": ingestion_run_id,
+                        "file_path": str(path),
+                        "error_message": error,
+                        "logged_at_utc": datetime.now(timezone.utc).isoformat(),
+                    }
+                )
+
+            if idx % max(1, log_every) == 0 or idx == len(files):
+                print(
+                    f"[{idx:,}/{len(files):,}] "
+                    f"success_files={success_files:,} failed_files={len(failed_rows):,} "
+                    f"rows_written={total_rows:,}"
+                )
+    finally:
+        results.close()
+    return success_files, total_rows
+
+
 def run_ingestion(
     input_root: Path,
     output_file: Path,
     log_every: int = 200,
+    row_group_rows: int = DEFAULT_ROW_GROUP_ROWS,
+    workers: int = 1,
+    compact: bool = False,
 ) -> None:
+    if workers < 1:
+        raise ValueError("workers must be a positive integer.")
     output_file.parent.mkdir(parents=True, exist_ok=True)
     FAILED_DIR.mkdir(parents=True, exist_ok=True)
 
@@ -180,54 +375,45 @@ def run_ingestion(
     ingestion_run_id = build_ingestion_run_id()
     ingested_at = datetime.now(timezone.utc)
 
-    writer: pq.ParquetWriter | None = None
+    writer: RowGroupBufferedWriter | None = None
     failed_rows: list[dict] = []
-    total_rows = 0
     total_symbols: set[str] = set()
-    success_files = 0
 
     if output_file.exists():
         output_file.unlink()
+    if output_file.name == RAW_BASE_FILE_NAME:
+        (output_file.parent / SUPABASE_PULL_STATE_NAME).unlink(missing_ok=True)
+        cleared = clear_raw_fragments(output_file.parent)
+        if cleared:
+            print(f"Removed {cleared} stale partition folder(s) under {output_file.parent}")
 
     print(f"Starting initial ingest: {ingestion_run_id}")
     print(f"Input root: {input_root}")
     print(f"Output parquet: {output_file}")
     print(f"Total files discovered: {len(files):,}")
+    if workers > 1:
+        print(f"Parser processes: {workers}")
+
+    def write(path: Path, table: pa.Table) -> None:
+        nonlocal writer
+        if writer is None:
+            writer = RowGroupBufferedWriter(
+                output_file, table.schema, row_group_rows=row_group_rows, compact=compact
+            )
+        writer.write_table(table)
+        total_symbols.update(pc.unique(table["symbol_raw"]).to_pylist())
 
     try:
-        for idx, path in enumerate(files, start=1):
-            try:
-                parsed = parse_txt_file(path)
-                raw_df = to_raw_schema(parsed, ingestion_run_id=ingestion_run_id, ingested_at=ingested_at)
-                table = pa.Table.from_pandas(raw_df, preserve_index=False)
-
-                if writer is None:
-                    writer = pq.ParquetWriter(str(output_file), table.schema, compression="snappy")
-                writer.write_table(table)
-
-                success_files += 1
-                total_rows += len(raw_df)
-                total_symbols.update(raw_df["symbol_raw"].unique().tolist())
-            except Exception as e:
-                failed_rows.append(
-                    {
-                        "ingestion_run_id": ingestion_run_id,
-                        "file_path": str(path),
-                        "error_message": str(e),
-                        "logged_at_utc": datetime.now(timezone.utc).isoformat(),
-                    }
-                )
-
-            if idx % max(1, log_every) == 0 or idx == len(files):
-                print(
-                    f"[{idx:,}/{len(files):,}] "
-                    f"success_files={success_files:,} failed_files={len(failed_rows):,} "
-                    f"rows_written={total_rows:,}"
-                )
+        success_files, total_rows = _ingest_files(
+            files, ingestion_run_id, ingested_at, write, failed_rows, workers=workers, log_every=log_every
+        )
     finally:
         if writer is not None:
             writer.close()
 
+    if output_file.name == RAW_BASE_FILE_NAME and output_file.exists():
+        refresh_raw_sidecars(output_file.parent)
+
     failed_log_path = save_failed_log(failed_rows, ingestion_run_id)
 
     print("\nInitial ingest completed")
@@ -235,11 +421,297 @@ def run_ingestion(
     print(f"Success files: {success_files:,}")
     print(f"Failed files: {len(failed_rows):,}")
     print(f"Total rows written: {total_rows:,}")
+    if writer is not None:
+        print(f"Row groups written: {writer.row_groups_written:,}")
     print(f"Unique symbols written: {len(total_symbols):,}")
     print(f"Output parquet: {output_file}")
     print(f"Failed log: {failed_log_path}")
 
 
+# ---------------------------------------------------------------------------
+# Incremental mode: file fingerprints -> Stooq symbol buckets
+# ---------------------------------------------------------------------------
+def file_fingerprint(path: Path, previous: dict[str, Any] | None = None) -> dict[str, Any]:
+    """
+    Size, mtime and SHA-256 of a TXT file.
+
+    The hash is reused from previous when size and mtime are unchanged, so
+    an unchanged tree is fingerprinted from stat() calls alone.
+    """
+    st = path.stat()
+    if previous and previous.get("size") == st.st_size and previous.get("mtime_ns") == st.st_mtime_ns:
+        return {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha256": previous["sha256"]}
+    with path.open("rb") as f:
+        digest = hashlib.file_digest(f, "sha256").hexdigest()
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha256": digest}
+
+
+def load_file_manifest(dataset_dir: Path, input_root: Path, buckets: int) -> dict[str, Any] | None:
+    """
+    Return the Stooq file manifest if it still describes dataset_dir.
+
+    It is unusable when it was built from another input root or bucket
+    count, or when a recorded bucket fragment is gone (e.g. after
+    compact_raw or a Supabase pull replaced the base snapshot).
+    """
+    path = dataset_dir / STOOQ_FILE_MANIFEST_NAME
+    try:
+        manifest = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, json.JSONDecodeError):
+        return None
+    if (
+        manifest.get("version") != STOOQ_FILE_MANIFEST_VERSION
+        or manifest.get("input_root") != str(input_root.resolve())
+        or manifest.get("buckets") != buckets
+    ):
+        return None
+    if not all((dataset_dir / rel).is_file() for rel in manifest.get("fragments", {}).values()):
+        return None
+    return manifest
+
+
+def _save_file_manifest(dataset_dir: Path, manifest: dict[str, Any]) -> None:
+    write_json_atomic(dataset_dir / STOOQ_FILE_MANIFEST_NAME, manifest, separators=(",", ":"))
+
+
+def _drop_stooq_rows(dataset_dir: Path, row_group_rows: int = DEFAULT_ROW_GROUP_ROWS) -> int | None:
+    """
+    Rewrite the base file without Stooq rows ahead of a full bucket rebuild.
+
+    compact_raw and full Supabase pulls fold Polygon/Supabase rows into the
+    base file next to the Stooq rows, so it cannot simply be deleted. A base
+    left holding no rows is removed. Returns the rows kept, or None when
+    there is no base file.
+    """
+    base = dataset_dir / RAW_BASE_FILE_NAME
+    if not base.exists():
+        return None
+    source = pq.ParquetFile(base)
+    schema = source.schema_arrow
+    with atomic_path(base) as tmp_path:
+        with RowGroupBufferedWriter(
+            tmp_path, schema, row_group_rows=row_group_rows, compact=is_compact_schema(schema)
+        ) as writer:
+            for i in range(source.num_row_groups):
+                table = source.read_row_group(i)
+                keep = pc.fill_null(pc.not_equal(table["source_system"], SOURCE_SYSTEM), True)
+                writer.write_table(table.filter(keep))
+        kept = writer.rows_written
+    if kept == 0:
+        base.unlink()
+    return kept
+
+
+def _remove_orphan_fragments(dataset_dir: Path, manifest: dict[str, Any]) -> int:
+    """Delete bucket fragments and temp files a crashed run left behind (not in the manifest)."""
+    recorded = {dataset_dir / rel for rel in manifest["fragments"].values()}
+    bucket_root = dataset_dir / STOOQ_BUCKET_DIR_NAME
+    removed = 0
+    for path in bucket_root.glob("bucket=*/*.parquet"):
+        if path not in recorded:
+            path.unlink()
+            removed += 1
+    for path in bucket_root.glob("bucket=*/.*.tmp"):
+        path.unlink()
+    return removed
+
+
+def run_incremental_ingestion(
+    input_root: Path,
+    dataset_dir: Path,
+    log_every: int = 200,
+    row_group_rows: int = DEFAULT_ROW_GROUP_ROWS,
+    workers: int = 1,
+    buckets: int = DEFAULT_STOOQ_BUCKETS,
+    compact: bool = False,
+) -> dict[str, int]:
+    """
+    Parse only new or changed TXT files and rewrite only their symbol buckets.
+
+    Stooq rows live in source=stooq/bucket=NN fragments; the file manifest
+    records each TXT file's fingerprint and symbols. Rows of changed or
+    deleted files are dropped from their buckets and replaced by the fresh
+    parse. Files sharing a symbol with a changed file are reparsed too, so
+    each bucket always equals a full parse of the current tree. Without a
+    usable manifest the dataset is rebuilt into buckets from scratch.
+    Files that fail to parse are left out of the manifest, so every run
+    retries them until they succeed.
+    Buckets are written compact when asked to or when the dataset already is.
+    """
+    if workers < 1:
+        raise ValueError("workers must be a positive integer.")
+    dataset_dir.mkdir(parents=True, exist_ok=True)
+    FAILED_DIR.mkdir(parents=True, exist_ok=True)
+
+    files = list_price_files(input_root)
+    if not files:
+        raise FileNotFoundError(f"No .txt files found under {input_root}")
+
+    ingestion_run_id = build_ingestion_run_id()
+    ingested_at = datetime.now(timezone.utc)
+    print(f"Starting incremental initial ingest: {ingestion_run_id}")
+    print(f"Input root: {input_root}")
+    print(f"Dataset: {dataset_dir}")
+
+    manifest = load_file_manifest(dataset_dir, input_root, buckets)
+    if manifest is None:
+        print("No usable Stooq file manifest — rebuilding every symbol bucket.")
+        kept = _drop_stooq_rows(dataset_dir, row_group_rows)
+        if kept == 0:
+            (dataset_dir / SUPABASE_PULL_STATE_NAME).unlink(missing_ok=True)
+        elif kept is not None:
+            print(f"Kept {kept:,} non-Stooq row(s) in {RAW_BASE_FILE_NAME}")
+        shutil.rmtree(dataset_dir / STOOQ_BUCKET_DIR_NAME, ignore_errors=True)
+        manifest = {
+            "version": STOOQ_FILE_MANIFEST_VERSION,
+            "input_root": str(input_root.resolve()),
+            "buckets": buckets,
+            "files": {},
+            "fragments": {},
+        }
+    else:
+        orphans = _remove_orphan_fragments(dataset_dir, manifest)
+        if orphans:
+            print(f"Removed {orphans} orphaned bucket fragment(s) from an interrupted run")
+        schema = raw_dataset_schema(dataset_dir)
+        compact = compact or (schema is not None and is_compact_schema(schema))
+
+    # 1. Fingerprint the tree against the manifest
+    recorded: dict[str, dict[str, Any]] = manifest["files"]
+    current = {path.relative_to(input_root).as_posix(): path for path in files}
+    fingerprints = {rel: file_fingerprint(path, recorded.get(rel)) for rel, path in current.items()}
+    changed = sorted(
+        rel for rel, fp in fingerprints.items() if rel not in recorded or recorded[rel]["sha256"] != fp["sha256"]
+    )
+    deleted = sorted(set(recorded) - set(current))
+    print(f"Files: {len(current):,} current, {len(changed):,} new or changed, {len(deleted):,} deleted")
+
+    symbol_files: dict[str, set[str]] = {}
+    for rel, entry in recorded.items():
+        for symbol in entry.get("symbols", []):
+            symbol_files.setdefault(symbol, set()).add(rel)
+
+    # 2. Parse changed files (and files sharing their symbols) into per-bucket writers
+    stale_symbols = {s for rel in deleted for s in recorded[rel].get("symbols", [])}
+    parsed: dict[str, dict[str, Any]] = {}
+    writers: dict[int, RowGroupBufferedWriter] = {}
+    tmp_paths: dict[int, Path] = {}
+    failed_rows: list[dict] = []
+    written: set[str] = set()
+    success_files = total_rows = 0
+
+    def writer_for(bucket: int) -> RowGroupBufferedWriter:
+        if bucket not in writers:
+            bucket_dir = stooq_bucket_dir(dataset_dir, bucket)
+            bucket_dir.mkdir(parents=True, exist_ok=True)
+            tmp_paths[bucket] = bucket_dir / f".part-{ingestion_run_id}.parquet.tmp"
+            writers[bucket] = RowGroupBufferedWriter(
+                tmp_paths[bucket], RAW_TABLE_SCHEMA, row_group_rows=row_group_rows, compact=compact
+            )
+        return writers[bucket]
+
+    def write(path: Path, table: pa.Table) -> None:
+        symbols = pc.unique(table["symbol_raw"]).to_pylist()
+        for symbol in symbols:
+            part = table if len(symbols) == 1 else table.filter(pc.equal(table["symbol_raw"], symbol))
+            writer_for(stooq_bucket(symbol, buckets)).write_table(part)
+        rel = path.relative_to(input_root).as_posix()
+        parsed[rel].update(symbols=symbols, rows=table.num_rows)
+        written.add(rel)
+
+    pending = changed
+    try:
+        while pending:
+            for rel in pending:
+                stale_symbols.update(recorded.get(rel, {}).get("symbols", []))
+                parsed[rel] = {**fingerprints[rel], "symbols": [], "rows": 0}
+            done = _ingest_files(
+                [current[rel] for rel in pending],
+                ingestion_run_id,
+                ingested_at,
+                write,
+                failed_rows,
+                workers=workers,
+                log_every=log_every,
+            )
+            success_files += done[0]
+            total_rows += done[1]
+            for rel in pending:
+                stale_symbols.update(parsed[rel]["symbols"])
+            # Unchanged files holding a stale symbol must be rewritten with it.
+            sharing = {rel for s in stale_symbols for rel in symbol_files.get(s, ())}
+            pending = sorted(rel for rel in sharing if rel in current and rel not in parsed)
+            if pending:
+                print(f"Reparsing {len(pending):,} unchanged file(s) that share symbols with changed files")
+
+        # 3. Carry over the untouched symbols of every affected bucket
+        affected = sorted({stooq_bucket(s, buckets) for s in stale_symbols} | set(writers))
+        stale = pa.array(sorted(stale_symbols), pa.string())
+        for bucket in affected:
+            old = manifest["fragments"].get(f"{bucket:02d}")
+            if old is None:
+                continue
+            kept = pq.read_table(dataset_dir / old)
+            kept = kept.filter(pc.invert(pc.is_in(kept["symbol_raw"], value_set=stale)))
+            writer_for(bucket).write_table(kept)
+    finally:
+        for writer in writers.values():
+            writer.close()
+
+    # 4. Publish new bucket fragments, then the manifest, then drop replaced fragments
+    replaced: list[Path] = []
+    for bucket in affected:
+        key = f"{bucket:02d}"
+        old = manifest["fragments"].pop(key, None)
+        if old is not None:
+            replaced.append(dataset_dir / old)
+        tmp_path = tmp_paths.get(bucket)
+        if tmp_path is None:
+            continue
+        if pq.ParquetFile(tmp_path).metadata.num_rows == 0:
+            tmp_path.unlink()
+            continue
+        final = tmp_path.with_name(f"part-{ingestion_run_id}.parquet")
+        commit_temp(tmp_path, final)
+        manifest["fragments"][key] = final.relative_to(dataset_dir).as_posix()
+
+    for rel in deleted:
+        del recorded[rel]
+    for rel, fp in fingerprints.items():
+        if rel in written:
+            recorded[rel] = parsed[rel]
+        elif rel in parsed:
+            # Failed files stay out of the manifest so the next run retries them.
+            recorded.pop(rel, None)
+        else:
+            # Touched-but-identical files only get their new size/mtime recorded.
+            recorded[rel].update(fp)
+    _save_file_manifest(dataset_dir, manifest)
+    for path in replaced:
+        path.unlink(missing_ok=True)
+
+    if affected:
+        refresh_raw_sidecars(dataset_dir)
+    failed_log_path = save_failed_log(failed_rows, ingestion_run_id)
+
+    stats = {
+        "files": len(current),
+        "changed_files": len(changed),
+        "deleted_files": len(deleted),
+        "parsed_files": len(parsed),
+        "failed_files": len(failed_rows),
+        "buckets_rewritten": len(affected),
+        "rows_written": total_rows,
+    }
+    print("\nIncremental initial ingest completed")
+    print(f"Ingestion Run ID: {ingestion_run_id}")
+    print(f"Files parsed: {len(parsed):,} (success {success_files:,}, failed {len(failed_rows):,})")
+    print(f"Rows parsed: {total_rows:,}")
+    print(f"Buckets rewritten: {len(affected):,} of {buckets}")
+    print(f"Failed log: {failed_log_path}")
+    return stats
+
+
 def parse_args() -> argparse.Namespace:
     parser = argparse.ArgumentParser(
         description="Initial ingest from local Stooq txt dump into raw parquet layer."
@@ -256,6 +728,28 @@ def parse_args() -> argparse.Namespace:
         default=OUTPUT_FILE,
         help="Destination parquet file path.",
     )
+    parser.add_argument(
+        "--row-group-rows",
+        type=int,
+        default=DEFAULT_ROW_GROUP_ROWS,
+        help="Target rows per parquet row group; small per-file tables are buffered up to this size.",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Processes parsing TXT files in parallel (1 = parse inline).",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Only parse new/changed TXT files and rewrite their symbol buckets in the raw dataset directory.",
+    )
+    parser.add_argument(
+        "--compact",
+        action="store_true",
+        help="Write the compact schema (date32 dates, dictionary strings, zstd); see migrate_raw_schema.",
+    )
     parser.add_argument(
         "--log-every",
         type=int,
@@ -268,10 +762,27 @@ def parse_args() -> argparse.Namespace:
 def main() -> None:
     args = parse_args()
     input_root = discover_input_root(args.input_root)
+    if args.incremental:
+        if args.output_file.name != RAW_BASE_FILE_NAME:
+            raise ValueError(
+                f"--incremental writes into a raw dataset directory; --output-file must be .../{RAW_BASE_FILE_NAME}"
+            )
+        run_incremental_ingestion(
+            input_root=input_root,
+            dataset_dir=args.output_file.parent,
+            log_every=args.log_every,
+            row_group_rows=args.row_group_rows,
+            workers=args.workers,
+            compact=args.compact,
+        )
+        return
     run_ingestion(
         input_root=input_root,
         output_file=args.output_file,
         log_every=args.log_every,
+        row_group_rows=args.row_group_rows,
+        workers=args.workers,
+        compact=args.compact,
     )
 
 
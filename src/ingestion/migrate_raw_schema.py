@@ -0,0 +1,145 @@
+from __future__ import annotations
+
+"""
+Migrate the raw price dataset to the compact storage schema.
+
+Every file (base stock_prices.parquet, Stooq buckets and year/month
+fragments) is rewritten in place, row group by row group, with:
+
+- payload_date stored as date32 instead of ISO strings
+- source_system, ingestion_run_id and symbol_raw dictionary-encoded
+- zstd compression, byte-stream-split encoding for the float columns
+
+Rows, row-group boundaries and file paths are unchanged, so the sidecars
+(manifest, key index) only need a refresh. Later appends pick the compact
+schema up from the reference file automatically.
+
+Usage:
+    python -m src.ingestion.migrate_raw_schema
+    python -m src.ingestion.migrate_raw_schema --dry-run   # sizes and plan only
+"""
+
+import argparse
+import time
+from pathlib import Path
+
+import pyarrow.parquet as pq
+
+from src.ingestion.compact_raw import _print_scan, time_full_scan
+from src.utils.atomic_io import atomic_path
+from src.utils.price_utils import list_raw_files
+from src.utils.raw_store import (
+    RAW_DATASET_DIR,
+    RowGroupBufferedWriter,
+    is_compact_schema,
+    refresh_raw_sidecars,
+)
+
+
+def dataset_size_bytes(files: list[Path]) -> int:
+    return sum(p.stat().st_size for p in files)
+
+
+def migrate_file(path: Path) -> bool:
+    """
+    Rewrite one parquet file with the compact schema. Returns False when the
+    file is already compact and was left untouched.
+    """
+    source = pq.ParquetFile(path)
+    if is_compact_schema(source.schema_arrow):
+        return False
+    with atomic_path(path) as tmp_path:
+        # Keep the existing row-group boundaries: one source group, one output group.
+        row_group_rows = max(
+            (source.metadata.row_group(i).num_rows for i in range(source.num_row_groups)), default=1
+        )
+        with RowGroupBufferedWriter(
+            tmp_path, source.schema_arrow, row_group_rows=row_group_rows, compact=True
+        ) as writer:
+            for i in range(source.num_row_groups):
+                writer.write_table(source.read_row_group(i))
+                writer.flush()
+        source.close()
+    return True
+
+
+def migrate_raw_dataset(dataset_dir: Path) -> dict[str, int]:
+    """
+    Rewrite every raw file under dataset_dir with the compact schema.
+
+    A crash mid-way leaves a mix of migrated and unmigrated files, each one
+    complete; rerunning skips the files already migrated.
+    """
+    files = list_raw_files(dataset_dir)
+    if not files:
+        raise FileNotFoundError(f"No raw parquet files found under: {dataset_dir}")
+
+    bytes_before = dataset_size_bytes(files)
+    migrated = 0
+    for i, path in enumerate(files, start=1):
+        if migrate_file(path):
+            migrated += 1
+        if i % 500 == 0 or i == len(files):
+            print(f"  {i:,}/{len(files):,} files checked, {migrated:,} migrated")
+    refresh_raw_sidecars(dataset_dir)
+    return {
+        "files": len(files),
+        "files_migrated": migrated,
+        "bytes_before": bytes_before,
+        "bytes_after": dataset_size_bytes(files),
+    }
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Migrate the raw price dataset to the compact storage schema.")
+    parser.add_argument(
+        "--raw-path",
+        type=Path,
+        default=RAW_DATASET_DIR,
+        help="Raw dataset directory (base stock_prices.parquet + fragments).",
+    )
+    parser.add_argument("--no-benchmark", action="store_true", help="Skip the before/after full-scan timing.")
+    parser.add_argument("--dry-run", action="store_true", help="Print sizes and the files to migrate only.")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    if not args.raw_path.is_dir():
+        raise NotADirectoryError(f"--raw-path must be the raw dataset directory: {args.raw_path}")
+
+    files = list_raw_files(args.raw_path)
+    pending = [p for p in files if not is_compact_schema(pq.read_schema(p))]
+    print(f"Raw dataset: {args.raw_path}")
+    print(f"  Files: {len(files):,}  To migrate: {len(pending):,}  Size: {dataset_size_bytes(files) / 1e6:,.1f} MB")
+
+    if args.dry_run or not pending:
+        if not pending:
+            print("Nothing to migrate.")
+        return
+
+    before = None if args.no_benchmark else time_full_scan(args.raw_path)
+
+    t0 = time.perf_counter()
+    stats = migrate_raw_dataset(args.raw_path)
+    elapsed = time.perf_counter() - t0
+
+    print("\nMigration completed")
+    print(f"  Files migrated: {stats['files_migrated']:,} of {stats['files']:,}")
+    print(f"  Size before:    {stats['bytes_before'] / 1e6:,.1f} MB")
+    print(f"  Size after:     {stats['bytes_after'] / 1e6:,.1f} MB")
+    if stats["bytes_after"] > 0:
+        print(f"  Ratio:          {stats['bytes_before'] / stats['bytes_after']:.2f}x smaller")
+    print(f"  Time:           {elapsed:.1f}s")
+
+    if before is not None:
+        after = time_full_scan(args.raw_path)
+        print("\nFull-scan benchmark")
+        _print_scan("before", before)
+        _print_scan("after", after)
+        if after["seconds"] > 0:
+            print(f"  speedup: {before['seconds'] / after['seconds']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,25 +5,41 @@ from pathlib import Path
 
 import pandas as pd
 import pyarrow.compute as pc
-import pyarrow.parquet as pq
 
+from src.utils.price_utils import DEFAULT_RAW_DATASET, iter_raw_row_groups, raw_row_count
+from src.utils.raw_manifest import load_manifest
 
-DEFAULT_PARQUET = Path("data/raw/stock_price_stooq/stock_prices.parquet")
+
+DEFAULT_PARQUET = DEFAULT_RAW_DATASET
 
 
 def summarize_raw_parquet(parquet_path: Path) -> tuple[int, int, str | None, str | None, list[str]]:
     if not parquet_path.exists():
         raise FileNotFoundError(f"Parquet file not found: {parquet_path}")
 
-    pf = pq.ParquetFile(parquet_path)
-    total_rows = pf.metadata.num_rows
+    manifest = load_manifest(parquet_path)
+    if manifest is not None:
+        tickers = manifest["tickers"]
+        total_rows = sum(f["num_rows"] for f in manifest["files"].values())
+        min_dates = [t["min_date"] for t in tickers.values()]
+        max_dates = [t["max_date"] for t in tickers.values()]
+        symbol_list = sorted(tickers)
+        return (
+            total_rows,
+            len(symbol_list),
+            min(min_dates) if min_dates else None,
+            max(max_dates) if max_dates else None,
+            symbol_list,
+        )
+
+    total_rows = raw_row_count(parquet_path)
 
     symbols: set[str] = set()
     min_date = None
     max_date = None
 
-    for rg in range(pf.metadata.num_row_groups):
-        table = pf.read_row_group(rg, columns=["symbol_raw", "payload_date"])
+    # Aggregates are order-independent: take row groups as they finish decoding.
+    for table in iter_raw_row_groups(parquet_path, columns=["symbol_raw", "payload_date"], ordered=False):
 
         unique_symbols = pc.unique(table["symbol_raw"]).to_pylist()
         for s in unique_symbols:
@@ -50,7 +66,7 @@ def parse_args() -> argparse.Namespace:
         "--parquet",
         type=Path,
         default=DEFAULT_PARQUET,
-        help="Path to raw parquet file.",
+        help="Path to raw parquet file or raw dataset directory.",
     )
     parser.add_argument(
         "--summary-csv",
@@ -5,14 +5,13 @@ Build Finlify ranked asset table from latest factor snapshot.
 """
 
 import argparse
-import os
 from pathlib import Path
 
 import pandas as pd
-import psycopg2
-from psycopg2.extras import execute_values
 from dotenv import load_dotenv
 
+from src.db.postgres import connection, database_url, format_upsert_stats, upsert_rows
+
 load_dotenv()
 
 
@@ -24,6 +23,12 @@ ALLOWED_DECISIONS = {"BUY", "HOLD", "WATCH", "AVOID"}
 ALLOWED_REGIMES = {"TRENDING", "MIXED", "RISK_OFF"}
 ALLOWED_RISK_LEVELS = {"LOW", "MEDIUM", "HIGH"}
 ALLOWED_HORIZON_DAYS = {30, 60, 90}
+RANKINGS_KEY = ("source_ticker", "snapshot_date")
+RANKINGS_COLUMNS = (
+    "source_ticker", "ticker", "asset_type", "sector", "snapshot_date", "composite_score",
+    "trend_score", "momentum_score", "risk_penalty", "decision", "rank_overall",
+    "confidence", "regime", "risk_level", "horizon_days",
+)
 
 
 def parse_args() -> argparse.Namespace:
@@ -367,62 +372,21 @@ def build_rankings(snapshot_df: pd.DataFrame) -> pd.DataFrame:
 
 
 def _upsert_rankings_to_supabase(ranked_df: pd.DataFrame) -> None:
-    db_url = os.environ.get("SUPABASE_DB_URL")
-    if not db_url:
+    if database_url() is None:
         print("WARNING: SUPABASE_DB_URL not set — skipping Supabase upsert")
         return
 
-    out = pd.DataFrame(
-        {
-            "source_ticker": ranked_df["source_ticker"],
-            "ticker": ranked_df["ticker"],
-            "asset_type": ranked_df["asset_type"],
-            "sector": ranked_df["sector"],
-            "snapshot_date": ranked_df["date"],
-            "composite_score": ranked_df["composite_score"],
-            "trend_score": ranked_df["trend_score"],
-            "momentum_score": ranked_df["momentum_score"],
-            "risk_penalty": ranked_df["risk_penalty"],
-            "decision": ranked_df["decision"],
-            "rank_overall": ranked_df["rank_overall"],
-            "confidence": ranked_df["confidence"],
-            "regime": ranked_df["regime"],
-            "risk_level": ranked_df["risk_level"],
-            "horizon_days": ranked_df["horizon_days"],
-        }
-    )
-
-    sql = """
-        INSERT INTO rankings
-            (source_ticker, ticker, asset_type, sector, snapshot_date, composite_score,
-             trend_score, momentum_score, risk_penalty, decision, rank_overall,
-             confidence, regime, risk_level, horizon_days)
-        VALUES %s
-        ON CONFLICT (source_ticker, snapshot_date) DO UPDATE SET
-            ticker = EXCLUDED.ticker,
-            asset_type = EXCLUDED.asset_type,
-            sector = EXCLUDED.sector,
-            composite_score = EXCLUDED.composite_score,
-            trend_score = EXCLUDED.trend_score,
-            momentum_score = EXCLUDED.momentum_score,
-            risk_penalty = EXCLUDED.risk_penalty,
-            decision = EXCLUDED.decision,
-            rank_overall = EXCLUDED.rank_overall,
-            confidence = EXCLUDED.confidence,
-            regime = EXCLUDED.regime,
-            risk_level = EXCLUDED.risk_level,
-            horizon_days = EXCLUDED.horizon_days
-    """
-    conn = psycopg2.connect(db_url)
-    try:
-        rows = list(out.itertuples(index=False, name=None))
-        with conn.cursor() as cur:
-            execute_values(cur, sql, rows, page_size=1000)
-            upserted = cur.rowcount
-        conn.commit()
-        print(f"Supabase rankings: {upserted} rows upserted")
-    finally:
-        conn.close()
+    out = ranked_df.rename(columns={"date": "snapshot_date"})
+    with connection() as conn:
+        stats = upsert_rows(
+            conn,
+            "rankings",
+            RANKINGS_COLUMNS,
+            out,
+            conflict=RANKINGS_KEY,
+            update=[c for c in RANKINGS_COLUMNS if c not in RANKINGS_KEY],
+        )
+    print(f"Supabase {format_upsert_stats(stats)}")
 
 
 def main() -> None:
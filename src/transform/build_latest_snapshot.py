@@ -13,7 +13,7 @@ from pathlib import Path
 
 import pandas as pd
 
-from src.utils.price_utils import DEFAULT_RAW_PARQUET, iter_normalized_price_chunks
+from src.utils.price_utils import DEFAULT_RAW_DATASET, iter_normalized_price_chunks
 
 
 DEFAULT_TICKER_MASTER = Path("data/staging/stock_price_stooq/ticker_master.parquet")
@@ -25,8 +25,8 @@ def parse_args() -> argparse.Namespace:
     parser.add_argument(
         "--input-parquet",
         type=Path,
-        default=DEFAULT_RAW_PARQUET,
-        help="Path to raw parquet file.",
+        default=DEFAULT_RAW_DATASET,
+        help="Path to raw parquet file or raw dataset directory.",
     )
     parser.add_argument(
         "--ticker-master",
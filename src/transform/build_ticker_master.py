@@ -14,7 +14,13 @@ from pathlib import Path
 import pandas as pd
 import pyarrow.parquet as pq
 
-from src.utils.price_utils import DEFAULT_RAW_PARQUET, normalize_price_schema
+from src.utils.price_utils import (
+    DEFAULT_RAW_DATASET,
+    iter_normalized_price_chunks,
+    list_raw_files,
+    normalize_ticker,
+)
+from src.utils.raw_manifest import load_manifest
 
 
 DEFAULT_OUTPUT_PARQUET = Path("data/staging/stock_price_stooq/ticker_master.parquet")
@@ -29,11 +35,16 @@ def validate_input_columns(df: pd.DataFrame) -> None:
 
 def inspect_parquet_schema(input_parquet: Path) -> tuple[int, int, list[tuple[str, str]]]:
     """
-    Return basic parquet metadata for reporting.
+    Return basic parquet metadata for reporting (summed across dataset files).
     """
-    pf = pq.ParquetFile(input_parquet)
-    rows = pf.metadata.num_rows
-    row_groups = pf.metadata.num_row_groups
+    files = list_raw_files(input_parquet)
+    rows = 0
+    row_groups = 0
+    for path in files:
+        meta = pq.ParquetFile(path).metadata
+        rows += meta.num_rows
+        row_groups += meta.num_row_groups
+    pf = pq.ParquetFile(files[0])
     columns = []
     for i in range(pf.metadata.num_columns):
         col = pf.metadata.schema.column(i)
@@ -87,14 +98,10 @@ def build_ticker_master_from_parquet(input_parquet: Path) -> pd.DataFrame:
     """
     Build ticker-level aggregates by scanning parquet row groups incrementally.
     """
-    pf = pq.ParquetFile(input_parquet)
     stats: dict[tuple[str, str], dict] = {}
     dataset_max_date: pd.Timestamp | None = None
 
-    for rg in range(pf.metadata.num_row_groups):
-        table = pf.read_row_group(rg)
-        raw_chunk = table.to_pandas()
-        normalized = normalize_price_schema(raw_chunk)
+    for normalized in iter_normalized_price_chunks(input_parquet):
         validate_input_columns(normalized)
 
         chunk = normalized.sort_values(["source_ticker", "date"]).copy()
@@ -129,6 +136,43 @@ def build_ticker_master_from_parquet(input_parquet: Path) -> pd.DataFrame:
     if dataset_max_date is None:
         raise ValueError("Dataset appears empty after normalization.")
 
+    return _finalize_ticker_master(stats, dataset_max_date)
+
+
+def build_ticker_master_from_manifest(manifest: dict) -> pd.DataFrame:
+    """
+    Build ticker-level aggregates from the raw manifest sidecar, without
+    reading any price data.
+    """
+    stats: dict[tuple[str, str], dict] = {}
+    dataset_max_date: pd.Timestamp | None = None
+
+    for symbol, entry in manifest["tickers"].items():
+        source_ticker = str(symbol).strip().upper()
+        if not source_ticker:
+            continue
+        max_date = pd.Timestamp(entry["max_date"])
+        if dataset_max_date is None or max_date > dataset_max_date:
+            dataset_max_date = max_date
+        _update_stats_row(
+            stats=stats,
+            key=(source_ticker, normalize_ticker(source_ticker)),
+            min_date=pd.Timestamp(entry["min_date"]),
+            max_date=max_date,
+            row_count=int(entry["row_count"]),
+            non_null_close_count=int(entry["non_null_close_count"]),
+            non_null_volume_count=int(entry["non_null_volume_count"]),
+            first_close=entry["first_close"],
+            last_close=entry["last_close"],
+        )
+
+    if dataset_max_date is None:
+        raise ValueError("Manifest lists no tickers.")
+
+    return _finalize_ticker_master(stats, dataset_max_date)
+
+
+def _finalize_ticker_master(stats: dict[tuple[str, str], dict], dataset_max_date: pd.Timestamp) -> pd.DataFrame:
     out = pd.DataFrame(list(stats.values()))
     out["has_volume"] = out["non_null_volume_count"] > 0
     out["is_active"] = (dataset_max_date - out["max_date"]).dt.days <= 10
@@ -157,8 +201,8 @@ def parse_args() -> argparse.Namespace:
     parser.add_argument(
         "--input-parquet",
         type=Path,
-        default=DEFAULT_RAW_PARQUET,
-        help="Path to raw parquet file.",
+        default=DEFAULT_RAW_DATASET,
+        help="Path to raw parquet file or raw dataset directory.",
     )
     parser.add_argument(
         "--output-parquet",
@@ -188,7 +232,12 @@ def main() -> None:
     for name, dtype in columns:
         print(f"  - {name}: {dtype}")
 
-    ticker_master = build_ticker_master_from_parquet(args.input_parquet)
+    manifest = load_manifest(args.input_parquet)
+    if manifest is not None:
+        print("Using raw manifest sidecar (no price scan needed).")
+        ticker_master = build_ticker_master_from_manifest(manifest)
+    else:
+        ticker_master = build_ticker_master_from_parquet(args.input_parquet)
 
     args.output_parquet.parent.mkdir(parents=True, exist_ok=True)
     ticker_master.to_parquet(args.output_parquet, index=False)
@@ -0,0 +1,251 @@
+from __future__ import annotations
+
+"""
+Build the universe "hot" price store from the full-market raw dataset.
+
+The raw layer holds the whole Stooq/Polygon market (~27M rows), while the
+transform, feature and ranking steps only need the tickers listed in
+input/finlify_core_universe.csv. This step materializes a compact,
+deduplicated, typed copy of just those tickers:
+
+source_ticker (dictionary), ticker (dictionary), date (date32),
+open, high, low, close, volume (float64)
+
+sorted by source_ticker, date. The store can be passed as --input-parquet to
+build_ticker_master, build_latest_snapshot and build_price_features.
+
+The store's parquet metadata records the universe and the (size, mtime) of
+every raw file it was built from. A run only reads what changed: nothing when
+the raw dataset is untouched, just the new fragments when ingest/backfill
+appended some, and the full dataset when a recorded file was rewritten or
+removed (e.g. by compact_raw) or the universe changed. Use --rebuild to force
+a full rebuild.
+"""
+
+import argparse
+import hashlib
+import json
+from pathlib import Path
+from typing import Any, Iterable
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from src.utils.price_utils import DEFAULT_RAW_DATASET, iter_normalized_price_chunks, list_raw_files
+from src.utils.raw_store import write_parquet_atomic
+
+
+DEFAULT_UNIVERSE_CSV = Path("input/finlify_core_universe.csv")
+DEFAULT_STORE_PARQUET = Path("data/staging/stock_price_stooq/universe_prices.parquet")
+
+STORE_SCHEMA = pa.schema(
+    [
+        pa.field("source_ticker", pa.dictionary(pa.int32(), pa.string())),
+        pa.field("ticker", pa.dictionary(pa.int32(), pa.string())),
+        pa.field("date", pa.date32()),
+        pa.field("open", pa.float64()),
+        pa.field("high", pa.float64()),
+        pa.field("low", pa.float64()),
+        pa.field("close", pa.float64()),
+        pa.field("volume", pa.float64()),
+    ]
+)
+PRICE_COLUMNS = ["open", "high", "low", "close", "volume"]
+# Schema metadata key holding the universe digest and raw file fingerprints.
+SOURCES_METADATA_KEY = b"finlify.store_sources"
+
+
+def load_universe_source_tickers(universe_csv: Path) -> set[str]:
+    """
+    Return universe symbols in raw source_ticker form (e.g. AAPL.US).
+    """
+    if not universe_csv.exists():
+        raise FileNotFoundError(f"Universe CSV not found: {universe_csv}")
+    universe = pd.read_csv(universe_csv)
+    if "symbol" not in universe.columns:
+        raise ValueError("Universe CSV missing column: symbol")
+    symbols = universe["symbol"].dropna().astype(str).str.strip().str.upper()
+    return {f"{s}.US" for s in symbols if s}
+
+
+def to_store_table(prices: pd.DataFrame) -> pa.Table:
+    """
+    Convert normalized prices to the typed store layout, sorted and deduplicated
+    on (source_ticker, date) keeping the last occurrence.
+    """
+    work = prices[["source_ticker", "ticker", "date", *PRICE_COLUMNS]].copy()
+    work["date"] = pd.to_datetime(work["date"], errors="coerce").dt.normalize()
+    work = work.dropna(subset=["source_ticker", "date"])
+    work = (
+        work.drop_duplicates(subset=["source_ticker", "date"], keep="last")
+        .sort_values(["source_ticker", "date"], kind="mergesort")
+        .reset_index(drop=True)
+    )
+
+    arrays = [
+        pa.array(work["source_ticker"].astype(str), pa.string()).dictionary_encode(),
+        pa.array(work["ticker"].astype(str), pa.string()).dictionary_encode(),
+        pa.array(work["date"].dt.date, pa.date32()),
+    ]
+    for col in PRICE_COLUMNS:
+        arrays.append(pa.array(pd.to_numeric(work[col], errors="coerce").astype("float64"), pa.float64()))
+    return pa.Table.from_arrays(arrays, schema=STORE_SCHEMA)
+
+
+def _universe_rows(paths: Iterable[Path], symbols: set[str]) -> list[pd.DataFrame]:
+    parts = [
+        chunk[chunk["source_ticker"].isin(symbols)]
+        for path in paths
+        for chunk in iter_normalized_price_chunks(path, symbols=symbols)
+    ]
+    return [p for p in parts if not p.empty]
+
+
+def build_universe_store(raw_path: Path, source_tickers: Iterable[str]) -> pa.Table:
+    """
+    Read only the universe's rows from the raw dataset and build the store table.
+    """
+    symbols = set(source_tickers)
+    if not symbols:
+        raise ValueError("Universe is empty.")
+
+    parts = _universe_rows([raw_path], symbols)
+    if not parts:
+        raise ValueError("No universe price rows found in raw dataset.")
+    return to_store_table(pd.concat(parts, ignore_index=True))
+
+
+def universe_digest(source_tickers: Iterable[str]) -> str:
+    return hashlib.sha1("\n".join(sorted(source_tickers)).encode()).hexdigest()
+
+
+def raw_file_fingerprints(raw_path: Path) -> dict[str, list[int]]:
+    """
+    {relative path: [size, mtime_ns]} for every file of the raw dataset.
+    """
+    root = raw_path.parent if raw_path.is_file() else raw_path
+    fingerprints = {}
+    for path in list_raw_files(raw_path):
+        st = path.stat()
+        fingerprints[path.relative_to(root).as_posix()] = [st.st_size, st.st_mtime_ns]
+    return fingerprints
+
+
+def read_store_sources(store_path: Path) -> dict[str, Any] | None:
+    """
+    The sources recorded in an existing store, or None when the store is
+    missing or predates source tracking.
+    """
+    if not store_path.exists():
+        return None
+    metadata = pq.read_schema(store_path).metadata or {}
+    if SOURCES_METADATA_KEY not in metadata:
+        return None
+    return json.loads(metadata[SOURCES_METADATA_KEY])
+
+
+def _write_store(store_path: Path, table: pa.Table, digest: str, files: dict[str, list[int]]) -> None:
+    sources = json.dumps({"universe": digest, "files": files}, sort_keys=True)
+    metadata = {**(table.schema.metadata or {}), SOURCES_METADATA_KEY: sources.encode()}
+    write_parquet_atomic(store_path, table.replace_schema_metadata(metadata))
+
+
+def refresh_universe_store(
+    store_path: Path,
+    raw_path: Path,
+    source_tickers: Iterable[str],
+    rebuild: bool = False,
+) -> dict[str, Any]:
+    """
+    Bring the store in line with the raw dataset, reading as little as possible.
+
+    Returns stats: mode ("unchanged", "merged" or "rebuilt"), files_read and
+    rows (universe rows read from raw).
+    """
+    symbols = set(source_tickers)
+    if not symbols:
+        raise ValueError("Universe is empty.")
+    digest = universe_digest(symbols)
+    current = raw_file_fingerprints(raw_path)
+    recorded = None if rebuild else read_store_sources(store_path)
+
+    reusable = (
+        recorded is not None
+        and recorded["universe"] == digest
+        and all(current.get(rel) == fp for rel, fp in recorded["files"].items())
+    )
+    if not reusable:
+        store = build_universe_store(raw_path, symbols)
+        _write_store(store_path, store, digest, current)
+        return {"mode": "rebuilt", "files_read": len(current), "rows": store.num_rows}
+
+    new_files = sorted(rel for rel in current if rel not in recorded["files"])
+    if not new_files:
+        return {"mode": "unchanged", "files_read": 0, "rows": 0}
+
+    # Raw files are append-only, so rows from the new fragments are the only
+    # thing the store can be missing; later rows win on (source_ticker, date).
+    root = raw_path.parent if raw_path.is_file() else raw_path
+    parts = _universe_rows([root / rel for rel in new_files], symbols)
+    rows = sum(len(p) for p in parts)
+    if parts:
+        existing = pq.read_table(store_path).to_pandas()
+        for col in ("source_ticker", "ticker"):
+            existing[col] = existing[col].astype(str)
+        store = to_store_table(pd.concat([existing, *parts], ignore_index=True))
+    else:
+        store = pq.read_table(store_path)
+    _write_store(store_path, store, digest, current)
+    return {"mode": "merged", "files_read": len(new_files), "rows": rows}
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Build the universe-only typed price store from raw prices.")
+    parser.add_argument(
+        "--input-parquet",
+        type=Path,
+        default=DEFAULT_RAW_DATASET,
+        help="Path to raw parquet file or raw dataset directory.",
+    )
+    parser.add_argument(
+        "--universe-csv",
+        type=Path,
+        default=DEFAULT_UNIVERSE_CSV,
+        help="Finlify core universe CSV path.",
+    )
+    parser.add_argument(
+        "--output-parquet",
+        type=Path,
+        default=DEFAULT_STORE_PARQUET,
+        help="Destination universe price store path.",
+    )
+    parser.add_argument(
+        "--rebuild",
+        action="store_true",
+        help="Rebuild from the full raw dataset even if the store is up to date.",
+    )
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    source_tickers = load_universe_source_tickers(args.universe_csv)
+    stats = refresh_universe_store(args.output_parquet, args.input_parquet, source_tickers, rebuild=args.rebuild)
+    store = pq.read_table(args.output_parquet, columns=["source_ticker"])
+
+    found = set(store["source_ticker"].unique().to_pylist())
+    missing = sorted(source_tickers - found)
+    if stats["mode"] == "unchanged":
+        print(f"Universe price store is up to date: {args.output_parquet}")
+    else:
+        print(f"Universe price store {stats['mode']}: {args.output_parquet}")
+        print(f"Raw files read: {stats['files_read']:,} ({stats['rows']:,} universe rows)")
+    print(f"Rows: {store.num_rows:,}")
+    print(f"Tickers: {len(found):,} / {len(source_tickers):,}")
+    if missing:
+        print(f"Universe tickers without raw prices ({len(missing)}): {', '.join(missing[:20])}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+"""
+On-disk, content-addressed cache for raw API response bodies.
+
+Entries are keyed by the SHA-256 of the endpoint URL plus its sorted
+parameters (credentials excluded) and stored gzip-compressed under
+<root>/<key[:2]>/<key>.json.gz.
+
+Freshness follows the date a response describes ("as_of"):
+  - a response written after its as_of date has passed is immutable
+  - otherwise (today's or future data) it expires after today_ttl_seconds
+"""
+
+import gzip
+import hashlib
+import json
+import time
+import zlib
+from datetime import date
+from pathlib import Path
+from typing import Callable
+
+from src.utils.atomic_io import write_bytes_atomic
+
+DEFAULT_TODAY_TTL_SECONDS = 15 * 60
+# Query parameters that never change the response body.
+IGNORED_PARAMS = frozenset({"apiKey", "apikey", "api_key"})
+
+
+class ResponseCache:
+    def __init__(
+        self,
+        root: Path,
+        today_ttl_seconds: float = DEFAULT_TODAY_TTL_SECONDS,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.root = Path(root)
+        self.today_ttl_seconds = today_ttl_seconds
+        self._clock = clock
+
+    @staticmethod
+    def key(url: str, params: dict | None = None) -> str:
+        kept = {k: str(v) for k, v in (params or {}).items() if k not in IGNORED_PARAMS}
+        canonical = json.dumps([url, sorted(kept.items())], separators=(",", ":"))
+        return hashlib.sha256(canonical.encode()).hexdigest()
+
+    def path(self, url: str, params: dict | None = None) -> Path:
+        key = self.key(url, params)
+        return self.root / key[:2] / f"{key}.json.gz"
+
+    def _is_fresh(self, written_at: float, as_of: date) -> bool:
+        if as_of < date.fromtimestamp(written_at):
+            return True
+        return self._clock() - written_at < self.today_ttl_seconds
+
+    def get(self, url: str, params: dict | None, as_of: date) -> bytes | None:
+        """Return the cached body, or None when missing, expired or unreadable."""
+        path = self.path(url, params)
+        try:
+            if not self._is_fresh(path.stat().st_mtime, as_of):
+                return None
+            return gzip.decompress(path.read_bytes())
+        except (OSError, EOFError, zlib.error):
+            return None
+
+    def put(self, url: str, params: dict | None, body: bytes) -> Path:
+        path = self.path(url, params)
+        write_bytes_atomic(path, gzip.compress(body, compresslevel=6))
+        return path
@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+"""
+Crash-safe file replacement shared by every writer of the raw dataset,
+its sidecars, checkpoints and caches.
+
+The new content goes to a hidden sibling temp file (dot prefix, so dataset
+readers skip it), which is fsynced, renamed over the target with os.replace
+and followed by an fsync of the directory so the rename itself is durable.
+Readers only ever see the old file or the complete new one, and a crash
+leaves at most a stray dot-file behind. Nothing is copied: each write
+costs one pass over the new content.
+"""
+
+import json
+import os
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+from typing import IO, Any, Iterator
+
+
+def fsync_file(path: Path | str) -> None:
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def fsync_dir(path: Path | str) -> None:
+    """Persist renames in directory path; a no-op where directories cannot be opened (Windows)."""
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def temp_sibling(path: Path) -> Path:
+    """Create an empty hidden temp file next to path, e.g. .abc123.parquet.tmp."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=".", suffix=f"{path.suffix}.tmp")
+    os.close(tmp_fd)
+    return Path(tmp_path)
+
+
+def commit_temp(tmp_path: Path, path: Path) -> None:
+    """fsync a finished temp file, rename it over path and persist the rename."""
+    fsync_file(tmp_path)
+    os.replace(tmp_path, path)
+    fsync_dir(path.parent)
+
+
+@contextmanager
+def atomic_path(path: Path) -> Iterator[Path]:
+    """
+    Yield a temp path for writers that open files themselves (ParquetWriter,
+    np.save). The temp file replaces path when the block exits cleanly and is
+    removed otherwise.
+    """
+    tmp_path = temp_sibling(path)
+    try:
+        yield tmp_path
+        commit_temp(tmp_path, path)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+
+
+@contextmanager
+def atomic_open(path: Path, mode: str = "wb", encoding: str | None = None) -> Iterator[IO[Any]]:
+    """open() counterpart of atomic_path."""
+    with atomic_path(path) as tmp_path:
+        with open(tmp_path, mode, encoding=encoding) as f:
+            yield f
+
+
+def write_bytes_atomic(path: Path, data: bytes) -> None:
+    with atomic_open(path, "wb") as f:
+        f.write(data)
+
+
+def write_json_atomic(path: Path, obj: Any, **dump_kwargs: Any) -> None:
+    with atomic_open(path, "w", encoding="utf-8") as f:
+        json.dump(obj, f, **dump_kwargs)
@@ -0,0 +1,105 @@
+from __future__ import annotations
+
+"""
+Thread-pool scanning of parquet row groups with a bounded prefetch window.
+
+Parquet decoding and Arrow compute release the GIL, so decoding row groups
+on a small thread pool uses every core. At most `prefetch` row groups are
+in flight or waiting to be consumed, which caps memory at roughly
+prefetch x row-group size regardless of dataset size.
+
+Results can be delivered in task order (ordered=True, for callers whose
+output depends on read order) or as soon as they are ready. CPU-bound
+Python work (e.g. pandas text parsing) can use a process pool instead.
+"""
+
+import os
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, TypeVar
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+DEFAULT_SCAN_WORKERS = max(1, min(8, os.cpu_count() or 1))
+
+
+def bounded_map(
+    fn: Callable[[T], R],
+    items: Iterable[T],
+    workers: int | None = None,
+    prefetch: int | None = None,
+    ordered: bool = True,
+    processes: bool = False,
+) -> Iterator[R]:
+    """
+    Lazily apply fn to items on a thread pool, keeping at most prefetch results pending.
+
+    processes=True uses a process pool instead (fn, items and results must
+    be picklable). workers=1 runs inline without a pool. Exceptions raised by
+    fn propagate to the consumer; leaving the loop early cancels work not yet
+    started.
+    """
+    workers = workers or DEFAULT_SCAN_WORKERS
+    prefetch = max(prefetch or 2 * workers, 1)
+    if workers == 1:
+        for item in items:
+            yield fn(item)
+        return
+
+    source = iter(items)
+    pool: Executor
+    if processes:
+        pool = ProcessPoolExecutor(max_workers=workers)
+    else:
+        pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="row-group-scan")
+    pending: deque[Future[R]] = deque()
+
+    def submit_next() -> None:
+        for item in source:
+            pending.append(pool.submit(fn, item))
+            return
+
+    try:
+        for _ in range(prefetch):
+            submit_next()
+        if ordered:
+            while pending:
+                result = pending.popleft().result()
+                submit_next()
+                yield result
+        else:
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    pending.remove(fut)
+                    submit_next()
+                for fut in done:
+                    yield fut.result()
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def plan_row_groups(files: Iterable[Path]) -> list[tuple[Path, pq.FileMetaData, int]]:
+    """
+    List (path, file metadata, row group index) for every row group of files.
+
+    Footers are parsed once here and reused by read_row_group.
+    """
+    tasks: list[tuple[Path, pq.FileMetaData, int]] = []
+    for path in files:
+        meta = pq.ParquetFile(path).metadata
+        tasks.extend((path, meta, rg) for rg in range(meta.num_row_groups))
+    return tasks
+
+
+def read_row_group(path: Path, metadata: pq.FileMetaData, rg: int, columns: list[str] | None = None) -> pa.Table:
+    """
+    Read one row group with its own file handle, so calls are safe across threads.
+    """
+    return pq.ParquetFile(path, metadata=metadata).read_row_group(rg, columns=columns)
@@ -2,16 +2,42 @@ from __future__ import annotations
 
 """
 Utilities for normalizing raw price data into a stable project schema.
+
+The raw layer is read as a dataset: either a single parquet file, or the
+data/raw/stock_price_stooq directory holding the base stock_prices.parquet plus
+hive-style year=YYYY/month=MM fragments appended by the daily ingest jobs.
 """
 
+from bisect import bisect_left
+from datetime import date, datetime
 from pathlib import Path
-from typing import Iterator
+from typing import Callable, Iterable, Iterator, TypeVar
 
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
 import pyarrow.parquet as pq
 
+from src.utils.parallel_scan import bounded_map, read_row_group
+
+
+T = TypeVar("T")
+
+DEFAULT_RAW_DATASET = Path("data/raw/stock_price_stooq")
+DEFAULT_RAW_PARQUET = DEFAULT_RAW_DATASET / "stock_prices.parquet"
 
-DEFAULT_RAW_PARQUET = Path("data/raw/stock_price_stooq/stock_prices.parquet")
+# Accepted source column names per normalized column, in priority order.
+COLUMN_CANDIDATES: dict[str, list[str]] = {
+    "source_ticker": ["source_ticker", "symbol_raw", "ticker", "symbol"],
+    "date": ["date", "payload_date", "datetime", "trade_date"],
+    "open": ["open", "open_raw", "o"],
+    "high": ["high", "high_raw", "h"],
+    "low": ["low", "low_raw", "l"],
+    "close": ["close", "close_raw", "c"],
+    "volume": ["volume", "volume_raw", "vol", "v"],
+}
+REQUIRED_COLUMNS = ("source_ticker", "date", "close")
 
 
 def normalize_ticker(source_ticker: str) -> str:
@@ -30,8 +56,9 @@ def normalize_ticker(source_ticker: str) -> str:
     return token
 
 
-def _choose_column(df: pd.DataFrame, candidates: list[str], required: bool = True) -> str | None:
-    existing = {str(c).lower(): str(c) for c in df.columns}
+def _choose_column(df: pd.DataFrame | pa.Schema, candidates: list[str], required: bool = True) -> str | None:
+    names = df.names if isinstance(df, pa.Schema) else df.columns
+    existing = {str(c).lower(): str(c) for c in names}
     for candidate in candidates:
         if candidate.lower() in existing:
             return existing[candidate.lower()]
@@ -40,6 +67,13 @@ def _choose_column(df: pd.DataFrame, candidates: list[str], required: bool = Tru
     return None
 
 
+def resolve_column(schema: pa.Schema, name: str, required: bool = True) -> str | None:
+    """
+    Return the physical column in schema that feeds normalized column name.
+    """
+    return _choose_column(schema, COLUMN_CANDIDATES[name], required=required)
+
+
 def normalize_price_schema(raw_df: pd.DataFrame) -> pd.DataFrame:
     """
     Normalize raw price dataframe to a cleaned schema:
@@ -48,13 +82,13 @@ def normalize_price_schema(raw_df: pd.DataFrame) -> pd.DataFrame:
     if raw_df.empty:
         raise ValueError("Input dataframe is empty.")
 
-    source_col = _choose_column(raw_df, ["source_ticker", "symbol_raw", "ticker", "symbol"])
-    date_col = _choose_column(raw_df, ["date", "payload_date", "datetime", "trade_date"])
-    open_col = _choose_column(raw_df, ["open", "open_raw", "o"], required=False)
-    high_col = _choose_column(raw_df, ["high", "high_raw", "h"], required=False)
-    low_col = _choose_column(raw_df, ["low", "low_raw", "l"], required=False)
-    close_col = _choose_column(raw_df, ["close", "close_raw", "c"])
-    volume_col = _choose_column(raw_df, ["volume", "volume_raw", "vol", "v"], required=False)
+    source_col = _choose_column(raw_df, COLUMN_CANDIDATES["source_ticker"])
+    date_col = _choose_column(raw_df, COLUMN_CANDIDATES["date"])
+    open_col = _choose_column(raw_df, COLUMN_CANDIDATES["open"], required=False)
+    high_col = _choose_column(raw_df, COLUMN_CANDIDATES["high"], required=False)
+    low_col = _choose_column(raw_df, COLUMN_CANDIDATES["low"], required=False)
+    close_col = _choose_column(raw_df, COLUMN_CANDIDATES["close"])
+    volume_col = _choose_column(raw_df, COLUMN_CANDIDATES["volume"], required=False)
 
     out = pd.DataFrame()
     out["source_ticker"] = raw_df[source_col].astype("string").str.strip().str.upper()
@@ -77,22 +111,445 @@ def normalize_price_schema(raw_df: pd.DataFrame) -> pd.DataFrame:
     return out
 
 
-def iter_normalized_price_chunks(parquet_path: Path) -> Iterator[pd.DataFrame]:
+NORMALIZED_COLUMNS = ("source_ticker", "ticker", "date", "open", "high", "low", "close", "volume")
+_TICKER_SUFFIX_PATTERN = r"\.US$"
+
+
+def _normalize_symbol_chunk(arr: pa.Array) -> tuple[pa.Array, pa.Array]:
     """
-    Yield normalized price data one parquet row-group at a time.
+    Strip/upper-case one symbol chunk and derive tickers, on dictionary values only.
+
+    Returns (source_ticker, ticker) dictionary arrays sharing the input indices,
+    so the per-row cost is independent of string length and no strings are copied.
     """
-    if not parquet_path.exists():
-        raise FileNotFoundError(f"Parquet file not found: {parquet_path}")
+    if not pa.types.is_dictionary(arr.type):
+        encoded = pc.dictionary_encode(arr)
+    elif arr.type.index_type != pa.int32():
+        encoded = pc.dictionary_encode(arr.cast(pa.string()))
+    else:
+        encoded = arr
+    values = pc.utf8_upper(pc.utf8_trim_whitespace(encoded.dictionary.cast(pa.string())))
+    tickers = pc.replace_substring_regex(values, pattern=_TICKER_SUFFIX_PATTERN, replacement="")
+
+    source = pa.DictionaryArray.from_arrays(encoded.indices, values)
+    ticker = pa.DictionaryArray.from_arrays(encoded.indices, tickers)
+    # Case/whitespace variants can collapse onto one value; pandas needs
+    # unique categories, so re-encode in that (rare) case.
+    if len(pc.unique(values)) != len(values):
+        source = pc.dictionary_encode(source.cast(pa.string()))
+    if len(pc.unique(tickers)) != len(tickers):
+        ticker = pc.dictionary_encode(ticker.cast(pa.string()))
+    return source, ticker
+
 
-    pf = pq.ParquetFile(parquet_path)
-    for rg in range(pf.metadata.num_row_groups):
-        table = pf.read_row_group(rg)
-        raw_chunk = table.to_pandas()
+def _to_timestamp(col: pa.ChunkedArray) -> pa.ChunkedArray:
+    if pa.types.is_timestamp(col.type):
+        return col
+    if pa.types.is_string(col.type) or pa.types.is_large_string(col.type):
         try:
-            normalized = normalize_price_schema(raw_chunk)
-        except ValueError:
-            # Skip empty/invalid chunks after normalization.
-            continue
-        if normalized.empty:
+            return pc.cast(col, pa.timestamp("ns"))
+        except pa.ArrowInvalid:
+            # Same as pd.to_datetime(errors="coerce"): unparseable -> null.
+            return pc.strptime(col, format="%Y-%m-%d", unit="ns", error_is_null=True)
+    return pc.cast(col, pa.timestamp("ns"))
+
+
+def _to_numeric(col: pa.ChunkedArray) -> pa.ChunkedArray:
+    if pa.types.is_integer(col.type) or pa.types.is_floating(col.type):
+        return col
+    try:
+        return pc.cast(col, pa.float64())
+    except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+        values = pd.to_numeric(col.to_pandas(), errors="coerce").astype("float64")
+        return pa.chunked_array([pa.array(values, pa.float64())])
+
+
+def normalize_price_table(raw: pa.Table) -> pa.Table:
+    """
+    Arrow-compute equivalent of normalize_price_schema.
+
+    Returns source_ticker and ticker as dictionary columns (string work is
+    done once per distinct symbol), date as timestamp[ns] and numeric OHLCV.
+    Missing optional OHLCV columns become all-null float64.
+    """
+    if raw.num_rows == 0:
+        raise ValueError("Input table is empty.")
+
+    schema = raw.schema
+    symbol_col = resolve_column(schema, "source_ticker")
+    date_col = resolve_column(schema, "date")
+
+    sources: list[pa.Array] = []
+    tickers: list[pa.Array] = []
+    for chunk in raw[symbol_col].chunks:
+        source, ticker = _normalize_symbol_chunk(chunk)
+        sources.append(source)
+        tickers.append(ticker)
+
+    columns: dict[str, pa.ChunkedArray] = {
+        "source_ticker": pa.chunked_array(sources, type=pa.dictionary(pa.int32(), pa.string())),
+        "ticker": pa.chunked_array(tickers, type=pa.dictionary(pa.int32(), pa.string())),
+        "date": _to_timestamp(raw[date_col]),
+    }
+    for name in NORMALIZED_COLUMNS[3:]:
+        col = resolve_column(schema, name, required=name in REQUIRED_COLUMNS)
+        columns[name] = _to_numeric(raw[col]) if col else pa.chunked_array([pa.nulls(raw.num_rows, pa.float64())])
+
+    out = pa.table(columns)
+    valid = pc.and_(
+        pc.and_(pc.is_valid(out["source_ticker"]), pc.is_valid(out["ticker"])), pc.is_valid(out["date"])
+    )
+    out = out.filter(valid)
+    if out.num_rows == 0:
+        raise ValueError("No valid rows after schema normalization.")
+    return out
+
+
+def normalized_table_to_pandas(table: pa.Table) -> pd.DataFrame:
+    """
+    Convert a normalized Arrow table to the pandas layout of normalize_price_schema.
+
+    Numeric and date columns convert without copying string data; symbol
+    columns come back as "string" dtype (built from the dictionary, not per
+    row) so downstream sorting and concatenation behave as before.
+    """
+    df = table.to_pandas()
+    for col in ("source_ticker", "ticker"):
+        if col in df.columns:
+            df[col] = df[col].astype("string")
+    return df
+
+
+def _is_hidden(path: Path, root: Path) -> bool:
+    # Same convention as pyarrow dataset discovery: "_" / "." entries are
+    # sidecars or in-flight temp files, never data.
+    return any(part.startswith(("_", ".")) for part in path.relative_to(root).parts)
+
+
+def list_raw_files(raw_path: Path) -> list[Path]:
+    """
+    Return the parquet files that make up a raw price dataset.
+
+    A file path is returned as-is. For a directory, top-level files (the base
+    snapshot) come first, followed by partition fragments in path order, so
+    older data is always read before newer appends.
+    """
+    if not raw_path.exists():
+        raise FileNotFoundError(f"Raw price dataset not found: {raw_path}")
+    if raw_path.is_file():
+        return [raw_path]
+
+    files = [p for p in raw_path.rglob("*.parquet") if p.is_file() and not _is_hidden(p, raw_path)]
+    return sorted(files, key=lambda p: (len(p.relative_to(raw_path).parts) > 1, str(p)))
+
+
+def open_price_dataset(raw_path: Path) -> ds.Dataset:
+    """
+    Open the raw price layer (file or partitioned directory) as one pyarrow dataset.
+    """
+    files = list_raw_files(raw_path)
+    if not files:
+        raise FileNotFoundError(f"No parquet files found under: {raw_path}")
+    return ds.dataset([str(p) for p in files], format="parquet")
+
+
+def raw_row_count(raw_path: Path) -> int:
+    """
+    Total rows across all raw files, read from parquet footers only.
+    """
+    return sum(pq.ParquetFile(p).metadata.num_rows for p in list_raw_files(raw_path))
+
+
+def _to_date(value: date | datetime | str | None) -> date | None:
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    if isinstance(value, bytes):
+        value = value.decode("utf-8", errors="replace")
+    return date.fromisoformat(str(value)[:10])
+
+
+def _row_group_may_match(
+    rg_meta: pq.RowGroupMetaData,
+    col_index: dict[str, int],
+    symbol_col: str | None,
+    date_col: str | None,
+    symbols: list[str] | None,
+    since: date | None,
+    until: date | None,
+) -> bool:
+    """
+    Decide from min/max statistics whether a row group can contain matching rows.
+
+    Missing statistics always mean "maybe", so pruning never drops data.
+    """
+    if symbols is not None and symbol_col is not None:
+        stats = rg_meta.column(col_index[symbol_col]).statistics
+        if stats is not None and stats.has_min_max:
+            lo, hi = stats.min, stats.max
+            if isinstance(lo, bytes):
+                lo, hi = lo.decode("utf-8", errors="replace"), hi.decode("utf-8", errors="replace")
+            pos = bisect_left(symbols, lo)
+            if pos == len(symbols) or symbols[pos] > hi:
+                return False
+
+    if (since is not None or until is not None) and date_col is not None:
+        stats = rg_meta.column(col_index[date_col]).statistics
+        if stats is not None and stats.has_min_max:
+            try:
+                lo, hi = _to_date(stats.min), _to_date(stats.max)
+            except ValueError:
+                return True
+            if since is not None and hi is not None and hi < since:
+                return False
+            if until is not None and lo is not None and lo > until:
+                return False
+    return True
+
+
+def _filter_rows(
+    table: pa.Table,
+    symbol_col: str | None,
+    date_col: str | None,
+    symbol_set: pa.Array | None,
+    since: date | None,
+    until: date | None,
+) -> pa.Table:
+    mask = None
+    if symbol_set is not None and symbol_col is not None:
+        mask = pc.is_in(table[symbol_col], value_set=symbol_set)
+    if (since is not None or until is not None) and date_col is not None:
+        dates = table[date_col]
+        if not pa.types.is_date32(dates.type):
+            dates = pc.cast(dates, pa.date32())
+        if since is not None:
+            cond = pc.greater_equal(dates, pa.scalar(since, pa.date32()))
+            mask = cond if mask is None else pc.and_(mask, cond)
+        if until is not None:
+            cond = pc.less_equal(dates, pa.scalar(until, pa.date32()))
+            mask = cond if mask is None else pc.and_(mask, cond)
+    if mask is None:
+        return table
+    return table.filter(pc.fill_null(mask, False))
+
+
+def _scan_row_groups(
+    raw_path: Path,
+    columns: list[str] | None,
+    symbols: Iterable[str] | None,
+    since: date | str | None,
+    until: date | str | None,
+    transform: Callable[[pa.Table], T | None],
+    workers: int | None,
+    prefetch: int | None,
+    ordered: bool,
+) -> Iterator[T]:
+    """
+    Plan the matching row groups, then read, filter and transform them on the scan pool.
+
+    transform runs on the worker threads; returning None drops the row group.
+    """
+    symbol_list = sorted(set(symbols)) if symbols is not None else None
+    symbol_set = pa.array(symbol_list, pa.string()) if symbol_list is not None else None
+    since_d = _to_date(since)
+    until_d = _to_date(until)
+    filtering = symbol_list is not None or since_d is not None or until_d is not None
+
+    tasks: list[tuple[Path, pq.FileMetaData, int, list[str] | None, str | None, str | None]] = []
+    for path in list_raw_files(raw_path):
+        pf = pq.ParquetFile(path)
+        schema = pf.schema_arrow
+        symbol_col = resolve_column(schema, "source_ticker", required=False)
+        date_col = resolve_column(schema, "date", required=False)
+        col_index = {pf.metadata.schema.column(i).name: i for i in range(pf.metadata.num_columns)}
+
+        read_cols = columns
+        if columns is not None and filtering:
+            extra = [c for c in (symbol_col, date_col) if c is not None and c not in columns]
+            read_cols = list(columns) + extra
+
+        for rg in range(pf.metadata.num_row_groups):
+            if filtering and not _row_group_may_match(
+                pf.metadata.row_group(rg), col_index, symbol_col, date_col, symbol_list, since_d, until_d
+            ):
+                continue
+            tasks.append((path, pf.metadata, rg, read_cols, symbol_col, date_col))
+
+    def read(task: tuple[Path, pq.FileMetaData, int, list[str] | None, str | None, str | None]) -> T | None:
+        path, metadata, rg, read_cols, symbol_col, date_col = task
+        table = read_row_group(path, metadata, rg, columns=read_cols)
+        if filtering:
+            table = _filter_rows(table, symbol_col, date_col, symbol_set, since_d, until_d)
+            if table.num_rows == 0:
+                return None
+            if columns is not None:
+                table = table.select(list(columns))
+        return transform(table)
+
+    for result in bounded_map(read, tasks, workers=workers, prefetch=prefetch, ordered=ordered):
+        if result is not None:
+            yield result
+
+
+def iter_raw_row_groups(
+    raw_path: Path,
+    columns: list[str] | None = None,
+    symbols: Iterable[str] | None = None,
+    since: date | str | None = None,
+    until: date | str | None = None,
+    workers: int | None = None,
+    prefetch: int | None = None,
+    ordered: bool = True,
+) -> Iterator[pa.Table]:
+    """
+    Yield raw row groups across every file of the dataset, one at a time.
+
+    symbols / since / until restrict the rows returned. Row groups whose
+    parquet min/max statistics rule out any match are skipped without being
+    read; on a file sorted by symbol_raw, payload_date (see compact_raw) this
+    means only the requested symbols' bytes are decoded. Row groups with no
+    matching rows after filtering are not yielded.
+
+    Row groups are decoded on a thread pool (workers, default one per core up
+    to DEFAULT_SCAN_WORKERS) with at most prefetch groups held in memory.
+    ordered=False yields groups as they finish instead of in file order.
+    """
+    return _scan_row_groups(raw_path, columns, symbols, since, until, lambda t: t, workers, prefetch, ordered)
+
+
+def plan_symbol_passes(symbol_counts: dict[str, int], max_rows: int) -> list[list[str]]:
+    """
+    Split sorted symbols into contiguous passes of at most max_rows rows.
+
+    A single symbol larger than max_rows still gets its own pass.
+    """
+    passes: list[list[str]] = []
+    current: list[str] = []
+    current_rows = 0
+    for symbol in sorted(symbol_counts):
+        n = symbol_counts[symbol]
+        if current and current_rows + n > max_rows:
+            passes.append(current)
+            current, current_rows = [], 0
+        current.append(symbol)
+        current_rows += n
+    if current:
+        passes.append(current)
+    return passes
+
+
+def pruned_row_counts(
+    raw_path: Path,
+    symbol_sets: list[Iterable[str]],
+    since: date | str | None = None,
+    until: date | str | None = None,
+) -> list[int]:
+    """
+    For each symbol set, the rows of the row groups iter_raw_row_groups would
+    decode for it (statistics pruning only), read from the footers.
+
+    This is the cost of a filtered scan, not its result: on an unsorted file
+    every row group spans every symbol range and nothing is pruned.
+    """
+    symbol_lists = [sorted(set(s)) for s in symbol_sets]
+    since_d, until_d = _to_date(since), _to_date(until)
+    counts = [0] * len(symbol_lists)
+    for path in list_raw_files(raw_path):
+        pf = pq.ParquetFile(path)
+        symbol_col = resolve_column(pf.schema_arrow, "source_ticker", required=False)
+        date_col = resolve_column(pf.schema_arrow, "date", required=False)
+        col_index = {pf.metadata.schema.column(i).name: i for i in range(pf.metadata.num_columns)}
+        for rg in range(pf.metadata.num_row_groups):
+            rg_meta = pf.metadata.row_group(rg)
+            for i, symbols in enumerate(symbol_lists):
+                if _row_group_may_match(rg_meta, col_index, symbol_col, date_col, symbols, since_d, until_d):
+                    counts[i] += rg_meta.num_rows
+    return counts
+
+
+def _raw_columns_for(raw_path: Path, columns: list[str]) -> list[str]:
+    """
+    Map normalized column names to the raw columns needed to produce them.
+    """
+    schema = pq.ParquetFile(list_raw_files(raw_path)[0]).schema_arrow
+    wanted = set(columns) | set(REQUIRED_COLUMNS)
+    if "ticker" in wanted:
+        wanted.discard("ticker")
+        wanted.add("source_ticker")
+    raw_cols: list[str] = []
+    for name in COLUMN_CANDIDATES:
+        if name not in wanted:
             continue
-        yield normalized
+        col = resolve_column(schema, name, required=name in REQUIRED_COLUMNS)
+        if col is not None and col not in raw_cols:
+            raw_cols.append(col)
+    return raw_cols
+
+
+def _normalize_for_scan(table: pa.Table, columns: list[str] | None) -> pa.Table | None:
+    try:
+        normalized = normalize_price_table(table)
+    except ValueError:
+        # Skip empty/invalid chunks after normalization.
+        return None
+    if columns is not None:
+        normalized = normalized.select(list(columns))
+    return normalized
+
+
+def iter_normalized_price_tables(
+    parquet_path: Path,
+    symbols: Iterable[str] | None = None,
+    since: date | str | None = None,
+    until: date | str | None = None,
+    columns: list[str] | None = None,
+    workers: int | None = None,
+    ordered: bool = True,
+) -> Iterator[pa.Table]:
+    """
+    Yield normalized Arrow tables (see normalize_price_table) one row group at a time.
+
+    Arguments are pushed down as in iter_normalized_price_chunks.
+    """
+    raw_cols = _raw_columns_for(parquet_path, columns) if columns is not None else None
+    return _scan_row_groups(
+        parquet_path,
+        raw_cols,
+        symbols,
+        since,
+        until,
+        lambda t: _normalize_for_scan(t, columns),
+        workers,
+        None,
+        ordered,
+    )
+
+
+def iter_normalized_price_chunks(
+    parquet_path: Path,
+    symbols: Iterable[str] | None = None,
+    since: date | str | None = None,
+    until: date | str | None = None,
+    columns: list[str] | None = None,
+    workers: int | None = None,
+    ordered: bool = True,
+) -> Iterator[pd.DataFrame]:
+    """
+    Yield normalized price data one parquet row-group at a time.
+
+    parquet_path may be a single raw parquet file or a raw dataset directory.
+    symbols (source tickers such as "AAPL.US"), since/until (inclusive dates)
+    and columns (normalized column names) are pushed down to the parquet
+    reader, see iter_raw_row_groups. Reading, normalization (Arrow compute)
+    and the pandas conversion all run on the scan thread pool.
+    """
+    raw_cols = _raw_columns_for(parquet_path, columns) if columns is not None else None
+
+    def to_chunk(table: pa.Table) -> pd.DataFrame | None:
+        normalized = _normalize_for_scan(table, columns)
+        return normalized_table_to_pandas(normalized) if normalized is not None else None
+
+    return _scan_row_groups(parquet_path, raw_cols, symbols, since, until, to_chunk, workers, None, ordered)
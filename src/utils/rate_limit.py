@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+"""
+Thread-safe token-bucket rate limiter for external API calls.
+"""
+
+import threading
+import time
+from typing import Callable
+
+
+class TokenBucket:
+    """
+    Allow `rate_per_minute` calls per minute with bursts of up to `burst` calls.
+
+    acquire() blocks until a token is available. Tokens are reserved under a
+    lock and the wait happens outside it, so concurrent callers are served in
+    arrival order without busy-waiting. A rate of 0 (or None) disables
+    limiting, e.g. for paid API plans.
+    """
+
+    def __init__(
+        self,
+        rate_per_minute: float | None,
+        burst: int = 1,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> None:
+        if burst < 1:
+            raise ValueError("burst must be at least 1.")
+        if rate_per_minute is not None and rate_per_minute < 0:
+            raise ValueError("rate_per_minute must be non-negative.")
+        self.rate_per_second = (rate_per_minute or 0) / 60.0
+        self.burst = burst
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = float(burst)
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """Take one token, sleeping if needed. Returns the seconds waited."""
+        if self.rate_per_second <= 0:
+            return 0.0
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate_per_second)
+            self._updated = now
+            self._tokens -= 1
+            wait = -self._tokens / self.rate_per_second if self._tokens < 0 else 0.0
+        if wait > 0:
+            self._sleep(wait)
+        return wait
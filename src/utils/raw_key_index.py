@@ -0,0 +1,236 @@
+from __future__ import annotations
+
+"""
+Persisted (symbol, date) key index for the raw price dataset.
+
+data/raw/stock_price_stooq/_key_index/ holds one sorted int32 array of
+epoch days per source ticker (<quoted symbol>.npy) plus _state.json, the
+size/mtime of every data file the index covers.
+
+Ingest and backfill dedup new rows against it with a vectorized anti-join
+(searchsorted per symbol), so the cost depends on the new rows and the
+touched symbols only, not on the size of the history. Writers keep it
+current: append_raw_fragment merges the keys of the new fragments; full
+rewrites (initial ingest, Supabase pull, compaction) trigger a rebuild.
+
+Usage:
+    python -m src.utils.raw_key_index           # (re)build the key index
+"""
+
+import argparse
+import json
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Any, Iterator
+from urllib.parse import quote
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from src.utils.atomic_io import atomic_open, fsync_dir, write_json_atomic
+from src.utils.parallel_scan import bounded_map, plan_row_groups, read_row_group
+from src.utils.price_utils import DEFAULT_RAW_DATASET, list_raw_files, resolve_column
+from src.utils.raw_manifest import file_entry, stale_files
+
+
+KEY_INDEX_DIR = "_key_index"
+KEY_INDEX_STATE = "_state.json"
+KEY_INDEX_VERSION = 1
+
+
+def key_index_dir(dataset_dir: Path) -> Path:
+    return dataset_dir / KEY_INDEX_DIR
+
+
+def _symbol_path(index_dir: Path, symbol: str) -> Path:
+    return index_dir / f"{quote(symbol, safe='')}.npy"
+
+
+def to_epoch_days(dates: Any) -> np.ndarray:
+    """
+    Convert an Arrow column, Series or sequence of dates to int32 days since 1970-01-01.
+    """
+    if isinstance(dates, (pa.Array, pa.ChunkedArray)):
+        if not pa.types.is_date32(dates.type):
+            dates = pc.cast(dates, pa.date32())
+        values = dates.to_numpy(zero_copy_only=False)
+    else:
+        values = pd.to_datetime(pd.Series(dates)).to_numpy()
+    return values.astype("datetime64[D]").astype(np.int32)
+
+
+def _group_rows(symbols: np.ndarray) -> Iterator[tuple[str, np.ndarray]]:
+    """
+    Yield (symbol, row positions) for every distinct symbol.
+    """
+    if symbols.size == 0:
+        return
+    order = np.argsort(symbols, kind="stable")
+    uniq, starts = np.unique(symbols[order], return_index=True)
+    ends = np.append(starts[1:], order.size)
+    for symbol, start, end in zip(uniq, starts, ends):
+        yield str(symbol), order[start:end]
+
+
+def load_symbol_days(dataset_dir: Path, symbol: str) -> np.ndarray:
+    """
+    Sorted epoch days stored for symbol (empty if the symbol is not indexed).
+    """
+    path = _symbol_path(key_index_dir(dataset_dir), symbol)
+    if not path.exists():
+        return np.empty(0, dtype=np.int32)
+    return np.load(path, mmap_mode="r")
+
+
+def _write_symbol_days(index_dir: Path, symbol: str, days: np.ndarray) -> None:
+    with atomic_open(_symbol_path(index_dir, symbol), "wb") as f:
+        np.save(f, days.astype(np.int32, copy=False))
+
+
+def _write_state(index_dir: Path, files: dict[str, dict[str, int]]) -> None:
+    state = {"version": KEY_INDEX_VERSION, "files": files}
+    write_json_atomic(index_dir / KEY_INDEX_STATE, state, separators=(",", ":"))
+
+
+def _read_state(index_dir: Path) -> dict[str, Any] | None:
+    path = index_dir / KEY_INDEX_STATE
+    if not path.exists():
+        return None
+    try:
+        state = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, json.JSONDecodeError):
+        return None
+    if state.get("version") != KEY_INDEX_VERSION:
+        return None
+    return state
+
+
+def _scan_keys(files: list[Path]) -> dict[str, list[np.ndarray]]:
+    """
+    Collect per-symbol epoch days from the key columns of files.
+    """
+    key_columns: dict[Path, tuple[str, str]] = {}
+    for path in files:
+        schema = pq.ParquetFile(path).schema_arrow
+        key_columns[path] = (resolve_column(schema, "source_ticker"), resolve_column(schema, "date"))
+
+    def row_group_keys(task: tuple[Path, pq.FileMetaData, int]) -> list[tuple[str, np.ndarray]]:
+        path, metadata, rg = task
+        symbol_col, date_col = key_columns[path]
+        table = read_row_group(path, metadata, rg, columns=[symbol_col, date_col])
+        table = table.filter(pc.and_(pc.is_valid(table[symbol_col]), pc.is_valid(table[date_col])))
+        if table.num_rows == 0:
+            return []
+        symbols = pc.cast(table[symbol_col], pa.string()).to_numpy(zero_copy_only=False)
+        days = to_epoch_days(table[date_col])
+        return [(symbol, days[rows]) for symbol, rows in _group_rows(symbols)]
+
+    keys: dict[str, list[np.ndarray]] = {}
+    # Key sets are order-independent, so take row groups as they finish.
+    for group in bounded_map(row_group_keys, plan_row_groups(files), ordered=False):
+        for symbol, days in group:
+            keys.setdefault(symbol, []).append(days)
+    return keys
+
+
+def build_key_index(dataset_dir: Path) -> int:
+    """
+    Rebuild the key index from scratch. Returns the number of symbols indexed.
+
+    The new index is written to a hidden sibling directory and swapped in.
+    """
+    files = list_raw_files(dataset_dir)
+    keys = _scan_keys(files)
+
+    tmp_dir = Path(tempfile.mkdtemp(dir=dataset_dir, prefix=".key_index."))
+    try:
+        for symbol, parts in keys.items():
+            _write_symbol_days(tmp_dir, symbol, np.unique(np.concatenate(parts)))
+        _write_state(tmp_dir, {p.relative_to(dataset_dir).as_posix(): file_entry(p) for p in files})
+        target = key_index_dir(dataset_dir)
+        if target.exists():
+            shutil.rmtree(target)
+        os.replace(tmp_dir, target)
+        fsync_dir(dataset_dir)
+    finally:
+        if tmp_dir.exists():
+            shutil.rmtree(tmp_dir)
+    return len(keys)
+
+
+def refresh_key_index(dataset_dir: Path) -> None:
+    """
+    Bring the key index up to date, merging keys from unseen files only.
+
+    Falls back to a full rebuild if it is missing or a covered file changed.
+    A crash mid-merge is harmless: the state is written last and merging is
+    idempotent, so the next refresh simply merges the same files again.
+    """
+    index_dir = key_index_dir(dataset_dir)
+    state = _read_state(index_dir)
+    if state is None:
+        build_key_index(dataset_dir)
+        return
+    new_files, changed = stale_files(dataset_dir, state["files"])
+    if changed:
+        build_key_index(dataset_dir)
+        return
+    if not new_files:
+        return
+
+    for symbol, parts in _scan_keys(new_files).items():
+        existing = np.asarray(load_symbol_days(dataset_dir, symbol))
+        merged = np.union1d(existing, np.concatenate(parts))
+        if merged.size != existing.size:
+            _write_symbol_days(index_dir, symbol, merged)
+    files = dict(state["files"])
+    for p in new_files:
+        files[p.relative_to(dataset_dir).as_posix()] = file_entry(p)
+    _write_state(index_dir, files)
+
+
+def new_key_mask(dataset_dir: Path, symbols: Any, dates: Any) -> np.ndarray:
+    """
+    Vectorized anti-join: True for rows whose (symbol, date) is not stored yet.
+
+    Call refresh_key_index first so the index covers every data file.
+    """
+    symbols = np.asarray(symbols, dtype=object)
+    days = to_epoch_days(dates)
+    mask = np.ones(days.size, dtype=bool)
+    for symbol, rows in _group_rows(symbols):
+        existing = load_symbol_days(dataset_dir, symbol)
+        if existing.size == 0:
+            continue
+        wanted = days[rows]
+        pos = np.searchsorted(existing, wanted)
+        found = np.asarray(existing[np.minimum(pos, existing.size - 1)]) == wanted
+        mask[rows] = ~found
+    return mask
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Rebuild the raw price dataset (symbol, date) key index.")
+    parser.add_argument(
+        "--raw-path",
+        type=Path,
+        default=DEFAULT_RAW_DATASET,
+        help="Raw dataset directory.",
+    )
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    symbols = build_key_index(args.raw_path)
+    print(f"Key index written: {key_index_dir(args.raw_path)}")
+    print(f"  Symbols: {symbols:,}")
+
+
+if __name__ == "__main__":
+    main()
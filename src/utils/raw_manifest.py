@@ -0,0 +1,277 @@
+from __future__ import annotations
+
+"""
+Manifest sidecar for the raw price dataset.
+
+data/raw/stock_price_stooq/_manifest.json records, per source ticker:
+min/max date, row count, non-null close/volume counts, first/last close and
+the (file, row group) locations holding its rows, plus the size/mtime of
+every data file it was built from.
+
+Questions like "latest stored date per ticker" are then answered in
+O(tickers) from the sidecar instead of scanning the price data. Writers keep
+it current (append_raw_fragment merges stats for the new fragments only;
+full rewrites rebuild it). A manifest whose file list no longer matches the
+directory is treated as stale and readers fall back to scanning.
+
+Usage:
+    python -m src.utils.raw_manifest            # (re)build the manifest
+"""
+
+import argparse
+import json
+from datetime import date, datetime, timezone
+from pathlib import Path
+from typing import Any
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from src.utils.atomic_io import write_json_atomic
+from src.utils.parallel_scan import bounded_map, plan_row_groups, read_row_group
+from src.utils.price_utils import DEFAULT_RAW_DATASET, list_raw_files, resolve_column
+
+
+MANIFEST_NAME = "_manifest.json"
+MANIFEST_VERSION = 1
+
+
+def manifest_path(dataset_dir: Path) -> Path:
+    return dataset_dir / MANIFEST_NAME
+
+
+def file_entry(path: Path) -> dict[str, int]:
+    st = path.stat()
+    meta = pq.ParquetFile(path).metadata
+    return {
+        "size": st.st_size,
+        "mtime_ns": st.st_mtime_ns,
+        "num_rows": meta.num_rows,
+        "num_row_groups": meta.num_row_groups,
+    }
+
+
+def _row_group_ticker_stats(table: pa.Table, location: list[Any]) -> dict[str, dict[str, Any]]:
+    """
+    Per-ticker stats for one row group, computed with Arrow group-by.
+    """
+    schema = table.schema
+    symbol_col = resolve_column(schema, "source_ticker")
+    date_col = resolve_column(schema, "date")
+    close_col = resolve_column(schema, "close")
+    volume_col = resolve_column(schema, "volume", required=False)
+
+    dates = table[date_col]
+    if not pa.types.is_date32(dates.type):
+        dates = pc.cast(dates, pa.date32())
+    volume = table[volume_col] if volume_col else pa.nulls(table.num_rows, pa.float64())
+    work = pa.table({"s": pc.cast(table[symbol_col], pa.string()), "d": dates, "c": table[close_col], "v": volume})
+    work = work.filter(pc.and_(pc.is_valid(work["s"]), pc.is_valid(work["d"])))
+    if work.num_rows == 0:
+        return {}
+
+    keep_nulls = pc.ScalarAggregateOptions(skip_nulls=False)
+    work = work.sort_by([("s", "ascending"), ("d", "ascending")])
+    grouped = work.group_by("s", use_threads=False).aggregate(
+        [
+            ("d", "min"),
+            ("d", "max"),
+            ("d", "count"),
+            ("c", "count"),
+            ("v", "count"),
+            ("c", "first", keep_nulls),
+            ("c", "last", keep_nulls),
+        ]
+    )
+
+    out: dict[str, dict[str, Any]] = {}
+    for row in grouped.to_pylist():
+        out[row["s"]] = {
+            "min_date": row["d_min"].isoformat(),
+            "max_date": row["d_max"].isoformat(),
+            "row_count": row["d_count"],
+            "non_null_close_count": row["c_count"],
+            "non_null_volume_count": row["v_count"],
+            "first_close": row["c_first"],
+            "last_close": row["c_last"],
+            "row_groups": [location],
+        }
+    return out
+
+
+def _merge_stats(target: dict[str, dict[str, Any]], incoming: dict[str, dict[str, Any]]) -> None:
+    for symbol, new in incoming.items():
+        cur = target.get(symbol)
+        if cur is None:
+            target[symbol] = new
+            continue
+        if new["min_date"] < cur["min_date"]:
+            cur["min_date"] = new["min_date"]
+            cur["first_close"] = new["first_close"]
+        if new["max_date"] >= cur["max_date"]:
+            # Ties go to the later file/row group, matching read order.
+            cur["max_date"] = new["max_date"]
+            cur["last_close"] = new["last_close"]
+        cur["row_count"] += new["row_count"]
+        cur["non_null_close_count"] += new["non_null_close_count"]
+        cur["non_null_volume_count"] += new["non_null_volume_count"]
+        cur["row_groups"].extend(new["row_groups"])
+
+
+def _scan_files(dataset_dir: Path, files: list[Path], tickers: dict[str, dict[str, Any]]) -> None:
+    columns: dict[Path, list[str]] = {}
+    for path in files:
+        schema = pq.ParquetFile(path).schema_arrow
+        columns[path] = [
+            c
+            for c in (
+                resolve_column(schema, "source_ticker"),
+                resolve_column(schema, "date"),
+                resolve_column(schema, "close"),
+                resolve_column(schema, "volume", required=False),
+            )
+            if c is not None
+        ]
+
+    def row_group_stats(task: tuple[Path, pq.FileMetaData, int]) -> dict[str, dict[str, Any]]:
+        path, metadata, rg = task
+        table = read_row_group(path, metadata, rg, columns=columns[path])
+        return _row_group_ticker_stats(table, [path.relative_to(dataset_dir).as_posix(), rg])
+
+    # Ordered delivery: first/last close ties are resolved by read order.
+    for stats in bounded_map(row_group_stats, plan_row_groups(files), ordered=True):
+        _merge_stats(tickers, stats)
+
+
+def build_manifest(dataset_dir: Path) -> dict[str, Any]:
+    """
+    Build a manifest from scratch by scanning the key columns of every file.
+    """
+    files = list_raw_files(dataset_dir)
+    tickers: dict[str, dict[str, Any]] = {}
+    _scan_files(dataset_dir, files, tickers)
+    return {
+        "version": MANIFEST_VERSION,
+        "updated_at": datetime.now(timezone.utc).isoformat(),
+        "files": {p.relative_to(dataset_dir).as_posix(): file_entry(p) for p in files},
+        "tickers": tickers,
+    }
+
+
+def write_manifest(dataset_dir: Path, manifest: dict[str, Any]) -> Path:
+    """
+    Atomically replace the manifest sidecar.
+    """
+    out = manifest_path(dataset_dir)
+    write_json_atomic(out, manifest, separators=(",", ":"))
+    return out
+
+
+def _read_manifest(dataset_dir: Path) -> dict[str, Any] | None:
+    path = manifest_path(dataset_dir)
+    if not path.exists():
+        return None
+    try:
+        manifest = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, json.JSONDecodeError):
+        return None
+    if manifest.get("version") != MANIFEST_VERSION:
+        return None
+    return manifest
+
+
+def stale_files(dataset_dir: Path, recorded: dict[str, dict[str, int]]) -> tuple[list[Path], bool]:
+    """
+    Compare recorded file entries with the directory.
+
+    Returns (data files not recorded yet, whether any recorded file changed or vanished).
+    Shared with the other sidecars that track which files they were built from.
+    """
+    current = {p.relative_to(dataset_dir).as_posix(): p for p in list_raw_files(dataset_dir)}
+    changed = any(rel not in current for rel in recorded)
+    for rel, entry in recorded.items():
+        path = current.get(rel)
+        if path is None:
+            continue
+        st = path.stat()
+        if st.st_size != entry["size"] or st.st_mtime_ns != entry["mtime_ns"]:
+            changed = True
+            break
+    new_files = [p for rel, p in current.items() if rel not in recorded]
+    return new_files, changed
+
+
+def load_manifest(dataset_dir: Path) -> dict[str, Any] | None:
+    """
+    Return the manifest if it exactly describes the current data files, else None.
+    """
+    if not dataset_dir.is_dir():
+        return None
+    manifest = _read_manifest(dataset_dir)
+    if manifest is None:
+        return None
+    new_files, changed = stale_files(dataset_dir, manifest.get("files", {}))
+    if new_files or changed:
+        return None
+    return manifest
+
+
+def refresh_manifest(dataset_dir: Path) -> dict[str, Any]:
+    """
+    Bring the manifest up to date, scanning only files it has not seen yet.
+
+    Falls back to a full rebuild if it is missing or a recorded file changed.
+    """
+    manifest = _read_manifest(dataset_dir)
+    new_files: list[Path] = []
+    if manifest is not None:
+        new_files, changed = stale_files(dataset_dir, manifest.get("files", {}))
+        if changed:
+            manifest = None
+    if manifest is None:
+        manifest = build_manifest(dataset_dir)
+    elif not new_files:
+        return manifest
+    else:
+        _scan_files(dataset_dir, new_files, manifest["tickers"])
+        for p in new_files:
+            manifest["files"][p.relative_to(dataset_dir).as_posix()] = file_entry(p)
+        manifest["updated_at"] = datetime.now(timezone.utc).isoformat()
+    write_manifest(dataset_dir, manifest)
+    return manifest
+
+
+def max_dates_from_manifest(manifest: dict[str, Any], symbols: set[str] | None = None) -> dict[str, date]:
+    """
+    Max stored date per source ticker, optionally restricted to symbols.
+    """
+    return {
+        sym: date.fromisoformat(stats["max_date"])
+        for sym, stats in manifest["tickers"].items()
+        if symbols is None or sym in symbols
+    }
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Rebuild the raw price dataset manifest sidecar.")
+    parser.add_argument(
+        "--raw-path",
+        type=Path,
+        default=DEFAULT_RAW_DATASET,
+        help="Raw dataset directory.",
+    )
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    manifest = build_manifest(args.raw_path)
+    out = write_manifest(args.raw_path, manifest)
+    print(f"Manifest written: {out}")
+    print(f"  Files:   {len(manifest['files']):,}")
+    print(f"  Tickers: {len(manifest['tickers']):,}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,303 @@
+from __future__ import annotations
+
+"""
+Write-side helpers for the partitioned raw price dataset.
+
+Layout under data/raw/stock_price_stooq/:
+  stock_prices.parquet                          base snapshot (initial ingest / Supabase pull)
+  source=stooq/bucket=NN/part-<run_id>.parquet  Stooq rows by symbol bucket (incremental initial ingest)
+  year=YYYY/month=MM/part-<run_id>.parquet      one fragment per ingest run and month
+
+Appends never touch existing files: each ingest run adds new fragments, so
+the I/O of a daily run scales with the new rows, not with the history.
+"""
+
+import shutil
+import zlib
+from pathlib import Path
+from typing import Sequence
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from src.utils.atomic_io import atomic_path
+from src.utils.price_utils import DEFAULT_RAW_DATASET, list_raw_files
+from src.utils.raw_key_index import refresh_key_index
+from src.utils.raw_manifest import refresh_manifest
+
+
+RAW_DATASET_DIR = DEFAULT_RAW_DATASET
+RAW_BASE_FILE_NAME = "stock_prices.parquet"
+# Large enough to amortize per-row-group overhead, small enough that a
+# symbol-sorted file still yields useful min/max statistics per group.
+DEFAULT_ROW_GROUP_ROWS = 100_000
+
+# Compact storage (migrate_raw_schema, --compact writers): typed dates,
+# dictionary-encoded repeated strings, zstd with byte-stream-split floats.
+COMPACT_DICTIONARY_COLUMNS = ("source_system", "ingestion_run_id", "symbol_raw")
+COMPACT_COMPRESSION = "zstd"
+COMPACT_COMPRESSION_LEVEL = 3
+
+# Incremental initial ingest keeps Stooq rows in symbol buckets so a changed
+# TXT file only rewrites its bucket; _stooq_files.json maps files to buckets.
+STOOQ_BUCKET_DIR_NAME = "source=stooq"
+STOOQ_FILE_MANIFEST_NAME = "_stooq_files.json"
+DEFAULT_STOOQ_BUCKETS = 64
+
+# Watermark of the last Supabase pull (scripts/pull_from_supabase.py). Only
+# valid while the local rows came from that pull, so Stooq rebuilds drop it.
+SUPABASE_PULL_STATE_NAME = "_supabase_pull.json"
+
+
+def raw_dataset_schema(dataset_dir: Path) -> pa.Schema | None:
+    """
+    Reference schema of the dataset: base file first, otherwise the oldest fragment.
+    """
+    if not dataset_dir.exists():
+        return None
+    files = list_raw_files(dataset_dir)
+    if not files:
+        return None
+    return pq.ParquetFile(files[0]).schema_arrow
+
+
+def _payload_dates(table: pa.Table) -> pa.ChunkedArray:
+    dates = table["payload_date"]
+    if pa.types.is_date(dates.type):
+        return dates
+    return pc.cast(dates, pa.date32())
+
+
+def _to_reference_schema(table: pa.Table, schema: pa.Schema, compact: bool) -> pa.Table:
+    table = table.select(schema.names)
+    if compact:
+        table = to_compact_table(table)
+    return table.cast(schema)
+
+
+def _partition_dir(dataset_dir: Path, year: int, month: int) -> Path:
+    return dataset_dir / f"year={year:04d}" / f"month={month:02d}"
+
+
+def is_compact_schema(schema: pa.Schema) -> bool:
+    """True when schema already uses the compact storage types."""
+    return "symbol_raw" in schema.names and pa.types.is_dictionary(schema.field("symbol_raw").type)
+
+
+def compact_raw_schema(schema: pa.Schema) -> pa.Schema:
+    """
+    Compact counterpart of a raw schema: date32 payload_date and
+    dictionary<int32, string> for the repeated string columns.
+    """
+    fields = []
+    for field in schema:
+        if field.name == "payload_date":
+            field = field.with_type(pa.date32())
+        elif field.name in COMPACT_DICTIONARY_COLUMNS:
+            field = field.with_type(pa.dictionary(pa.int32(), pa.string()))
+        fields.append(field)
+    return pa.schema(fields)
+
+
+def to_compact_table(table: pa.Table) -> pa.Table:
+    """Cast a raw table (string/date/timestamp payload_date) to compact_raw_schema."""
+    if "payload_date" in table.column_names:
+        dates = table["payload_date"]
+        if not pa.types.is_date32(dates.type):
+            if pa.types.is_string(dates.type) or pa.types.is_large_string(dates.type):
+                # ISO strings, possibly with a time suffix; same rule as price_utils._to_date.
+                dates = pc.cast(pc.utf8_slice_codeunits(dates, 0, 10), pa.date32())
+            else:
+                dates = pc.cast(dates, pa.date32())
+            table = table.set_column(table.schema.get_field_index("payload_date"), "payload_date", dates)
+    return table.cast(compact_raw_schema(table.schema))
+
+
+def parquet_write_options(schema: pa.Schema, compact: bool = False) -> dict:
+    """
+    ParquetWriter keyword arguments for raw files: snappy by default, or zstd
+    with byte-stream-split float columns for compact storage.
+    """
+    if not compact:
+        return {"compression": "snappy"}
+    floats = [f.name for f in schema if pa.types.is_floating(f.type)]
+    return {
+        "compression": COMPACT_COMPRESSION,
+        "compression_level": COMPACT_COMPRESSION_LEVEL,
+        "use_byte_stream_split": floats,
+        # Dictionary pages would bypass byte-stream-split for the floats.
+        "use_dictionary": [f.name for f in schema if f.name not in floats],
+    }
+
+
+def stooq_bucket(symbol: str, buckets: int = DEFAULT_STOOQ_BUCKETS) -> int:
+    return zlib.crc32(symbol.encode()) % buckets
+
+
+def stooq_bucket_dir(dataset_dir: Path, bucket: int) -> Path:
+    return dataset_dir / STOOQ_BUCKET_DIR_NAME / f"bucket={bucket:02d}"
+
+
+def write_parquet_atomic(
+    path: Path,
+    table: pa.Table,
+    row_group_size: int | None = None,
+    compact: bool = False,
+) -> None:
+    """
+    Write table to path via a hidden sibling temp file and rename, so readers
+    only ever see the old file or the complete new one.
+    """
+    with atomic_path(path) as tmp_path:
+        options = parquet_write_options(table.schema, compact)
+        pq.write_table(table, tmp_path, row_group_size=row_group_size, **options)
+
+
+def append_raw_fragment(
+    dataset_dir: Path,
+    table: pa.Table | Sequence[pa.Table],
+    run_id: str,
+) -> list[Path]:
+    """
+    Append one table, or several, to the raw dataset as new year/month fragments.
+
+    Rows are cast to the dataset's reference schema so every fragment reads
+    back as one consistent dataset, and the sidecars (manifest, key index)
+    are updated once per call. Each fragment is written with a temp file and
+    rename; existing files are never rewritten.
+    Returns the fragment paths written.
+    """
+    tables = [t for t in ([table] if isinstance(table, pa.Table) else table) if t.num_rows]
+    if not tables:
+        return []
+
+    schema = raw_dataset_schema(dataset_dir)
+    compact = schema is not None and is_compact_schema(schema)
+    if schema is None:
+        schema = tables[0].schema
+    tables = [_to_reference_schema(t, schema, compact) for t in tables]
+    table = tables[0] if len(tables) == 1 else pa.concat_tables(tables)
+
+    dates = _payload_dates(table)
+    if dates.null_count:
+        raise ValueError(f"Cannot partition {dates.null_count} rows with null payload_date.")
+    years = pc.year(dates)
+    months = pc.month(dates)
+    keys = pa.table({"year": years, "month": months}).group_by(["year", "month"]).aggregate([])
+
+    written: list[Path] = []
+    for year, month in zip(keys["year"].to_pylist(), keys["month"].to_pylist()):
+        mask = pc.and_(pc.equal(years, year), pc.equal(months, month))
+        part = table.filter(mask)
+        path = _partition_dir(dataset_dir, year, month) / f"part-{run_id}.parquet"
+        write_parquet_atomic(path, part, compact=compact)
+        written.append(path)
+    # Only the new fragments are scanned into the sidecars.
+    refresh_raw_sidecars(dataset_dir)
+    return sorted(written)
+
+
+def refresh_raw_sidecars(dataset_dir: Path) -> None:
+    """
+    Bring the manifest and the key index in line with the data files.
+
+    Both merge new files incrementally and rebuild after full rewrites.
+    """
+    refresh_manifest(dataset_dir)
+    refresh_key_index(dataset_dir)
+
+
+def clear_raw_fragments(dataset_dir: Path) -> int:
+    """
+    Remove all year=/month= fragments and Stooq symbol buckets, leaving the base file in place.
+
+    Used by full rebuilds of the base snapshot, which already contain every
+    previously appended row. The Stooq file manifest is left alone: with its
+    buckets gone it no longer loads, and initial_ingest --incremental
+    rebuilds the buckets without touching the base file's other rows.
+    Returns the number of partition folders removed.
+    """
+    if not dataset_dir.is_dir():
+        return 0
+    removed = 0
+    for part_dir in sorted(dataset_dir.glob("year=*")) + [dataset_dir / STOOQ_BUCKET_DIR_NAME]:
+        if part_dir.is_dir():
+            shutil.rmtree(part_dir)
+            removed += 1
+    return removed
+
+
+class RowGroupBufferedWriter:
+    """
+    ParquetWriter wrapper that coalesces many small tables into large row groups.
+
+    Tables are buffered in memory and flushed whenever the buffer reaches
+    row_group_rows, so per-file writes (one tiny table per Stooq TXT file)
+    no longer turn into thousands of tiny row groups. compact=True stores
+    the compact schema (see compact_raw_schema) with zstd/byte-stream-split.
+    """
+
+    def __init__(
+        self,
+        path: Path | str,
+        schema: pa.Schema,
+        row_group_rows: int = DEFAULT_ROW_GROUP_ROWS,
+        compression: str | None = None,
+        compact: bool = False,
+    ) -> None:
+        if row_group_rows <= 0:
+            raise ValueError("row_group_rows must be a positive integer.")
+        if compact:
+            schema = compact_raw_schema(schema)
+        self.compact = compact
+        self.schema = schema
+        self.row_group_rows = row_group_rows
+        self.rows_written = 0
+        self.row_groups_written = 0
+        self._buffer: list[pa.Table] = []
+        self._buffered_rows = 0
+        options = parquet_write_options(schema, compact)
+        if compression is not None:
+            options["compression"] = compression
+        self._writer = pq.ParquetWriter(str(path), schema, **options)
+
+    def write_table(self, table: pa.Table) -> None:
+        if table.num_rows == 0:
+            return
+        if table.schema != self.schema:
+            table = table.select(self.schema.names)
+            if self.compact:
+                table = to_compact_table(table)
+            table = table.cast(self.schema)
+        self._buffer.append(table)
+        self._buffered_rows += table.num_rows
+        while self._buffered_rows >= self.row_group_rows:
+            self._flush(self.row_group_rows)
+
+    def _flush(self, max_rows: int) -> None:
+        combined = pa.concat_tables(self._buffer)
+        head = combined.slice(0, max_rows)
+        tail = combined.slice(max_rows)
+        self._writer.write_table(head, row_group_size=max_rows)
+        self.rows_written += head.num_rows
+        self.row_groups_written += 1
+        self._buffer = [tail] if tail.num_rows else []
+        self._buffered_rows = tail.num_rows
+
+    def flush(self) -> None:
+        """Write whatever is buffered as a final (possibly short) row group."""
+        if self._buffered_rows:
+            self._flush(self._buffered_rows)
+
+    def close(self) -> None:
+        try:
+            self.flush()
+        finally:
+            self._writer.close()
+
+    def __enter__(self) -> "RowGroupBufferedWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
@@ -0,0 +1,47 @@
+from __future__ import annotations
+
+"""
+Raw-schema test rows shared by the storage, loader and database tests.
+"""
+
+from datetime import date, datetime, timezone
+from typing import Sequence
+
+import pandas as pd
+import pyarrow as pa
+
+INGESTED_AT = datetime(2026, 4, 1, 12, tzinfo=timezone.utc)
+
+# (symbol_raw, payload_date, price); the price fills open/high/low/close.
+RawRow = tuple[str | None, date | str | None, float | None]
+
+
+def raw_table(
+    rows: Sequence[RawRow],
+    source_system: str = "test",
+    run_id: str = "test_run",
+    volume: float = 1000.0,
+    date_type: pa.DataType = pa.date32(),
+) -> pa.Table:
+    """Raw dataset rows; pass date_type=pa.string() for string payload dates."""
+    n = len(rows)
+    prices = pa.array([r[2] for r in rows], pa.float64())
+    return pa.table(
+        {
+            "source_system": pa.array([source_system] * n, pa.string()),
+            "ingestion_run_id": pa.array([run_id] * n, pa.string()),
+            "ingested_at": pa.array([INGESTED_AT] * n, pa.timestamp("us", tz="UTC")),
+            "symbol_raw": pa.array([r[0] for r in rows], pa.string()),
+            "payload_date": pa.array([r[1] for r in rows], date_type),
+            "open_raw": prices,
+            "high_raw": prices,
+            "low_raw": prices,
+            "close_raw": prices,
+            "volume_raw": pa.array([volume] * n, pa.float64()),
+        }
+    )
+
+
+def raw_frame(rows: Sequence[RawRow], **kwargs) -> pd.DataFrame:
+    """raw_table as a DataFrame (missing prices become NaN)."""
+    return raw_table(rows, **kwargs).to_pandas()
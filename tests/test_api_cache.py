@@ -0,0 +1,51 @@
+from __future__ import annotations
+
+import os
+import tempfile
+import unittest
+from datetime import date, datetime
+from pathlib import Path
+
+from src.utils.api_cache import ResponseCache
+
+
+class TestResponseCache(unittest.TestCase):
+    def setUp(self) -> None:
+        self._tmp = tempfile.TemporaryDirectory()
+        self.now = datetime(2026, 4, 10, 18, 0).timestamp()
+        self.cache = ResponseCache(Path(self._tmp.name), today_ttl_seconds=600, clock=lambda: self.now)
+
+    def tearDown(self) -> None:
+        self._tmp.cleanup()
+
+    def _put(self, url: str, written_at: float) -> None:
+        path = self.cache.put(url, {"apiKey": "secret", "limit": 5000}, b'{"results":[]}')
+        os.utime(path, (written_at, written_at))
+
+    def test_key_ignores_credentials_and_param_order(self) -> None:
+        a = ResponseCache.key("https://x/v2/aggs", {"apiKey": "one", "limit": 5000, "sort": "asc"})
+        b = ResponseCache.key("https://x/v2/aggs", {"sort": "asc", "limit": "5000", "apiKey": "two"})
+        self.assertEqual(a, b)
+        self.assertNotEqual(a, ResponseCache.key("https://x/v2/aggs", {"limit": 10}))
+
+    def test_past_dates_are_immutable(self) -> None:
+        self._put("https://x/day", self.now - 30 * 86400)
+        body = self.cache.get("https://x/day", {"limit": 5000, "apiKey": "other"}, date(2026, 3, 2))
+        self.assertEqual(body, b'{"results":[]}')
+
+    def test_same_day_responses_expire(self) -> None:
+        self._put("https://x/today", self.now - 60)
+        self.assertIsNotNone(self.cache.get("https://x/today", {"limit": 5000}, date(2026, 4, 10)))
+        self.now += 600
+        self.assertIsNone(self.cache.get("https://x/today", {"limit": 5000}, date(2026, 4, 10)))
+
+    def test_missing_and_corrupt_entries_are_misses(self) -> None:
+        self.assertIsNone(self.cache.get("https://x/none", {}, date(2026, 1, 2)))
+        path = self.cache.path("https://x/bad", {})
+        path.parent.mkdir(parents=True)
+        path.write_bytes(b"not gzip")
+        self.assertIsNone(self.cache.get("https://x/bad", {}, date(2026, 1, 2)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,58 @@
+from __future__ import annotations
+
+import json
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from src.utils import atomic_io
+from src.utils.atomic_io import atomic_open, atomic_path, write_json_atomic
+
+
+class TestAtomicIO(unittest.TestCase):
+    def setUp(self) -> None:
+        self._tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self._tmp.name)
+
+    def tearDown(self) -> None:
+        self._tmp.cleanup()
+
+    def test_write_replaces_target_and_leaves_no_temp_files(self) -> None:
+        target = self.root / "sub" / "state.json"
+        write_json_atomic(target, {"a": 1})
+        write_json_atomic(target, {"a": 2})
+
+        self.assertEqual(json.loads(target.read_text(encoding="utf-8")), {"a": 2})
+        self.assertEqual([p.name for p in target.parent.iterdir()], ["state.json"])
+
+    def test_failed_write_keeps_old_content(self) -> None:
+        target = self.root / "data.bin"
+        target.write_bytes(b"old")
+        with self.assertRaises(RuntimeError):
+            with atomic_open(target, "wb") as f:
+                f.write(b"half-written")
+                raise RuntimeError("crash")
+
+        self.assertEqual(target.read_bytes(), b"old")
+        self.assertEqual([p.name for p in self.root.iterdir()], ["data.bin"])
+
+    def test_temp_is_hidden_and_synced_before_rename(self) -> None:
+        target = self.root / "part.parquet"
+        calls: list[str] = []
+        with (
+            mock.patch.object(atomic_io, "fsync_file", side_effect=lambda p: calls.append(f"file:{Path(p).name}")),
+            mock.patch.object(atomic_io, "fsync_dir", side_effect=lambda p: calls.append("dir")),
+        ):
+            with atomic_path(target) as tmp_path:
+                self.assertTrue(tmp_path.name.startswith("."))
+                self.assertTrue(tmp_path.name.endswith(".parquet.tmp"))
+                tmp_path.write_bytes(b"x")
+                self.assertFalse(target.exists())
+
+        self.assertEqual(calls, [f"file:{tmp_path.name}", "dir"])
+        self.assertEqual(target.read_bytes(), b"x")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,170 @@
+from __future__ import annotations
+
+import json
+import os
+import sys
+import tempfile
+import unittest
+from contextlib import ExitStack
+from datetime import date, datetime, timezone
+from pathlib import Path
+from unittest import mock
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from src.ingestion import backfill_polygon
+from src.utils.price_utils import raw_row_count
+
+
+def _bars(ticker: str, days: list[str]) -> pd.DataFrame:
+    return pd.DataFrame(
+        {
+            "source_ticker": pd.Series([f"{ticker}.US"] * len(days), dtype="string"),
+            "ticker": pd.Series([ticker] * len(days), dtype="string"),
+            "date": pd.to_datetime(days),
+            "open": 1.0,
+            "high": 1.0,
+            "low": 1.0,
+            "close": 1.0,
+            "volume": 100.0,
+        }
+    )
+
+
+class TestBackfillCheckpoint(unittest.TestCase):
+    def setUp(self) -> None:
+        self._tmp = tempfile.TemporaryDirectory()
+        root = Path(self._tmp.name)
+        self.raw = root / "raw"
+        self.raw.mkdir()
+        base = pa.table(
+            {
+                "source_system": ["test"],
+                "ingestion_run_id": ["base"],
+                "ingested_at": pa.array([datetime(2026, 4, 1, tzinfo=timezone.utc)], pa.timestamp("us", tz="UTC")),
+                "symbol_raw": ["AAA.US"],
+                "payload_date": pa.array([date(2026, 3, 2)], pa.date32()),
+                "open_raw": [1.0],
+                "high_raw": [1.0],
+                "low_raw": [1.0],
+                "close_raw": [1.0],
+                "volume_raw": [100.0],
+            }
+        )
+        pq.write_table(base, self.raw / "stock_prices.parquet")
+        self.universe = root / "universe.csv"
+        self.universe.write_text("symbol\nAAA\nBBB\nCCC\n", encoding="utf-8")
+        self.checkpoint = root / "checkpoint.json"
+        self.calls: list[str] = []
+        self.fail_once = {"CCC"}
+        self.fail_grouped_once: set[date] = set()
+
+    def tearDown(self) -> None:
+        self._tmp.cleanup()
+
+    def _fake_fetch(self, ticker: str, start: date, end: date, limiter=None) -> pd.DataFrame:
+        self.calls.append(ticker)
+        if ticker in self.fail_once:
+            self.fail_once.discard(ticker)
+            raise RuntimeError("Polygon aggregates returned 500")
+        if ticker == "BBB":
+            return _bars(ticker, [])
+        return _bars(ticker, ["2026-03-02", "2026-03-03"])
+
+    def _fake_grouped(self, day: date, tickers: list[str], limiter=None) -> pd.DataFrame:
+        self.calls.append(f"grouped:{day}")
+        if day in self.fail_grouped_once:
+            self.fail_grouped_once.discard(day)
+            raise RuntimeError("Polygon grouped daily returned 500")
+        frames = [_bars(t, [day.isoformat()]) for t in sorted(tickers) if t != "BBB"]
+        df = pd.concat(frames, ignore_index=True)
+        df["date"] = pd.Timestamp(day)
+        return df
+
+    def _run(self, strategy: str = "ticker", *extra: str) -> None:
+        argv = [
+            "backfill_polygon",
+            "--strategy", strategy,
+            "--requests-per-minute", "0",
+            "--workers", "2",
+            "--flush-rows", "1",
+            "--checkpoint", str(self.checkpoint),
+            *(extra or ("--since", "2026-03-02", "--end", "2026-03-03")),
+        ]
+        env = {k: v for k, v in os.environ.items() if k != "SUPABASE_DB_URL"}
+        with ExitStack() as stack:
+            stack.enter_context(mock.patch.object(sys, "argv", argv))
+            stack.enter_context(mock.patch.dict(os.environ, env, clear=True))
+            stack.enter_context(mock.patch.object(backfill_polygon, "RAW_PATH", self.raw))
+            stack.enter_context(mock.patch.object(backfill_polygon, "UNIVERSE_CSV", self.universe))
+            stack.enter_context(mock.patch.object(backfill_polygon, "fetch_ticker_range", self._fake_fetch))
+            stack.enter_context(mock.patch.object(backfill_polygon, "fetch_grouped_daily", self._fake_grouped))
+            backfill_polygon.main()
+
+    def test_interrupted_backfill_resumes_failed_tickers_only(self) -> None:
+        self._run()
+        self.assertEqual(sorted(self.calls), ["AAA", "BBB", "CCC"])
+        state = json.loads(self.checkpoint.read_text(encoding="utf-8"))
+        self.assertEqual(state["done"], {"AAA": 2, "BBB": 0})
+        # AAA 2026-03-02 already existed in the base file.
+        self.assertEqual(raw_row_count(self.raw), 2)
+
+        self.calls.clear()
+        self._run()
+        self.assertEqual(self.calls, ["CCC"])
+        self.assertFalse(self.checkpoint.exists())
+        self.assertEqual(raw_row_count(self.raw), 4)
+
+    def test_grouped_plan_fetches_one_request_per_day(self) -> None:
+        self.fail_once.clear()
+        self._run(strategy="auto")
+        self.assertEqual(sorted(self.calls), ["grouped:2026-03-02", "grouped:2026-03-03"])
+        # AAA and CCC for two days, minus the AAA row already in the base file.
+        self.assertEqual(raw_row_count(self.raw), 4)
+
+    def test_resume_replays_a_failed_middle_grouped_day(self) -> None:
+        self.fail_grouped_once = {date(2026, 3, 4)}
+        self._run("grouped", "--tickers", "AAA", "--end", "2026-03-05")
+        self.assertEqual(
+            sorted(self.calls), ["grouped:2026-03-03", "grouped:2026-03-04", "grouped:2026-03-05"]
+        )
+        # 2026-03-05 is on disk, so the manifest alone would call AAA up to date.
+        self.assertEqual(raw_row_count(self.raw), 3)
+
+        self.calls.clear()
+        self._run("grouped", "--tickers", "AAA", "--end", "2026-03-05")
+        self.assertEqual(self.calls, ["grouped:2026-03-04"])
+        self.assertFalse(self.checkpoint.exists())
+        self.assertEqual(raw_row_count(self.raw), 4)
+
+
+class TestBackfillPlanner(unittest.TestCase):
+    def test_recent_gaps_use_grouped_daily_and_long_gaps_use_aggregates(self) -> None:
+        end = date(2026, 4, 10)  # Friday
+        gaps = {f"T{i}": date(2026, 4, 8) for i in range(20)}
+        gaps["NEW"] = date(2020, 1, 1)
+        plan = backfill_polygon.plan_backfill(gaps, end)
+
+        self.assertEqual(plan["grouped_dates"], [date(2026, 4, 8), date(2026, 4, 9), date(2026, 4, 10)])
+        self.assertEqual(set(plan["ticker_jobs"]), {"NEW"})
+        self.assertEqual(plan["requests"], 4)
+        self.assertEqual(plan["per_ticker_requests"], 21)
+
+    def test_few_tickers_stay_per_ticker_and_weekends_are_skipped(self) -> None:
+        end = date(2026, 4, 13)  # Monday
+        plan = backfill_polygon.plan_backfill({"A": date(2026, 4, 10), "B": date(2026, 4, 1)}, end)
+        self.assertIsNone(plan["cutoff"])
+        self.assertEqual(plan["requests"], 2)
+
+        grouped = backfill_polygon.plan_backfill({"A": date(2026, 4, 10)}, end, strategy="grouped")
+        self.assertEqual(grouped["grouped_dates"], [date(2026, 4, 10), date(2026, 4, 13)])
+
+    def test_wall_time_estimate_follows_rate_limit(self) -> None:
+        self.assertEqual(backfill_polygon.estimate_wall_seconds(11, 5, 1, 4), 121.0)
+        self.assertEqual(backfill_polygon.estimate_wall_seconds(8, 0, 1, 4), 2.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,81 @@
+from __future__ import annotations
+
+import tempfile
+import unittest
+from datetime import date
+from pathlib import Path
+
+import pandas as pd
+import pyarrow.parquet as pq
+
+from src.transform.build_universe_price_store import STORE_SCHEMA, refresh_universe_store, to_store_table
+from src.utils.raw_store import append_raw_fragment
+from tests.raw_rows import raw_table
+
+
+def _normalized(rows: list[tuple[str, str, float]]) -> pd.DataFrame:
+    return pd.DataFrame(
+        {
+            "source_ticker": [r[0] for r in rows],
+            "ticker": [r[0].removesuffix(".US") for r in rows],
+            "date": pd.to_datetime([r[1] for r in rows]),
+            "open": [r[2] for r in rows],
+            "high": [r[2] for r in rows],
+            "low": [r[2] for r in rows],
+            "close": [r[2] for r in rows],
+            "volume": [100.0] * len(rows),
+        }
+    )
+
+
+class TestUniversePriceStore(unittest.TestCase):
+    def test_store_table_is_typed_sorted_and_deduplicated(self) -> None:
+        prices = _normalized(
+            [
+                ("MSFT.US", "2026-03-02", 400.0),
+                ("AAPL.US", "2026-03-03", 251.0),
+                ("AAPL.US", "2026-03-02", 250.0),
+                ("AAPL.US", "2026-03-03", 252.0),
+            ]
+        )
+        table = to_store_table(prices)
+
+        self.assertEqual(table.schema, STORE_SCHEMA)
+        self.assertEqual(table["source_ticker"].to_pylist(), ["AAPL.US", "AAPL.US", "MSFT.US"])
+        self.assertEqual(table["date"].to_pylist(), [date(2026, 3, 2), date(2026, 3, 3), date(2026, 3, 2)])
+        # Later duplicates win.
+        self.assertEqual(table["close"].to_pylist(), [250.0, 252.0, 400.0])
+
+    def test_refresh_reads_only_new_fragments(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            raw = Path(tmp) / "raw"
+            raw.mkdir()
+            store = Path(tmp) / "universe_prices.parquet"
+            pq.write_table(
+                raw_table([("AAPL.US", date(2026, 3, 2), 250.0), ("ZZZZ.US", date(2026, 3, 2), 1.0)]),
+                raw / "stock_prices.parquet",
+            )
+            universe = {"AAPL.US"}
+
+            self.assertEqual(refresh_universe_store(store, raw, universe)["mode"], "rebuilt")
+            self.assertEqual(refresh_universe_store(store, raw, universe), {"mode": "unchanged", "files_read": 0, "rows": 0})
+
+            append_raw_fragment(
+                raw, raw_table([("AAPL.US", date(2026, 3, 3), 251.0), ("ZZZZ.US", date(2026, 3, 3), 1.0)]), "daily_1"
+            )
+            stats = refresh_universe_store(store, raw, universe)
+            self.assertEqual(stats, {"mode": "merged", "files_read": 1, "rows": 1})
+            table = pq.read_table(store)
+            self.assertEqual(table["date"].to_pylist(), [date(2026, 3, 2), date(2026, 3, 3)])
+            self.assertEqual(set(table["source_ticker"].to_pylist()), {"AAPL.US"})
+            self.assertEqual(refresh_universe_store(store, raw, universe)["mode"], "unchanged")
+
+            # A changed universe or a rewritten raw file falls back to a full rebuild.
+            self.assertEqual(refresh_universe_store(store, raw, {"AAPL.US", "MSFT.US"})["mode"], "rebuilt")
+            pq.write_table(raw_table([("AAPL.US", date(2026, 3, 2), 260.0)]), raw / "stock_prices.parquet")
+            stats = refresh_universe_store(store, raw, {"AAPL.US", "MSFT.US"})
+            self.assertEqual(stats["mode"], "rebuilt")
+            self.assertEqual(pq.read_table(store)["close"].to_pylist(), [260.0, 251.0])
+
+if __name__ == "__main__":
+    unittest.main()
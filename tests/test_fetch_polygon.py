@@ -0,0 +1,172 @@
+from __future__ import annotations
+
+import json
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import pandas as pd
+import requests
+
+from src.ingestion import fetch_polygon
+
+
+def _payload(symbols: list[str]) -> bytes:
+    results = [
+        {"T": s, "v": 100.0 + i, "vw": 1.0, "o": 1.0, "c": 2.0 + i, "h": 3.0, "l": 0.5, "t": 1775001600000, "n": 5}
+        for i, s in enumerate(symbols)
+    ]
+    body = {"queryCount": len(results), "resultsCount": len(results), "adjusted": True, "results": results}
+    body.update({"status": "OK", "request_id": "abc", "count": len(results)})
+    return json.dumps(body).encode()
+
+
+def _chunks(data: bytes, size: int) -> list[bytes]:
+    return [data[i : i + size] for i in range(0, len(data), size)]
+
+
+class _FakeResponse:
+    def __init__(self, status_code: int, body: bytes = b"", headers: dict | None = None) -> None:
+        self.status_code = status_code
+        self.body = body
+        self.headers = headers or {}
+        self.closed = False
+
+    @property
+    def text(self) -> str:
+        return self.body.decode()
+
+    def iter_content(self, chunk_size: int) -> list[bytes]:
+        return _chunks(self.body, 7)
+
+    def close(self) -> None:
+        self.closed = True
+
+
+class TestStreamingDecode(unittest.TestCase):
+    def test_filters_while_decoding_across_chunk_boundaries(self) -> None:
+        body = _payload(["AAPL", "ZZZZ", "BRK.B", "MSFT"])
+        for size in (1, 5, 64, len(body)):
+            columns = fetch_polygon._decode_results(_chunks(body, size), {"aapl", "BRK.B"})
+            self.assertEqual(columns["T"], ["AAPL", "BRK.B"])
+            self.assertEqual(columns["c"], [2.0, 4.0])
+
+    def test_empty_envelope_has_no_rows(self) -> None:
+        body = b'{"queryCount":0,"resultsCount":0,"adjusted":true,"status":"OK","request_id":"x"}'
+        self.assertEqual(fetch_polygon._decode_results([body])["t"], [])
+
+    def test_build_df_keeps_schema(self) -> None:
+        df = fetch_polygon._build_df(fetch_polygon._decode_results([_payload(["AAPL", "BRK.B"])]))
+        self.assertEqual(
+            df.columns.tolist(), ["source_ticker", "ticker", "date", "open", "high", "low", "close", "volume"]
+        )
+        self.assertEqual(df["ticker"].tolist(), ["AAPL", "BRK.B"])
+        self.assertEqual(str(df["date"].iloc[0].date()), "2026-04-01")
+
+    def test_build_table_types_missing_values(self) -> None:
+        columns = {"T": [" brk.b", None], "t": [1775001600000, None], "o": [1.5, None], "h": [2, 2.0]}
+        columns.update({"l": [1.0, 1.0], "c": ["2.5", None], "v": [100, 200]})
+        table = fetch_polygon._build_table(columns)
+        self.assertEqual(table.schema, fetch_polygon.POLYGON_SCHEMA)
+        self.assertEqual(table["ticker"].to_pylist(), ["BRK.B", ""])
+        self.assertEqual(table["date"].null_count, 1)
+        self.assertEqual(table["close"].to_pylist()[0], 2.5)
+        self.assertTrue(pd.isna(table["open"].to_pylist()[1]))
+
+
+class TestRetries(unittest.TestCase):
+    def test_retries_429_and_5xx_then_succeeds(self) -> None:
+        responses = [
+            _FakeResponse(429, headers={"Retry-After": "2"}),
+            _FakeResponse(503),
+            _FakeResponse(200, _payload(["AAPL"])),
+        ]
+        session = mock.Mock()
+        session.get.side_effect = responses
+        with (
+            mock.patch.object(fetch_polygon, "_http", return_value=session),
+            mock.patch.object(fetch_polygon.time, "sleep") as sleep,
+            mock.patch.dict("os.environ", {"POLYGON_API_KEY": "test"}),
+        ):
+            df = fetch_polygon.fetch_grouped_daily("2026-04-01", tickers=["AAPL"])
+
+        self.assertEqual(len(df), 1)
+        self.assertEqual(session.get.call_count, 3)
+        self.assertEqual(sleep.call_args_list[0].args, (2.0,))
+        self.assertTrue(responses[0].closed and responses[1].closed)
+
+    def test_every_retry_takes_a_limiter_token(self) -> None:
+        session = mock.Mock()
+        session.get.side_effect = [_FakeResponse(429), _FakeResponse(502), _FakeResponse(200, _payload(["AAPL"]))]
+        limiter = mock.Mock()
+        with (
+            mock.patch.object(fetch_polygon, "_http", return_value=session),
+            mock.patch.object(fetch_polygon.time, "sleep"),
+            mock.patch.dict("os.environ", {"POLYGON_API_KEY": "test"}),
+        ):
+            fetch_polygon.fetch_grouped_daily("2026-04-01", tickers=["AAPL"], limiter=limiter)
+
+        self.assertEqual(limiter.acquire.call_count, session.get.call_count)
+        self.assertEqual(session.get.call_count, 3)
+
+    def test_gives_up_after_max_retries(self) -> None:
+        session = mock.Mock()
+        session.get.side_effect = requests.ConnectionError("down")
+        with (
+            mock.patch.object(fetch_polygon, "_http", return_value=session),
+            mock.patch.object(fetch_polygon.time, "sleep"),
+            self.assertRaises(requests.ConnectionError),
+        ):
+            fetch_polygon._get("https://example.invalid", {})
+        self.assertEqual(session.get.call_count, fetch_polygon.MAX_RETRIES + 1)
+
+
+class TestResponseCache(unittest.TestCase):
+    def test_second_fetch_is_served_from_disk_without_rate_limit(self) -> None:
+        session = mock.Mock()
+        session.get.side_effect = [_FakeResponse(200, _payload(["AAPL", "MSFT"]))]
+        limiter = mock.Mock()
+        with (
+            tempfile.TemporaryDirectory() as tmp,
+            mock.patch.object(fetch_polygon, "_cache_configured", False),
+            mock.patch.object(fetch_polygon, "_cache", None),
+            mock.patch.object(fetch_polygon, "_http", return_value=session),
+            mock.patch.dict("os.environ", {"POLYGON_API_KEY": "test", fetch_polygon.API_CACHE_ENV: tmp}),
+        ):
+            first = fetch_polygon.fetch_grouped_daily("2026-04-01", tickers=["AAPL"], limiter=limiter)
+            second = fetch_polygon.fetch_grouped_daily("2026-04-01", tickers=["MSFT"], limiter=limiter)
+            self.assertEqual(len(list(Path(tmp).rglob("*.json.gz"))), 1)
+
+        self.assertEqual(session.get.call_count, 1)
+        self.assertEqual(limiter.acquire.call_count, 1)
+        self.assertEqual(first["ticker"].tolist(), ["AAPL"])
+        self.assertEqual(second["ticker"].tolist(), ["MSFT"])
+
+
+    def test_empty_result_sets_are_not_cached(self) -> None:
+        session = mock.Mock()
+        session.get.side_effect = [
+            _FakeResponse(200, json.dumps({"resultsCount": 0, "status": "OK"}).encode()),
+            _FakeResponse(200, _payload([])),
+            _FakeResponse(200, _payload(["AAPL"])),
+        ]
+        with (
+            tempfile.TemporaryDirectory() as tmp,
+            mock.patch.object(fetch_polygon, "_cache_configured", False),
+            mock.patch.object(fetch_polygon, "_cache", None),
+            mock.patch.object(fetch_polygon, "_http", return_value=session),
+            mock.patch.dict("os.environ", {"POLYGON_API_KEY": "test", fetch_polygon.API_CACHE_ENV: tmp}),
+        ):
+            # Not published yet, twice: each call goes back to the API.
+            self.assertTrue(fetch_polygon.fetch_grouped_daily("2026-04-01").empty)
+            self.assertTrue(fetch_polygon.fetch_grouped_daily("2026-04-01").empty)
+            self.assertEqual(list(Path(tmp).rglob("*.json.gz")), [])
+            self.assertEqual(fetch_polygon.fetch_grouped_daily("2026-04-01")["ticker"].tolist(), ["AAPL"])
+            self.assertEqual(fetch_polygon.fetch_grouped_daily("2026-04-01")["ticker"].tolist(), ["AAPL"])
+
+        self.assertEqual(session.get.call_count, 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
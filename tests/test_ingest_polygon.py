@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+import os
+import sys
+import tempfile
+import unittest
+from contextlib import ExitStack
+from datetime import date, datetime, timezone
+from pathlib import Path
+from unittest import mock
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from scripts.polygon_stub_server import PolygonStub
+from src.ingestion import fetch_polygon, ingest_polygon
+from src.utils.price_utils import raw_row_count
+
+
+class _Wednesday(date):
+    @classmethod
+    def today(cls) -> date:
+        return date(2026, 4, 8)
+
+
+class TestCatchUp(unittest.TestCase):
+    def test_missing_trading_days_skip_weekends_and_respect_cap(self) -> None:
+        days = ingest_polygon._missing_trading_days(date(2026, 4, 2), date(2026, 4, 8), 10)
+        self.assertEqual(days, [date(2026, 4, 3), date(2026, 4, 6), date(2026, 4, 7), date(2026, 4, 8)])
+        # Oldest first: the next run continues after the last stored day.
+        self.assertEqual(ingest_polygon._missing_trading_days(date(2026, 4, 2), date(2026, 4, 8), 2), days[:2])
+        self.assertEqual(ingest_polygon._missing_trading_days(date(2026, 4, 8), date(2026, 4, 8), 10), [])
+
+    def test_contiguous_days_stop_at_rejected_and_trailing_empty_days(self) -> None:
+        data, empty = pd.DataFrame({"x": [1]}), pd.DataFrame()
+        d = [date(2026, 4, day) for day in (3, 6, 7, 8)]
+
+        kept = ingest_polygon._contiguous_days([(d[0], data), (d[1], None), (d[2], data), (d[3], data)])
+        self.assertEqual([day for day, _ in kept], d[:1])
+        # An empty day before a day with data is a holiday; trailing empty days are not published yet.
+        kept = ingest_polygon._contiguous_days([(d[0], empty), (d[1], data), (d[2], empty), (d[3], empty)])
+        self.assertEqual([day for day, _ in kept], d[:2])
+
+    def _ingest(self, stub: PolygonStub, root: Path, *extra: str) -> Path:
+        raw = root / "raw"
+        if not raw.exists():
+            raw.mkdir()
+            base = pa.table(
+                {
+                    "source_system": ["test"],
+                    "ingestion_run_id": ["base"],
+                    "ingested_at": pa.array([datetime(2026, 4, 2, tzinfo=timezone.utc)], pa.timestamp("us", tz="UTC")),
+                    "symbol_raw": ["AAA.US"],
+                    "payload_date": pa.array([date(2026, 4, 2)], pa.date32()),
+                    "open_raw": [1.0],
+                    "high_raw": [1.0],
+                    "low_raw": [1.0],
+                    "close_raw": [1.0],
+                    "volume_raw": [100.0],
+                }
+            )
+            pq.write_table(base, raw / "stock_prices.parquet")
+        universe = root / "universe.csv"
+        universe.write_text("symbol\nAAA\nBBB\n", encoding="utf-8")
+
+        env = {k: v for k, v in os.environ.items() if k != "SUPABASE_DB_URL"}
+        env.update({fetch_polygon.BASE_URL_ENV: stub.base_url, "POLYGON_API_KEY": "stub"})
+        argv = ["ingest_polygon", "--requests-per-minute", "0", *extra]
+        with ExitStack() as stack:
+            stack.enter_context(mock.patch.object(sys, "argv", argv))
+            stack.enter_context(mock.patch.dict(os.environ, env, clear=True))
+            stack.enter_context(mock.patch.object(fetch_polygon, "_cache_configured", True))
+            stack.enter_context(mock.patch.object(fetch_polygon, "_cache", None))
+            stack.enter_context(mock.patch.object(ingest_polygon, "date", _Wednesday))
+            stack.enter_context(mock.patch.object(ingest_polygon, "RAW_PATH", raw))
+            stack.enter_context(mock.patch.object(ingest_polygon, "UNIVERSE_CSV", universe))
+            ingest_polygon.main()
+        return raw
+
+    def test_missed_days_are_written_in_one_append(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp, PolygonStub(symbols=["AAA", "BBB", "ZZZ"]) as stub:
+            raw = self._ingest(stub, Path(tmp))
+
+            self.assertEqual(stub.stats["requests"], 4)
+            # Two universe tickers on four missed trading days; ZZZ is outside the universe.
+            self.assertEqual(raw_row_count(raw), 1 + 8)
+            self.assertEqual(len(list(raw.glob("year=*/month=*/*.parquet"))), 1)
+
+    def test_gap_longer_than_max_days_is_caught_up_oldest_first(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp, PolygonStub(symbols=["AAA", "BBB"]) as stub:
+            raw = self._ingest(stub, Path(tmp), "--max-days", "3")
+            self.assertEqual(stub.stats["requests"], 3)
+            self.assertEqual(ingest_polygon._global_max_date(raw, {"AAA.US", "BBB.US"}), date(2026, 4, 7))
+
+            # The next run picks up exactly the day left over.
+            self._ingest(stub, Path(tmp), "--max-days", "3")
+            self.assertEqual(stub.stats["requests"], 4)
+            self.assertEqual(raw_row_count(raw), 1 + 8)
+
+
+if __name__ == "__main__":
+    unittest.main()
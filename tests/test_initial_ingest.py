@@ -0,0 +1,222 @@
+from __future__ import annotations
+
+import json
+import tempfile
+import unittest
+from datetime import date, datetime, timezone
+from pathlib import Path
+from unittest import mock
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from src.ingestion import initial_ingest
+from src.ingestion.compact_raw import compact_raw_dataset
+from src.utils.price_utils import open_price_dataset
+from src.utils.raw_store import STOOQ_FILE_MANIFEST_NAME, append_raw_fragment, is_compact_schema
+from tests.raw_rows import raw_table
+
+HEADER = "<TICKER>,<PER>,<DATE>,<TIME>,<OPEN>,<HIGH>,<LOW>,<CLOSE>,<VOL>,<OPENINT>\n"
+
+
+def _txt(ticker: str, days: int) -> str:
+    rows = [f"{ticker},D,202601{d + 1:02d},000000,1.0,2.0,0.5,1.5,{100 + d},0\n" for d in range(days)]
+    return HEADER + "".join(rows)
+
+
+class TestParallelInitialIngest(unittest.TestCase):
+    def _ingest(self, root: Path, workers: int) -> tuple[pd.DataFrame, pd.DataFrame, int]:
+        out_dir = root / f"out_{workers}"
+        failed_dir = root / f"failed_{workers}"
+        output = out_dir / "stock_prices.parquet"
+        with mock.patch.object(initial_ingest, "FAILED_DIR", failed_dir):
+            initial_ingest.run_ingestion(root / "input", output, row_group_rows=5, workers=workers)
+        table = pq.read_table(output).drop_columns(["ingestion_run_id", "ingested_at"]).to_pandas()
+        failed = pd.read_csv(next(failed_dir.glob("*.csv")))
+        return table, failed, pq.ParquetFile(output).metadata.num_row_groups
+
+    def test_process_pool_matches_sequential_output_and_failed_log(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            src = root / "input" / "nasdaq stocks"
+            src.mkdir(parents=True)
+            for i in range(6):
+                (src / f"t{i}.us.txt").write_text(_txt(f"T{i}.US", 3), encoding="utf-8")
+            (src / "bad.us.txt").write_text("<TICKER>,<DATE>\nBAD.US,20260101\n", encoding="utf-8")
+            (src / "weekly.us.txt").write_text(_txt("W.US", 2).replace(",D,", ",W,"), encoding="utf-8")
+
+            sequential, seq_failed, _ = self._ingest(root, workers=1)
+            parallel, par_failed, row_groups = self._ingest(root, workers=3)
+
+        pd.testing.assert_frame_equal(sequential, parallel)
+        self.assertEqual(len(parallel), 18)
+        self.assertEqual(row_groups, 4)  # 18 rows coalesced into row groups of 5
+        cols = ["file_path", "error_message"]
+        pd.testing.assert_frame_equal(seq_failed[cols], par_failed[cols])
+        self.assertEqual(
+            par_failed["error_message"].tolist(),
+            ["missing columns: ['close', 'high', 'low', 'open', 'vol']", "no daily rows in file"],
+        )
+
+
+class TestArrowParser(unittest.TestCase):
+    def setUp(self) -> None:
+        self._tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self._tmp.name)
+        self.ingested_at = datetime(2026, 4, 1, tzinfo=timezone.utc)
+
+    def tearDown(self) -> None:
+        self._tmp.cleanup()
+
+    def _pandas_table(self, path: Path) -> pa.Table:
+        raw_df = initial_ingest.to_raw_schema(initial_ingest.parse_txt_file(path), "run", self.ingested_at)
+        return pa.Table.from_pandas(raw_df, preserve_index=False).cast(initial_ingest.RAW_TABLE_SCHEMA)
+
+    def test_matches_pandas_parser(self) -> None:
+        path = self.root / "aapl.us.txt"
+        body = _txt(" aapl.us", 4).replace(",W,", ",D,") + "AAPL.US,W,20260110,000000,1,1,1,1,1,0\n"
+        # A blank volume is dropped by both parsers.
+        path.write_text(body + "AAPL.US,D,20260111,000000,1,1,1,1,,0\n", encoding="utf-8")
+        arrow = initial_ingest.read_txt_file_arrow(path, "run", self.ingested_at)
+        self.assertEqual(arrow.schema, initial_ingest.RAW_TABLE_SCHEMA)
+        self.assertTrue(arrow.equals(self._pandas_table(path)))
+        self.assertEqual(arrow["symbol_raw"].to_pylist(), ["AAPL.US"] * 4)
+
+    def test_missing_and_blank_tickers_are_dropped_by_both_parsers(self) -> None:
+        path = self.root / "nvda.us.txt"
+        path.write_text(_txt("NVDA.US", 2) + ",D,20260103,000000,1,1,1,1,1,0\n   ,D,20260104,000000,1,1,1,1,1,0\n")
+        arrow = initial_ingest.read_txt_file_arrow(path, "run", self.ingested_at)
+        self.assertTrue(arrow.equals(self._pandas_table(path)))
+        self.assertEqual(arrow["symbol_raw"].to_pylist(), ["NVDA.US"] * 2)
+
+        # A file of only blank tickers fails the same way on either path.
+        path.write_text(HEADER + ",D,20260103,000000,1,1,1,1,1,0\n")
+        with self.assertRaisesRegex(ValueError, "no valid rows after type conversion"):
+            initial_ingest.read_txt_file_arrow(path, "run", self.ingested_at)
+        with self.assertRaisesRegex(ValueError, "no valid rows after type conversion"):
+            initial_ingest.parse_txt_file(path)
+
+    def test_malformed_values_fall_back_to_pandas(self) -> None:
+        path = self.root / "msft.us.txt"
+        path.write_text(_txt("MSFT.US", 3).replace("1.0,2.0", "1.0x,2.0", 1), encoding="utf-8")
+        with self.assertRaises(pa.ArrowInvalid):
+            initial_ingest.read_txt_file_arrow(path, "run", self.ingested_at)
+        table, error = initial_ingest.ingest_file(path, "run", self.ingested_at)
+        self.assertIsNone(error)
+        self.assertTrue(table.equals(self._pandas_table(path)))
+        self.assertEqual(table.num_rows, 2)
+
+
+class TestIncrementalIngest(unittest.TestCase):
+    def setUp(self) -> None:
+        self._tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self._tmp.name)
+        self.input = self.root / "input"
+        self.input.mkdir()
+        for i in range(8):
+            self._write(f"t{i}.us.txt", _txt(f"T{i}.US", 3))
+        self.dataset = self.root / "raw"
+        patch = mock.patch.object(initial_ingest, "FAILED_DIR", self.root / "failed")
+        patch.start()
+        self.addCleanup(patch.stop)
+
+    def tearDown(self) -> None:
+        self._tmp.cleanup()
+
+    def _write(self, name: str, body: str) -> None:
+        (self.input / name).write_text(body, encoding="utf-8")
+
+    def _run(self) -> dict[str, int]:
+        return initial_ingest.run_incremental_ingestion(self.input, self.dataset, buckets=4)
+
+    def _fragments(self) -> set[Path]:
+        return set(self.dataset.glob("source=stooq/bucket=*/*.parquet"))
+
+    def _rows(self, path: Path) -> pd.DataFrame:
+        table = open_price_dataset(path).to_table().drop_columns(["ingestion_run_id", "ingested_at"])
+        return table.to_pandas().sort_values(["symbol_raw", "payload_date"]).reset_index(drop=True)
+
+    def test_rerun_parses_only_changed_files_and_matches_full_rebuild(self) -> None:
+        first = self._run()
+        self.assertEqual((first["parsed_files"], first["rows_written"]), (8, 24))
+        self.assertTrue((self.dataset / STOOQ_FILE_MANIFEST_NAME).exists())
+
+        before = self._fragments()
+        unchanged = self._run()
+        self.assertEqual((unchanged["parsed_files"], unchanged["buckets_rewritten"]), (0, 0))
+        self.assertEqual(self._fragments(), before)
+
+        self._write("t0.us.txt", _txt("T0.US", 5))
+        (self.input / "t1.us.txt").unlink()
+        self._write("new.us.txt", _txt("NEW.US", 2))
+        stats = self._run()
+        self.assertEqual((stats["changed_files"], stats["deleted_files"], stats["parsed_files"]), (2, 1, 2))
+        self.assertLessEqual(stats["buckets_rewritten"], 3)
+        self.assertTrue(self._fragments() & before)
+
+        full = self.root / "full" / "stock_prices.parquet"
+        initial_ingest.run_ingestion(self.input, full)
+        pd.testing.assert_frame_equal(self._rows(self.dataset), self._rows(full))
+
+    def test_files_sharing_a_symbol_are_reparsed_together(self) -> None:
+        self._write("dup.us.txt", _txt("T2.US", 5).replace("202601", "202602"))
+        self._run()
+        self._write("t2.us.txt", _txt("T2.US", 4))
+        stats = self._run()
+        self.assertEqual((stats["changed_files"], stats["parsed_files"]), (1, 2))
+        self.assertEqual(int((self._rows(self.dataset)["symbol_raw"] == "T2.US").sum()), 9)
+
+    def test_missing_bucket_fragment_triggers_rebuild(self) -> None:
+        self._run()
+        for path in self._fragments():
+            path.unlink()
+        self.assertEqual(self._run()["parsed_files"], 8)
+
+    def test_rebuild_after_compaction_keeps_other_sources(self) -> None:
+        self._run()
+        poly = raw_table([("POLY.US", date(2026, 2, 2), 5.0)], source_system="polygon_daily")
+        append_raw_fragment(self.dataset, poly, "daily_1")
+        compact_raw_dataset(self.dataset)
+        self.assertEqual(self._fragments(), set())
+
+        stats = self._run()
+        self.assertEqual(stats["parsed_files"], 8)
+        rows = self._rows(self.dataset)
+        expected = {**{f"T{i}.US": 3 for i in range(8)}, "POLY.US": 1}
+        self.assertEqual(rows["symbol_raw"].value_counts().to_dict(), expected)
+        self.assertEqual(self._run()["parsed_files"], 0)
+
+    def test_failed_files_are_retried_on_the_next_run(self) -> None:
+        self._write("bad.us.txt", "<TICKER>,<DATE>\nBAD.US,20260101\n")
+        first = self._run()
+        self.assertEqual((first["parsed_files"], first["failed_files"]), (9, 1))
+        self.assertNotIn("bad.us.txt", json.loads((self.dataset / STOOQ_FILE_MANIFEST_NAME).read_text())["files"])
+
+        # Unchanged on disk, but still retried.
+        retry = self._run()
+        self.assertEqual((retry["changed_files"], retry["parsed_files"], retry["failed_files"]), (1, 1, 1))
+
+        self._write("bad.us.txt", _txt("BAD.US", 2))
+        fixed = self._run()
+        self.assertEqual((fixed["parsed_files"], fixed["failed_files"], fixed["rows_written"]), (1, 0, 2))
+        self.assertEqual(self._run()["parsed_files"], 0)
+        self.assertEqual(int((self._rows(self.dataset)["symbol_raw"] == "BAD.US").sum()), 2)
+
+    def test_compact_buckets_stay_compact_on_rerun(self) -> None:
+        initial_ingest.run_incremental_ingestion(self.input, self.dataset, buckets=4, compact=True)
+        self._write("t0.us.txt", _txt("T0.US", 5))
+        self.assertEqual(self._run()["parsed_files"], 1)
+
+        for path in self._fragments():
+            self.assertTrue(is_compact_schema(pq.read_schema(path)))
+        full = self.root / "full" / "stock_prices.parquet"
+        initial_ingest.run_ingestion(self.input, full)
+        compact_rows = self._rows(self.dataset).astype({"symbol_raw": str, "source_system": str})
+        # Categoricals sort by dictionary order; re-sort on the decoded strings.
+        compact_rows = compact_rows.sort_values(["symbol_raw", "payload_date"]).reset_index(drop=True)
+        pd.testing.assert_frame_equal(compact_rows, self._rows(full))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,272 @@
+from __future__ import annotations
+
+import csv
+import io
+import os
+import tempfile
+import unittest
+import uuid
+from datetime import date, datetime, timezone
+from pathlib import Path
+from unittest import mock
+from urllib.parse import quote
+
+import psycopg2
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from scripts import load_historical_to_supabase as loader
+from src.db import postgres
+from tests.raw_rows import raw_table
+
+# Point at a disposable local Postgres to run the end-to-end COPY test, e.g.
+# FINLIFY_TEST_DB_URL=postgresql://postgres@localhost/postgres
+TEST_DB_URL_ENV = "FINLIFY_TEST_DB_URL"
+
+
+RAW_ROWS = [
+    ("AAA.US", "2023-12-29", 1.0),
+    ("AAA.US", "2024-01-02", 2.0),
+    ("BBB.US", "2024-01-02", None),
+    ("ZZZ.US", "2024-01-02", 3.0),
+    ("BBB.US", None, 4.0),
+]
+
+
+def _raw_table() -> pa.Table:
+    return raw_table(RAW_ROWS, source_system="stooq", date_type=pa.string())
+
+
+class _RecordingCursor:
+    """Stands in for a psycopg2 cursor; records statements and COPY bodies."""
+
+    def __init__(self, calls: list[tuple], rowcount: int) -> None:
+        self.calls = calls
+        self.rowcount = rowcount
+
+    def execute(self, sql: str) -> None:
+        self.calls.append(("execute", sql))
+
+    def copy_expert(self, sql: str, file) -> None:
+        self.calls.append(("copy_expert", sql, file.read()))
+
+    def close(self) -> None:
+        self.calls.append(("close",))
+
+
+class _RecordingConnection:
+    def __init__(self, rowcount: int = 0) -> None:
+        self.calls: list[tuple] = []
+        self.rowcount = rowcount
+
+    def cursor(self) -> _RecordingCursor:
+        return _RecordingCursor(self.calls, self.rowcount)
+
+    def commit(self) -> None:
+        self.calls.append(("commit",))
+
+    def rollback(self) -> None:
+        self.calls.append(("rollback",))
+
+
+class TestCopyLoad(unittest.TestCase):
+    def setUp(self) -> None:
+        self._tmp = tempfile.TemporaryDirectory()
+        self.raw = Path(self._tmp.name)
+        pq.write_table(_raw_table(), self.raw / "stock_prices.parquet")
+
+    def tearDown(self) -> None:
+        self._tmp.cleanup()
+
+    def test_copy_tables_are_filtered_and_mapped(self) -> None:
+        (table,) = loader.iter_copy_tables(self.raw, "2024-01-01", {"AAA.US", "BBB.US"})
+
+        self.assertEqual(table.column_names, list(loader.STOCK_PRICES_COLUMNS))
+        self.assertEqual(table["source_ticker"].to_pylist(), ["AAA.US", "BBB.US"])
+        self.assertEqual(table["ticker"].to_pylist(), ["AAA", "BBB"])
+        self.assertEqual(table["date"].to_pylist(), [date(2024, 1, 2)] * 2)
+
+    def test_csv_encodes_nulls_for_copy(self) -> None:
+        (table,) = loader.iter_copy_tables(self.raw, "2024-01-01", {"AAA.US", "BBB.US"})
+        body = loader.encode_copy_csv(table).to_pybytes().decode()
+
+        lines = body.splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertEqual(next(csv.reader(io.StringIO(lines[0])))[:3], ["AAA.US", "AAA", "2024-01-02"])
+        # Unquoted empty fields are NULL for COPY ... (FORMAT csv).
+        self.assertIn(",,,,", lines[1])
+        self.assertTrue(lines[0].endswith("2026-04-01 12:00:00.000000Z"))
+
+    def test_copy_load_stages_copies_and_merges_per_transaction(self) -> None:
+        (table,) = loader.iter_copy_tables(self.raw, "2023-01-01", {"AAA.US", "BBB.US"})
+        tables = [table.slice(0, 2), table.slice(2)]
+        conn = _RecordingConnection(rowcount=2)
+
+        stats = loader.copy_load(conn, tables, merge_rows=2, log=lambda _: None)
+
+        self.assertEqual((stats["staged"], stats["inserted"], stats["merges"]), (3, 4, 2))
+        body = [loader.encode_copy_csv(t).to_pybytes() for t in tables]
+        self.assertEqual(conn.calls, [
+            ("execute", loader.STAGE_TABLE_SQL),
+            ("copy_expert", loader.COPY_SQL, body[0]),
+            ("execute", loader.MERGE_SQL),
+            ("commit",),
+            ("close",),
+            ("execute", loader.STAGE_TABLE_SQL),
+            ("copy_expert", loader.COPY_SQL, body[1]),
+            ("execute", loader.MERGE_SQL),
+            ("commit",),
+            ("close",),
+        ])
+        self.assertEqual(
+            loader.COPY_SQL,
+            "COPY stock_prices_stage (source_ticker, ticker, date, open, high, low, close, volume, "
+            "source_system, ingested_at) FROM STDIN WITH (FORMAT csv)",
+        )
+        self.assertIn("ON COMMIT DROP", loader.STAGE_TABLE_SQL)
+        self.assertIn("ON CONFLICT (source_ticker, date) DO NOTHING", loader.MERGE_SQL)
+
+    def test_copy_load_rolls_back_on_error(self) -> None:
+        conn = _RecordingConnection()
+
+        def tables():
+            yield from loader.iter_copy_tables(self.raw, "2023-01-01", {"AAA.US"})
+            raise RuntimeError("read failed")
+
+        with self.assertRaises(RuntimeError):
+            loader.copy_load(conn, tables(), log=lambda _: None)
+        self.assertEqual([c[0] for c in conn.calls], ["execute", "copy_expert", "rollback"])
+
+    @unittest.skipUnless(os.environ.get(TEST_DB_URL_ENV), f"set {TEST_DB_URL_ENV} to run against a local Postgres")
+    def test_copy_load_merges_into_stock_prices(self) -> None:
+        schema = f"test_{uuid.uuid4().hex[:8]}"
+        admin = psycopg2.connect(os.environ[TEST_DB_URL_ENV])
+        admin.autocommit = True
+        with admin.cursor() as cur:
+            cur.execute(f"CREATE SCHEMA {schema}")
+            cur.execute(
+                f"""
+                CREATE TABLE {schema}.stock_prices (
+                    source_ticker text NOT NULL, ticker text, date date NOT NULL,
+                    open numeric, high numeric, low numeric, close numeric, volume numeric,
+                    source_system text, ingested_at timestamptz,
+                    PRIMARY KEY (source_ticker, date)
+                )
+                """
+            )
+            cur.execute(f"INSERT INTO {schema}.stock_prices (source_ticker, date) VALUES ('AAA.US', '2024-01-02')")
+        conn = psycopg2.connect(os.environ[TEST_DB_URL_ENV], options=f"-c search_path={schema}")
+        try:
+            tables = list(loader.iter_copy_tables(self.raw, "2023-01-01", {"AAA.US", "BBB.US"}))
+            stats = loader.copy_load(conn, tables, merge_rows=1, log=lambda _: None)
+            self.assertEqual((stats["staged"], stats["inserted"]), (3, 2))
+            self.assertEqual(loader.copy_load(conn, tables, log=lambda _: None)["inserted"], 0)
+
+            with conn.cursor() as cur:
+                cur.execute("SELECT source_ticker, date, close, ingested_at FROM stock_prices ORDER BY 1, 2")
+                rows = cur.fetchall()
+            self.assertEqual([(r[0], r[1]) for r in rows], [
+                ("AAA.US", date(2023, 12, 29)), ("AAA.US", date(2024, 1, 2)), ("BBB.US", date(2024, 1, 2)),
+            ])
+            self.assertIsNone(rows[2][2])
+            self.assertEqual(rows[0][3], datetime(2026, 4, 1, 12, tzinfo=timezone.utc))
+        finally:
+            conn.close()
+            with admin.cursor() as cur:
+                cur.execute(f"DROP SCHEMA {schema} CASCADE")
+            admin.close()
+
+
+class TestParallelLoad(unittest.TestCase):
+    def setUp(self) -> None:
+        self._tmp = tempfile.TemporaryDirectory()
+        self.raw = Path(self._tmp.name)
+        pq.write_table(_raw_table(), self.raw / "stock_prices.parquet")
+
+    def tearDown(self) -> None:
+        self._tmp.cleanup()
+
+    def test_partitions_are_contiguous_and_balanced(self) -> None:
+        counts = loader.filtered_symbol_counts(self.raw, "2023-01-01", {"AAA.US", "BBB.US", "ZZZ.US"})
+        self.assertEqual(counts, {"AAA.US": 2, "BBB.US": 1, "ZZZ.US": 1})
+        self.assertEqual(loader.plan_partitions(counts, 2), [["AAA.US"], ["BBB.US", "ZZZ.US"]])
+        self.assertEqual(loader.plan_partitions(counts, 10), [["AAA.US"], ["BBB.US"], ["ZZZ.US"]])
+
+    def test_decode_factor_flags_unsorted_row_groups(self) -> None:
+        table = _raw_table().filter(pa.array([True, True, True, True, False]))
+        plan = [["AAA.US"], ["BBB.US", "ZZZ.US"]]
+        pq.write_table(table, self.raw / "stock_prices.parquet", row_group_size=2)
+        self.assertEqual(loader.partition_decode_factor(self.raw, plan, "2023-01-01"), 1.0)
+
+        # AAA, BBB, ZZZ, AAA: both row groups span both partitions.
+        pq.write_table(table.take([0, 2, 3, 1]), self.raw / "stock_prices.parquet", row_group_size=2)
+        self.assertEqual(loader.partition_decode_factor(self.raw, plan, "2023-01-01"), 2.0)
+
+    def test_checkpoint_only_matches_the_same_load(self) -> None:
+        path = self.raw / "checkpoint.json"
+        key = loader._checkpoint_key("2024-01-01", {"AAA.US"}, 4)
+        state = loader.new_checkpoint(key, {"AAA.US": 3})
+        loader.write_json_atomic(path, state)
+
+        self.assertEqual(loader.load_checkpoint(path, key), state)
+        self.assertIsNone(loader.load_checkpoint(path, loader._checkpoint_key("2023-01-01", {"AAA.US"}, 4)))
+        self.assertIsNone(loader.load_checkpoint(path, loader._checkpoint_key("2024-01-01", {"BBB.US"}, 4)))
+
+    @unittest.skipUnless(os.environ.get(TEST_DB_URL_ENV), f"set {TEST_DB_URL_ENV} to run against a local Postgres")
+    def test_failed_partition_is_retried_alone(self) -> None:
+        schema = f"test_{uuid.uuid4().hex[:8]}"
+        base = os.environ[TEST_DB_URL_ENV]
+        url = f"{base}{'&' if '?' in base else '?'}options={quote(f'-c search_path={schema}')}"
+        admin = psycopg2.connect(base)
+        admin.autocommit = True
+        with admin.cursor() as cur:
+            cur.execute(f"CREATE SCHEMA {schema}")
+            cur.execute(
+                f"""
+                CREATE TABLE {schema}.stock_prices (
+                    source_ticker text NOT NULL, ticker text, date date NOT NULL,
+                    open numeric, high numeric, low numeric, close numeric, volume numeric,
+                    source_system text, ingested_at timestamptz,
+                    PRIMARY KEY (source_ticker, date)
+                )
+                """
+            )
+        checkpoint = self.raw / "checkpoint.json"
+        universe = {"AAA.US", "BBB.US", "ZZZ.US"}
+        key = loader._checkpoint_key("2023-01-01", universe, 4)
+        state = loader.new_checkpoint(key, loader.filtered_symbol_counts(self.raw, "2023-01-01", universe))
+        copy_load = loader.copy_load
+        loaded: list[list[str]] = []
+
+        def failing_copy_load(conn, tables, **kwargs):
+            tables = list(tables)
+            symbols = sorted({s for t in tables for s in t["source_ticker"].to_pylist()})
+            if symbols == ["BBB.US"]:
+                raise RuntimeError("connection lost")
+            loaded.append(symbols)
+            return copy_load(conn, tables, **kwargs)
+
+        try:
+            with mock.patch.object(loader, "copy_load", failing_copy_load):
+                stats = loader.parallel_load(url, self.raw, "2023-01-01", state, 2, checkpoint_path=checkpoint, log=lambda _: None)
+            self.assertEqual(stats["loaded"], 2)
+            self.assertEqual(stats["failed"], [(1, "RuntimeError: connection lost")])
+            self.assertEqual(sorted(loaded), [["AAA.US"], ["ZZZ.US"]])
+
+            resumed = loader.load_checkpoint(checkpoint, key)
+            self.assertEqual(sorted(resumed["done"]), ["0", "2"])
+            stats = loader.parallel_load(url, self.raw, "2023-01-01", resumed, 2, log=lambda _: None)
+            self.assertEqual((stats["partitions"], stats["inserted"]), (1, 1))
+
+            with admin.cursor() as cur:
+                cur.execute(f"SELECT source_ticker, COUNT(*) FROM {schema}.stock_prices GROUP BY 1 ORDER BY 1")
+                self.assertEqual(cur.fetchall(), [("AAA.US", 2), ("BBB.US", 1), ("ZZZ.US", 1)])
+        finally:
+            postgres.close_pools()
+            with admin.cursor() as cur:
+                cur.execute(f"DROP SCHEMA {schema} CASCADE")
+            admin.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
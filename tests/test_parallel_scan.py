@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+import tempfile
+import threading
+import time
+import unittest
+from datetime import date, timedelta
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from src.utils.parallel_scan import bounded_map
+from src.utils.price_utils import iter_normalized_price_chunks, iter_raw_row_groups
+
+
+class TestBoundedMap(unittest.TestCase):
+    def test_ordered_delivery_keeps_input_order(self) -> None:
+        # Earlier items take longer, so completion order is reversed.
+        results = list(bounded_map(lambda i: time.sleep(0.02 * (5 - i)) or i, range(5), workers=4, ordered=True))
+        self.assertEqual(results, [0, 1, 2, 3, 4])
+
+    def test_unordered_delivery_returns_every_result(self) -> None:
+        results = list(bounded_map(lambda i: time.sleep(0.02 * (5 - i)) or i, range(5), workers=4, ordered=False))
+        self.assertEqual(sorted(results), [0, 1, 2, 3, 4])
+        self.assertNotEqual(results, [0, 1, 2, 3, 4])
+
+    def test_prefetch_caps_pending_work(self) -> None:
+        lock = threading.Lock()
+        started: list[int] = []
+        max_ahead = 0
+
+        def work(i: int) -> int:
+            with lock:
+                started.append(i)
+            return i
+
+        for consumed, _ in enumerate(bounded_map(work, range(20), workers=4, prefetch=3), start=1):
+            time.sleep(0.005)
+            with lock:
+                max_ahead = max(max_ahead, len(started) - consumed)
+        self.assertLessEqual(max_ahead, 3)
+
+    def test_worker_errors_reach_the_consumer(self) -> None:
+        def work(i: int) -> int:
+            if i == 3:
+                raise RuntimeError("boom")
+            return i
+
+        with self.assertRaises(RuntimeError):
+            list(bounded_map(work, range(10), workers=2))
+
+
+class TestParallelRowGroupScan(unittest.TestCase):
+    def setUp(self) -> None:
+        self._tmp = tempfile.TemporaryDirectory()
+        self.path = Path(self._tmp.name) / "prices.parquet"
+        symbols = [f"S{i:02d}.US" for i in range(10) for _ in range(5)]
+        dates = [date(2026, 1, 1) + timedelta(days=d) for _ in range(10) for d in range(5)]
+        table = pa.table(
+            {
+                "symbol_raw": symbols,
+                "payload_date": pa.array(dates, pa.date32()),
+                "close_raw": [float(i) for i in range(len(symbols))],
+            }
+        )
+        pq.write_table(table, self.path, row_group_size=5)
+
+    def tearDown(self) -> None:
+        self._tmp.cleanup()
+
+    def test_parallel_scan_matches_serial_scan(self) -> None:
+        serial = [t["close_raw"].to_pylist() for t in iter_raw_row_groups(self.path, workers=1)]
+        parallel = [t["close_raw"].to_pylist() for t in iter_raw_row_groups(self.path, workers=4, prefetch=2)]
+        self.assertEqual(parallel, serial)
+
+        unordered = iter_raw_row_groups(self.path, symbols=["S03.US", "S07.US"], workers=4, ordered=False)
+        values = sorted(v for t in unordered for v in t["close_raw"].to_pylist())
+        self.assertEqual(values, [*range(15, 20), *range(35, 40)])
+
+    def test_normalized_chunks_on_thread_pool(self) -> None:
+        chunks = list(iter_normalized_price_chunks(self.path, since="2026-01-05", workers=4))
+        self.assertEqual([c["ticker"].tolist() for c in chunks], [[f"S{i:02d}"] for i in range(10)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,41 @@
+from __future__ import annotations
+
+import os
+import unittest
+from unittest import mock
+
+from scripts.polygon_stub_server import PolygonStub
+from src.ingestion import fetch_polygon
+
+
+class TestPolygonStub(unittest.TestCase):
+    def setUp(self) -> None:
+        self.stub = PolygonStub(symbols=["AAPL", "BRK.B", "MSFT"], error_every=2)
+        env = {fetch_polygon.BASE_URL_ENV: self.stub.start(), "POLYGON_API_KEY": "stub"}
+        patches = [
+            mock.patch.dict(os.environ, env),
+            mock.patch.object(fetch_polygon, "_cache_configured", True),
+            mock.patch.object(fetch_polygon, "_cache", None),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+        self.addCleanup(self.stub.stop)
+
+    def test_grouped_daily_survives_injected_429s(self) -> None:
+        df = fetch_polygon.fetch_grouped_daily("2026-04-01", tickers=["AAPL", "BRK.B"])
+        self.assertEqual(df["ticker"].tolist(), ["AAPL", "BRK.B"])
+        self.assertEqual(fetch_polygon.fetch_grouped_daily("2026-04-04").shape[0], 0)  # Saturday
+        self.assertEqual(self.stub.stats["requests"], 3)
+        self.assertEqual(self.stub.stats["throttled"], 1)
+
+    def test_aggregates_cover_business_days_in_range(self) -> None:
+        df = fetch_polygon.fetch_ticker_range("MSFT", "2026-04-01", "2026-04-07")
+        days = [str(d.date()) for d in df["date"]]
+        self.assertEqual(days, ["2026-04-01", "2026-04-02", "2026-04-03", "2026-04-06", "2026-04-07"])
+        self.assertTrue((df["source_ticker"] == "MSFT.US").all())
+        self.assertTrue(fetch_polygon.fetch_ticker_range("NOPE", "2026-04-01", "2026-04-07").empty)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+import os
+import unittest
+import uuid
+from datetime import date, datetime, timezone
+from unittest import mock
+from urllib.parse import quote
+
+import pandas as pd
+import psycopg2
+import pyarrow as pa
+
+from src.db import postgres
+from src.db.stock_prices import STOCK_PRICES_COLUMNS, upsert_raw_prices
+from tests.raw_rows import raw_frame
+
+# Point at a disposable local Postgres to run the round-trip tests, e.g.
+# FINLIFY_TEST_DB_URL=postgresql://postgres@localhost/postgres
+TEST_DB_URL_ENV = "FINLIFY_TEST_DB_URL"
+RAW_ROWS = [
+    ("AAA.US", date(2026, 3, 30), 1.0),
+    ("AAA.US", date(2026, 3, 31), 2.0),
+    ("BBB.US", date(2026, 3, 31), None),
+]
+
+
+class TestUpsertHelpers(unittest.TestCase):
+    def test_upsert_sql_do_nothing_and_do_update(self) -> None:
+        self.assertEqual(
+            postgres.upsert_sql("t", ["k", "v"], ["k"]),
+            "INSERT INTO t (k, v) VALUES %s ON CONFLICT (k) DO NOTHING",
+        )
+        self.assertTrue(
+            postgres.upsert_sql("t", ["k", "v", "w"], ["k"], update=["v", "w"]).endswith(
+                "ON CONFLICT (k) DO UPDATE SET v = EXCLUDED.v, w = EXCLUDED.w"
+            )
+        )
+
+    def test_row_pages_from_pandas_and_arrow(self) -> None:
+        df = pd.DataFrame({"b": [1.0, float("nan"), 3.0], "a": ["x", "y", "z"], "extra": [0, 0, 0]})
+        pages = list(postgres.iter_row_pages(df, ["a", "b"], page_rows=2))
+        self.assertEqual(pages, [[("x", 1.0), ("y", None)], [("z", 3.0)]])
+
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        self.assertEqual(list(postgres.iter_row_pages(table, ["a", "b"], page_rows=2)), pages)
+
+    def test_database_url_falls_back_to_env(self) -> None:
+        with mock.patch.dict(os.environ, {postgres.DB_URL_ENV: "postgresql://env/db"}):
+            self.assertEqual(postgres.database_url(), "postgresql://env/db")
+            self.assertEqual(postgres.database_url("postgresql://arg/db"), "postgresql://arg/db")
+        env = {k: v for k, v in os.environ.items() if k != postgres.DB_URL_ENV}
+        with mock.patch.dict(os.environ, env, clear=True):
+            self.assertIsNone(postgres.database_url())
+            self.assertIsNone(upsert_raw_prices(raw_frame(RAW_ROWS, source_system="polygon")))
+
+
+@unittest.skipUnless(os.environ.get(TEST_DB_URL_ENV), f"set {TEST_DB_URL_ENV} to run against a local Postgres")
+class TestPooledUpsert(unittest.TestCase):
+    def setUp(self) -> None:
+        self.schema = f"test_{uuid.uuid4().hex[:8]}"
+        base = os.environ[TEST_DB_URL_ENV]
+        sep = "&" if "?" in base else "?"
+        self.url = f"{base}{sep}options={quote(f'-c search_path={self.schema}')}"
+        self.admin = psycopg2.connect(base)
+        self.admin.autocommit = True
+        with self.admin.cursor() as cur:
+            cur.execute(f"CREATE SCHEMA {self.schema}")
+            cur.execute(
+                f"""
+                CREATE TABLE {self.schema}.stock_prices (
+                    source_ticker text NOT NULL, ticker text, date date NOT NULL,
+                    open numeric, high numeric, low numeric, close numeric, volume numeric,
+                    source_system text, ingested_at timestamptz,
+                    PRIMARY KEY (source_ticker, date)
+                )
+                """
+            )
+            cur.execute(f"CREATE TABLE {self.schema}.kv (k int PRIMARY KEY, v text)")
+
+    def tearDown(self) -> None:
+        postgres.close_pools()
+        with self.admin.cursor() as cur:
+            cur.execute(f"DROP SCHEMA {self.schema} CASCADE")
+        self.admin.close()
+
+    def test_counts_are_exact_across_pages(self) -> None:
+        chunks = [pd.DataFrame({"k": [1, 2, 3], "v": ["a", "b", "c"]}), pa.table({"k": [3, 4, 5], "v": ["C", "d", "e"]})]
+        with postgres.connection(self.url) as conn:
+            stats = postgres.upsert_rows(conn, "kv", ["k", "v"], chunks, conflict=["k"], page_rows=2)
+        self.assertEqual((stats["rows"], stats["written"], stats["pages"], stats["chunks"]), (6, 5, 4, 2))
+
+        with postgres.connection(self.url) as conn:
+            stats = postgres.upsert_rows(conn, "kv", ["k", "v"], chunks[1], conflict=["k"], update=["v"], page_rows=2)
+            self.assertEqual(stats["written"], 3)
+            with conn.cursor() as cur:
+                cur.execute("SELECT v FROM kv WHERE k = 3")
+                self.assertEqual(cur.fetchone()[0], "C")
+
+    def test_connections_are_pooled_and_rolled_back_on_error(self) -> None:
+        with self.assertRaises(RuntimeError):
+            with postgres.connection(self.url) as conn:
+                first = conn
+                with conn.cursor() as cur:
+                    cur.execute("INSERT INTO kv VALUES (1, 'a')")
+                raise RuntimeError("boom")
+        with postgres.connection(self.url) as conn:
+            self.assertIs(conn, first)
+            with conn.cursor() as cur:
+                cur.execute("SELECT COUNT(*) FROM kv")
+                self.assertEqual(cur.fetchone()[0], 0)
+
+    def test_upsert_raw_prices_inserts_new_keys_only(self) -> None:
+        raw = raw_frame(RAW_ROWS, source_system="polygon")
+        stats = upsert_raw_prices(raw, db_url=self.url)
+        self.assertEqual((stats["rows"], stats["written"]), (3, 3))
+        self.assertEqual(upsert_raw_prices(raw, db_url=self.url)["written"], 0)
+
+        with postgres.connection(self.url) as conn, conn.cursor() as cur:
+            cur.execute(f"SELECT {', '.join(STOCK_PRICES_COLUMNS)} FROM stock_prices ORDER BY 1, 3")
+            rows = cur.fetchall()
+        self.assertEqual([(r[0], r[1], r[2]) for r in rows], [
+            ("AAA.US", "AAA", date(2026, 3, 30)), ("AAA.US", "AAA", date(2026, 3, 31)), ("BBB.US", "BBB", date(2026, 3, 31)),
+        ])
+        # NaN prices land as NULL, not 'NaN'::numeric.
+        self.assertIsNone(rows[2][3])
+        self.assertEqual(rows[0][9], datetime(2026, 4, 1, 12, tzinfo=timezone.utc))
+
+
+if __name__ == "__main__":
+    unittest.main()
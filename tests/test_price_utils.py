@@ -0,0 +1,118 @@
+from __future__ import annotations
+
+import tempfile
+import unittest
+from datetime import date, timedelta
+from pathlib import Path
+from unittest import mock
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from src.utils.price_utils import (
+    iter_normalized_price_chunks,
+    iter_raw_row_groups,
+    normalize_price_schema,
+    normalize_price_table,
+    normalized_table_to_pandas,
+)
+
+
+def _sorted_raw_table() -> pa.Table:
+    symbols: list[str] = []
+    dates: list[date] = []
+    for sym in ["AAA.US", "BBB.US", "CCC.US", "DDD.US"]:
+        for i in range(4):
+            symbols.append(sym)
+            dates.append(date(2026, 1, 1) + timedelta(days=i))
+    n = len(symbols)
+    return pa.table(
+        {
+            "symbol_raw": symbols,
+            "payload_date": pa.array(dates, pa.date32()),
+            "open_raw": [1.0] * n,
+            "close_raw": [float(i) for i in range(n)],
+            "volume_raw": [10.0] * n,
+        }
+    )
+
+
+class TestPricePushdown(unittest.TestCase):
+    def setUp(self) -> None:
+        self._tmp = tempfile.TemporaryDirectory()
+        self.path = Path(self._tmp.name) / "prices.parquet"
+        # Two rows per row group -> each group holds one symbol and two dates.
+        pq.write_table(_sorted_raw_table(), self.path, row_group_size=2)
+
+    def tearDown(self) -> None:
+        self._tmp.cleanup()
+
+    def _count_reads(self, **kwargs) -> tuple[int, list[pa.Table]]:
+        original = pq.ParquetFile.read_row_group
+        calls: list[int] = []
+
+        def counting(pf, i, *args, **kw):
+            calls.append(i)
+            return original(pf, i, *args, **kw)
+
+        with mock.patch.object(pq.ParquetFile, "read_row_group", counting):
+            tables = list(iter_raw_row_groups(self.path, **kwargs))
+        return len(calls), tables
+
+    def test_symbol_filter_skips_row_groups_by_statistics(self) -> None:
+        reads, tables = self._count_reads(symbols=["BBB.US", "DDD.US"])
+        self.assertEqual(reads, 4)
+        syms = {s for t in tables for s in t["symbol_raw"].to_pylist()}
+        self.assertEqual(syms, {"BBB.US", "DDD.US"})
+
+    def test_date_range_skips_row_groups_by_statistics(self) -> None:
+        reads, tables = self._count_reads(since="2026-01-03", until=date(2026, 1, 4))
+        self.assertEqual(reads, 4)
+        self.assertEqual(sum(t.num_rows for t in tables), 8)
+
+    def test_combined_filters_and_column_projection(self) -> None:
+        reads, tables = self._count_reads(
+            symbols=["CCC.US"], since="2026-01-02", until="2026-01-02", columns=["close_raw"]
+        )
+        self.assertEqual(reads, 1)
+        self.assertEqual(len(tables), 1)
+        self.assertEqual(tables[0].column_names, ["close_raw"])
+        self.assertEqual(tables[0]["close_raw"].to_pylist(), [9.0])
+
+    def test_normalized_chunks_accept_pushdown_arguments(self) -> None:
+        chunks = list(
+            iter_normalized_price_chunks(
+                self.path, symbols={"AAA.US"}, since="2026-01-04", columns=["ticker", "date", "close"]
+            )
+        )
+        self.assertEqual(len(chunks), 1)
+        self.assertListEqual(chunks[0].columns.tolist(), ["ticker", "date", "close"])
+        self.assertEqual(chunks[0]["ticker"].tolist(), ["AAA"])
+
+
+class TestNormalizePriceTable(unittest.TestCase):
+    def test_matches_pandas_normalization(self) -> None:
+        raw = pa.table(
+            {
+                "symbol_raw": [" aapl.us", "AAPL.US", "brk-b.us ", None, "SPY", "msft.us"],
+                "payload_date": ["2026-03-30", "2026-03-31", "2026-03-30", "2026-03-30", "2026-03-30", "bad"],
+                "close_raw": [1.0, 2.0, 3.0, 4.0, 5.0, 6.0],
+            }
+        )
+        table = normalize_price_table(raw)
+
+        self.assertTrue(pa.types.is_dictionary(table.schema.field("ticker").type))
+        self.assertEqual(table["ticker"].to_pylist(), ["AAPL", "AAPL", "BRK-B", "SPY"])
+        expected = normalize_price_schema(raw.to_pandas()).reset_index(drop=True)
+        actual = normalized_table_to_pandas(table)
+        pd.testing.assert_frame_equal(
+            expected[["source_ticker", "ticker", "date", "close"]],
+            actual[["source_ticker", "ticker", "date", "close"]],
+            check_dtype=False,
+        )
+        self.assertTrue(actual["open"].isna().all())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,157 @@
+from __future__ import annotations
+
+import os
+import tempfile
+import unittest
+import uuid
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+
+import psycopg2
+import pyarrow.parquet as pq
+
+from scripts import pull_from_supabase as pull
+from src.utils.price_utils import raw_row_count
+from src.utils.raw_store import SUPABASE_PULL_STATE_NAME
+
+# Point at a disposable local Postgres to run the end-to-end pull test, e.g.
+# FINLIFY_TEST_DB_URL=postgresql://postgres@localhost/postgres
+TEST_DB_URL_ENV = "FINLIFY_TEST_DB_URL"
+
+
+STOCK_PRICES_DDL = """
+    CREATE TABLE {schema}.stock_prices (
+        source_ticker text NOT NULL, ticker text, date date NOT NULL,
+        open numeric, high numeric, low numeric, close numeric, volume numeric,
+        source_system text, ingested_at timestamptz,
+        PRIMARY KEY (source_ticker, date)
+    )
+"""
+
+
+class TestPullFromSupabase(unittest.TestCase):
+    def test_rows_to_table_builds_raw_schema(self) -> None:
+        ingested = datetime(2026, 4, 1, 8, tzinfo=timezone(timedelta(hours=-4)))
+        table = pull.rows_to_table(
+            [
+                ("polygon", ingested, "AAPL.US", "2026-03-31", 1.0, 2.0, 0.5, 1.5, 100.0),
+                ("stooq", None, "MSFT.US", "2026-03-31", None, None, None, 3.0, None),
+            ]
+        )
+
+        self.assertEqual(table.schema, pull.RAW_SCHEMA)
+        self.assertEqual(table["ingestion_run_id"].to_pylist(), [pull.PULL_RUN_ID] * 2)
+        self.assertEqual(table["ingested_at"][0].as_py(), datetime(2026, 4, 1, 12, tzinfo=timezone.utc))
+        self.assertEqual(table["close_raw"].to_pylist(), [1.5, 3.0])
+        self.assertEqual(table["open_raw"].null_count, 1)
+
+    @unittest.skipUnless(os.environ.get(TEST_DB_URL_ENV), f"set {TEST_DB_URL_ENV} to run against a local Postgres")
+    def test_pull_writes_one_row_group_per_batch(self) -> None:
+        schema = f"test_{uuid.uuid4().hex[:8]}"
+        admin = psycopg2.connect(os.environ[TEST_DB_URL_ENV])
+        admin.autocommit = True
+        with admin.cursor() as cur:
+            cur.execute(f"CREATE SCHEMA {schema}")
+            cur.execute(STOCK_PRICES_DDL.format(schema=schema))
+            cur.execute(
+                f"""
+                INSERT INTO {schema}.stock_prices
+                SELECT 'T' || (i % 7) || '.US', 'T' || (i % 7), DATE '2020-01-01' + (i / 7),
+                       i, i, i, i + 0.25, NULL, 'stooq', TIMESTAMPTZ '2026-04-01 00:00+00'
+                FROM generate_series(0, 249) AS i
+                """
+            )
+        conn = psycopg2.connect(os.environ[TEST_DB_URL_ENV], options=f"-c search_path={schema}")
+        try:
+            with tempfile.TemporaryDirectory() as tmp:
+                out = Path(tmp) / "stock_prices.parquet"
+                stats = pull.pull_to_parquet(conn, out, batch_rows=100, total=250, log=lambda _: None)
+
+                self.assertEqual((stats["rows"], stats["row_groups"]), (250, 3))
+                pf = pq.ParquetFile(out)
+                self.assertEqual([pf.metadata.row_group(i).num_rows for i in range(3)], [100, 100, 50])
+                table = pf.read()
+                self.assertEqual(table.schema, pull.RAW_SCHEMA)
+                keys = list(zip(table["symbol_raw"].to_pylist(), table["payload_date"].to_pylist()))
+                self.assertEqual(keys, sorted(keys))
+                self.assertEqual(keys[0], ("T0.US", "2020-01-01"))
+                self.assertEqual(table["close_raw"][0].as_py(), 0.25)
+                self.assertEqual(table["volume_raw"].null_count, 250)
+                self.assertEqual([p.name for p in Path(tmp).iterdir()], ["stock_prices.parquet"])
+        finally:
+            conn.close()
+            with admin.cursor() as cur:
+                cur.execute(f"DROP SCHEMA {schema} CASCADE")
+            admin.close()
+
+
+    def test_pull_state_round_trip_requires_base_file(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            ingested = datetime(2026, 4, 1, 12, tzinfo=timezone.utc)
+            pull.save_pull_state(root, ingested, "2026-03-31")
+            self.assertIsNone(pull.load_pull_state(root))
+
+            (root / "stock_prices.parquet").touch()
+            self.assertEqual(
+                pull.load_pull_state(root), {"max_ingested_at": ingested, "max_date": date(2026, 3, 31)}
+            )
+            (root / SUPABASE_PULL_STATE_NAME).write_text('{"version": 0}', encoding="utf-8")
+            self.assertIsNone(pull.load_pull_state(root))
+
+    @unittest.skipUnless(os.environ.get(TEST_DB_URL_ENV), f"set {TEST_DB_URL_ENV} to run against a local Postgres")
+    def test_incremental_pull_appends_only_new_rows(self) -> None:
+        schema = f"test_{uuid.uuid4().hex[:8]}"
+        admin = psycopg2.connect(os.environ[TEST_DB_URL_ENV])
+        admin.autocommit = True
+
+        def insert(tickers: str, first_day: str, days: int, ingested_at: str) -> None:
+            with admin.cursor() as cur:
+                cur.execute(
+                    f"""
+                    INSERT INTO {schema}.stock_prices
+                    SELECT t || '.US', t, DATE %s + d, 1, 1, 1, 1, 100, 'polygon', %s::timestamptz
+                    FROM unnest(string_to_array(%s, ',')) AS t, generate_series(0, %s - 1) AS d
+                    """,
+                    (first_day, ingested_at, tickers, days),
+                )
+
+        with admin.cursor() as cur:
+            cur.execute(f"CREATE SCHEMA {schema}")
+            cur.execute(STOCK_PRICES_DDL.format(schema=schema))
+        insert("AAA,BBB", "2026-03-01", 30, "2026-03-31 00:00+00")
+        conn = psycopg2.connect(os.environ[TEST_DB_URL_ENV], options=f"-c search_path={schema}")
+        try:
+            with tempfile.TemporaryDirectory() as tmp:
+                raw = Path(tmp)
+                stats = pull.pull_to_parquet(conn, raw / "stock_prices.parquet", log=lambda _: None)
+                pull.save_pull_state(raw, stats["max_ingested_at"], stats["max_date"])
+                self.assertEqual(stats["max_date"], "2026-03-30")
+
+                # A new day for both tickers, a new ticker, and a backfilled gap
+                # stamped before the watermark (a long-running backfill).
+                insert("AAA,BBB,CCC", "2026-03-31", 1, "2026-04-01 00:00+00")
+                with admin.cursor() as cur:
+                    cur.execute(f"DELETE FROM {schema}.stock_prices WHERE source_ticker = 'CCC.US'")
+                insert("CCC", "2026-03-28", 4, "2026-03-30 12:00+00")
+
+                state = pull.load_pull_state(raw)
+                delta = pull.pull_incremental(conn, raw, state, lookback_days=3)
+                self.assertEqual((delta["appended"], delta["max_date"]), (6, "2026-03-31"))
+                self.assertGreater(delta["duplicates"], 0)
+                self.assertEqual(raw_row_count(raw), 66)
+
+                state = pull.load_pull_state(raw)
+                self.assertEqual(state["max_ingested_at"], datetime(2026, 4, 1, tzinfo=timezone.utc))
+                again = pull.pull_incremental(conn, raw, state, lookback_days=3)
+                self.assertEqual((again["appended"], again["fragments"]), (0, []))
+                self.assertEqual(raw_row_count(raw), 66)
+        finally:
+            conn.close()
+            with admin.cursor() as cur:
+                cur.execute(f"DROP SCHEMA {schema} CASCADE")
+            admin.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
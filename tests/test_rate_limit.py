@@ -0,0 +1,45 @@
+from __future__ import annotations
+
+import unittest
+
+from src.utils.rate_limit import TokenBucket
+
+
+class _FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.now += seconds
+
+
+class TestTokenBucket(unittest.TestCase):
+    def test_burst_then_steady_rate(self) -> None:
+        clock = _FakeClock()
+        bucket = TokenBucket(5, burst=2, clock=clock, sleep=clock.sleep)
+
+        waits = [bucket.acquire() for _ in range(4)]
+        self.assertEqual(waits[:2], [0.0, 0.0])
+        self.assertAlmostEqual(waits[2], 12.0)
+        self.assertAlmostEqual(waits[3], 12.0)
+        self.assertAlmostEqual(clock.now, 24.0)
+
+    def test_idle_time_refills_up_to_burst(self) -> None:
+        clock = _FakeClock()
+        bucket = TokenBucket(60, burst=3, clock=clock, sleep=clock.sleep)
+        for _ in range(3):
+            bucket.acquire()
+        clock.now += 3600
+        self.assertEqual([bucket.acquire() for _ in range(3)], [0.0, 0.0, 0.0])
+        self.assertAlmostEqual(bucket.acquire(), 1.0)
+
+    def test_zero_rate_is_unlimited(self) -> None:
+        bucket = TokenBucket(0, sleep=lambda s: self.fail("should not sleep"))
+        self.assertEqual(sum(bucket.acquire() for _ in range(100)), 0.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
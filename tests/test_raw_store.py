@@ -0,0 +1,226 @@
+from __future__ import annotations
+
+import tempfile
+import unittest
+from datetime import date
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from src.ingestion.compact_raw import compact_raw_dataset
+from src.ingestion.migrate_raw_schema import migrate_raw_dataset
+from src.transform.build_ticker_master import build_ticker_master_from_manifest, build_ticker_master_from_parquet
+from src.utils.price_utils import iter_normalized_price_chunks, list_raw_files, plan_symbol_passes, raw_row_count
+from src.utils.raw_key_index import load_symbol_days, new_key_mask, refresh_key_index, to_epoch_days
+from src.utils.raw_manifest import load_manifest, max_dates_from_manifest, refresh_manifest
+from src.utils.raw_store import (
+    RowGroupBufferedWriter,
+    append_raw_fragment,
+    clear_raw_fragments,
+    is_compact_schema,
+    to_compact_table,
+)
+from tests.raw_rows import raw_table
+
+
+class TestRawStore(unittest.TestCase):
+    def setUp(self) -> None:
+        self._tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self._tmp.name)
+        base = raw_table([("AAPL.US", date(2026, 3, 30), 100.0), ("MSFT.US", date(2026, 3, 30), 200.0)])
+        pq.write_table(base, self.root / "stock_prices.parquet")
+
+    def tearDown(self) -> None:
+        self._tmp.cleanup()
+
+    def test_append_writes_one_fragment_per_month(self) -> None:
+        new = raw_table(
+            [
+                ("AAPL.US", date(2026, 3, 31), 101.0),
+                ("AAPL.US", date(2026, 4, 1), 102.0),
+                ("MSFT.US", date(2026, 4, 1), 201.0),
+            ]
+        )
+        written = append_raw_fragment(self.root, new, "daily_1")
+
+        self.assertEqual(
+            [p.relative_to(self.root).as_posix() for p in written],
+            ["year=2026/month=03/part-daily_1.parquet", "year=2026/month=04/part-daily_1.parquet"],
+        )
+        self.assertEqual(raw_row_count(self.root), 5)
+        self.assertEqual(list_raw_files(self.root)[0].name, "stock_prices.parquet")
+
+    def test_fragments_are_cast_to_base_schema(self) -> None:
+        new = raw_table([("AAPL.US", date(2026, 4, 1), 102.0)])
+        new = new.set_column(4, "payload_date", new["payload_date"].cast(pa.string()))
+        (fragment,) = append_raw_fragment(self.root, new, "daily_2")
+
+        base_schema = pq.ParquetFile(self.root / "stock_prices.parquet").schema_arrow
+        self.assertEqual(pq.ParquetFile(fragment).schema_arrow, base_schema)
+
+    def test_append_accepts_several_tables_in_one_call(self) -> None:
+        first = raw_table([("AAPL.US", date(2026, 4, 1), 102.0)])
+        second = raw_table([("MSFT.US", date(2026, 4, 1), 201.0), ("MSFT.US", date(2026, 5, 4), 205.0)])
+        second = second.set_column(4, "payload_date", second["payload_date"].cast(pa.string()))
+        written = append_raw_fragment(self.root, [first, raw_table([]), second], "daily_11")
+
+        self.assertEqual(
+            [p.relative_to(self.root).as_posix() for p in written],
+            ["year=2026/month=04/part-daily_11.parquet", "year=2026/month=05/part-daily_11.parquet"],
+        )
+        self.assertEqual(raw_row_count(self.root), 5)
+        self.assertEqual(append_raw_fragment(self.root, [], "daily_12"), [])
+        self.assertFalse(any(p.name.startswith(".") for p in self.root.rglob("*")))
+
+    def test_reader_treats_directory_as_one_dataset(self) -> None:
+        append_raw_fragment(self.root, raw_table([("AAPL.US", date(2026, 4, 1), 102.0)]), "daily_3")
+        # Sidecars and temp files must be ignored by readers.
+        (self.root / "_sidecar").mkdir()
+        pq.write_table(raw_table([("ZZZ.US", date(2026, 4, 1), 1.0)]), self.root / "_sidecar" / "x.parquet")
+
+        chunks = list(iter_normalized_price_chunks(self.root))
+        tickers = sorted(t for c in chunks for t in c["ticker"].tolist())
+        self.assertEqual(tickers, ["AAPL", "AAPL", "MSFT"])
+
+    def test_clear_fragments_keeps_base_file(self) -> None:
+        append_raw_fragment(self.root, raw_table([("AAPL.US", date(2026, 4, 1), 102.0)]), "daily_4")
+        self.assertEqual(clear_raw_fragments(self.root), 1)
+        self.assertEqual([p.name for p in list_raw_files(self.root)], ["stock_prices.parquet"])
+
+    def test_buffered_writer_coalesces_small_tables(self) -> None:
+        out = self.root / "_buffered.parquet"
+        one_row = raw_table([("AAPL.US", date(2026, 3, 30), 100.0)])
+        with RowGroupBufferedWriter(out, one_row.schema, row_group_rows=4) as writer:
+            for _ in range(10):
+                writer.write_table(one_row)
+
+        meta = pq.ParquetFile(out).metadata
+        self.assertEqual(meta.num_rows, 10)
+        self.assertEqual([meta.row_group(i).num_rows for i in range(meta.num_row_groups)], [4, 4, 2])
+
+    def test_plan_symbol_passes_respects_memory_bound(self) -> None:
+        passes = plan_symbol_passes({"C.US": 5, "A.US": 3, "B.US": 3, "D.US": 20}, max_rows=8)
+        self.assertEqual(passes, [["A.US", "B.US"], ["C.US"], ["D.US"]])
+
+    def test_compaction_sorts_dedups_and_merges_fragments(self) -> None:
+        append_raw_fragment(
+            self.root,
+            raw_table([("AAPL.US", date(2026, 3, 30), 100.0), ("AAPL.US", date(2026, 4, 1), 102.0)]),
+            "daily_5",
+        )
+        stats = compact_raw_dataset(self.root, row_group_rows=2, max_rows_in_memory=2)
+
+        self.assertEqual(stats["duplicates_dropped"], 1)
+        self.assertEqual([p.name for p in list_raw_files(self.root)], ["stock_prices.parquet"])
+        table = pq.read_table(self.root / "stock_prices.parquet")
+        keys = list(zip(table["symbol_raw"].to_pylist(), table["payload_date"].to_pylist()))
+        self.assertEqual(
+            keys,
+            [("AAPL.US", date(2026, 3, 30)), ("AAPL.US", date(2026, 4, 1)), ("MSFT.US", date(2026, 3, 30))],
+        )
+
+    def test_compaction_keeps_rows_without_a_symbol(self) -> None:
+        rows = [(None, date(2026, 4, 1), 1.0), ("AAPL.US", date(2026, 4, 1), 2.0)]
+        append_raw_fragment(self.root, raw_table(rows), "daily_12")
+        rows_before = raw_row_count(self.root)
+
+        stats = compact_raw_dataset(self.root, max_rows_in_memory=1)
+
+        self.assertEqual(stats["null_symbol_rows"], 1)
+        self.assertEqual(stats["rows_written"], rows_before)
+        table = pq.read_table(self.root / "stock_prices.parquet")
+        self.assertEqual(table["symbol_raw"].to_pylist(), ["AAPL.US", "AAPL.US", "MSFT.US", None])
+
+    def test_manifest_tracks_appends_without_rescanning_base(self) -> None:
+        self.assertIsNone(load_manifest(self.root))
+        refresh_manifest(self.root)
+        append_raw_fragment(self.root, raw_table([("AAPL.US", date(2026, 4, 1), 102.0)]), "daily_6")
+
+        manifest = load_manifest(self.root)
+        self.assertIsNotNone(manifest)
+        aapl = manifest["tickers"]["AAPL.US"]
+        self.assertEqual((aapl["min_date"], aapl["max_date"], aapl["row_count"]), ("2026-03-30", "2026-04-01", 2))
+        self.assertEqual((aapl["first_close"], aapl["last_close"]), (100.0, 102.0))
+        self.assertEqual(
+            aapl["row_groups"], [["stock_prices.parquet", 0], ["year=2026/month=04/part-daily_6.parquet", 0]]
+        )
+        self.assertEqual(max_dates_from_manifest(manifest, {"MSFT.US"}), {"MSFT.US": date(2026, 3, 30)})
+
+    def test_manifest_goes_stale_when_a_file_changes(self) -> None:
+        refresh_manifest(self.root)
+        pq.write_table(raw_table([("AAPL.US", date(2026, 3, 30), 1.0)]), self.root / "stock_prices.parquet")
+        self.assertIsNone(load_manifest(self.root))
+        self.assertEqual(refresh_manifest(self.root)["tickers"].keys(), {"AAPL.US"})
+
+    def test_ticker_master_from_manifest_matches_scan(self) -> None:
+        append_raw_fragment(self.root, raw_table([("AAPL.US", date(2026, 4, 1), 102.0)]), "daily_7")
+        from_manifest = build_ticker_master_from_manifest(load_manifest(self.root))
+        from_scan = build_ticker_master_from_parquet(self.root)
+        self.assertEqual(from_manifest.astype(str).to_dict("records"), from_scan.astype(str).to_dict("records"))
+
+    def test_key_index_follows_appends_and_flags_existing_keys(self) -> None:
+        refresh_key_index(self.root)
+        append_raw_fragment(self.root, raw_table([("AAPL.US", date(2026, 4, 1), 102.0)]), "daily_8")
+
+        stored = load_symbol_days(self.root, "AAPL.US")
+        self.assertEqual(list(stored), list(to_epoch_days([date(2026, 3, 30), date(2026, 4, 1)])))
+        mask = new_key_mask(
+            self.root,
+            ["AAPL.US", "MSFT.US", "AAPL.US", "NVDA.US"],
+            [date(2026, 4, 1), "2026-03-30", date(2026, 4, 2), date(2026, 4, 1)],
+        )
+        self.assertEqual(mask.tolist(), [False, False, True, True])
+
+    def test_key_index_rebuilds_after_full_rewrite(self) -> None:
+        refresh_key_index(self.root)
+        pq.write_table(raw_table([("NVDA.US", date(2026, 3, 31), 1.0)]), self.root / "stock_prices.parquet")
+        refresh_key_index(self.root)
+
+        self.assertEqual(load_symbol_days(self.root, "AAPL.US").size, 0)
+        mask = new_key_mask(self.root, ["NVDA.US", "AAPL.US"], [date(2026, 3, 31), date(2026, 3, 30)])
+        self.assertEqual(mask.tolist(), [False, True])
+
+
+    def test_to_compact_table_parses_string_dates(self) -> None:
+        table = raw_table([("AAPL.US", date(2026, 4, 1), 1.0)])
+        table = table.set_column(4, "payload_date", pa.array(["2026-04-01T00:00:00"]))
+        compact = to_compact_table(table)
+
+        self.assertTrue(is_compact_schema(compact.schema))
+        self.assertEqual(compact["payload_date"].type, pa.date32())
+        self.assertEqual(compact.to_pylist()[0]["payload_date"], date(2026, 4, 1))
+
+    def test_migration_keeps_rows_and_downstream_readers(self) -> None:
+        append_raw_fragment(self.root, raw_table([("AAPL.US", date(2026, 4, 1), 102.0)]), "daily_9")
+        refresh_key_index(self.root)
+        stats = migrate_raw_dataset(self.root)
+
+        self.assertEqual((stats["files"], stats["files_migrated"]), (2, 2))
+        for path in list_raw_files(self.root):
+            schema = pq.ParquetFile(path).schema_arrow
+            self.assertTrue(is_compact_schema(schema))
+            self.assertEqual(schema.field("payload_date").type, pa.date32())
+        close_chunk = pq.ParquetFile(self.root / "stock_prices.parquet").metadata.row_group(0).column(8)
+        self.assertEqual((close_chunk.path_in_schema, close_chunk.compression), ("close_raw", "ZSTD"))
+        self.assertIn("BYTE_STREAM_SPLIT", close_chunk.encodings)
+        self.assertEqual(migrate_raw_dataset(self.root)["files_migrated"], 0)
+
+        self.assertEqual(raw_row_count(self.root), 3)
+        tickers = sorted(t for c in iter_normalized_price_chunks(self.root) for t in c["ticker"].tolist())
+        self.assertEqual(tickers, ["AAPL", "AAPL", "MSFT"])
+        self.assertEqual(load_manifest(self.root)["tickers"]["AAPL.US"]["max_date"], "2026-04-01")
+        mask = new_key_mask(self.root, ["AAPL.US", "AAPL.US"], [date(2026, 4, 1), date(2026, 4, 2)])
+        self.assertEqual(mask.tolist(), [False, True])
+
+        # Later appends and compaction keep the compact schema.
+        (fragment,) = append_raw_fragment(self.root, raw_table([("NVDA.US", date(2026, 4, 2), 5.0)]), "daily_10")
+        self.assertTrue(is_compact_schema(pq.ParquetFile(fragment).schema_arrow))
+        compact_raw_dataset(self.root)
+        table = pq.read_table(self.root / "stock_prices.parquet")
+        self.assertTrue(is_compact_schema(table.schema))
+        self.assertEqual(table.column("symbol_raw").to_pylist(), ["AAPL.US", "AAPL.US", "MSFT.US", "NVDA.US"])
+
+
+if __name__ == "__main__":
+    unittest.main()